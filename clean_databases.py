@@ -12,30 +12,24 @@ Date: 7 Septembre 2025
 
 import os
 import glob
-import sqlite3
-import shutil
 from pathlib import Path
-from datetime import datetime
 
-def backup_database():
+from fnev4_backup import full_backup
+from fnev4_db import PROJECT_ROOT, resolve_database_path, read_connection, write_connection
+from fnev4_provenance import client_breakdown
+from fnev4_purge import print_progress, purge_rows
+
+def backup_database(db_path=None):
     """
     Crée une sauvegarde de la base avant nettoyage
+    (API de sauvegarde SQLite : cohérente même si l'application écrit)
     """
-    db_path = r"C:\wamp64\www\FNEV4\data\FNEV4.db"
+    db_path = db_path or resolve_database_path()
     if not os.path.exists(db_path):
         return None
     
-    # Créer le dossier de sauvegarde s'il n'existe pas
-    backup_dir = r"C:\wamp64\www\FNEV4\data\Backup"
-    os.makedirs(backup_dir, exist_ok=True)
-    
-    # Nom de la sauvegarde avec timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = os.path.join(backup_dir, f"FNEV4_backup_{timestamp}.db")
-    
     try:
-        shutil.copy2(db_path, backup_path)
-        return backup_path
+        return full_backup(db_path)
     except Exception as e:
         print(f"⚠️  Erreur lors de la sauvegarde: {e}")
         return None
@@ -48,7 +42,7 @@ def clean_clients_table():
     print("=" * 45)
     
     # Chemin de la base de données principale
-    db_path = r"C:\wamp64\www\FNEV4\data\FNEV4.db"
+    db_path = resolve_database_path()
     
     if not os.path.exists(db_path):
         print(f"❌ Base de données non trouvée: {db_path}")
@@ -66,52 +60,41 @@ def clean_clients_table():
             return False
         
         # Connexion à la base de données
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Compter les clients existants
-        cursor.execute("SELECT COUNT(*) FROM Clients")
-        total_clients = cursor.fetchone()[0]
-        
-        print(f"📊 Clients actuels dans la base: {total_clients}")
-        
-        if total_clients == 0:
-            print("ℹ️  La table Clients est déjà vide")
-            conn.close()
-            return True
-        
-        # Analyser les types de clients
-        cursor.execute("""
-            SELECT 
-                CASE 
-                    WHEN Notes LIKE '%Import exceptionnel%' THEN 'Import Exceptionnel'
-                    ELSE 'Clients Normaux'
-                END as type,
-                COUNT(*) as count
-            FROM Clients 
-            GROUP BY type
-        """)
+        with read_connection(db_path) as conn:
+            cursor = conn.cursor()
+            
+            # Compter les clients existants
+            cursor.execute("SELECT COUNT(*) FROM Clients")
+            total_clients = cursor.fetchone()[0]
+            
+            print(f"📊 Clients actuels dans la base: {total_clients}")
+            
+            if total_clients == 0:
+                print("ℹ️  La table Clients est déjà vide")
+                return True
         
-        breakdown = cursor.fetchall()
-        print("\n📈 Répartition actuelle:")
-        for client_type, count in breakdown:
-            print(f"   {client_type}: {count} clients")
+            # Analyser les types de clients (colonne ImportSource indexée si migrée)
+            breakdown = client_breakdown(conn)
+            print("\n📈 Répartition actuelle:")
+            for client_type, count in breakdown:
+                print(f"   {client_type}: {count} clients")
         
         print(f"\n🗑️  SUPPRESSION DE TOUS LES CLIENTS ({total_clients} clients)")
         
-        # Supprimer tous les clients
-        cursor.execute("DELETE FROM Clients")
-        
-        # Vérifier la suppression
-        cursor.execute("SELECT COUNT(*) FROM Clients")
-        remaining_clients = cursor.fetchone()[0]
-        
-        # Reset de l'auto-increment (optionnel)
-        cursor.execute("DELETE FROM sqlite_sequence WHERE name='Clients'")
+        # Supprimer tous les clients par lots (l'application reste utilisable)
+        result = purge_rows("Clients", db_path=db_path, progress=print_progress)
+        print()
+        print(f"   ⏱️ {result['batches']} lots en {result['seconds']}s ({result['rows_per_second']:,} lignes/s)")
         
-        # Valider les changements
-        conn.commit()
-        conn.close()
+        with write_connection(db_path) as conn:
+            cursor = conn.cursor()
+            
+            # Vérifier la suppression
+            cursor.execute("SELECT COUNT(*) FROM Clients")
+            remaining_clients = cursor.fetchone()[0]
+            
+            # Reset de l'auto-increment (optionnel)
+            cursor.execute("DELETE FROM sqlite_sequence WHERE name='Clients'")
         
         print(f"✅ Suppression terminée!")
         print(f"   - Clients supprimés: {total_clients}")
@@ -138,11 +121,11 @@ def clean_all_databases():
     print("=" * 60)
     
     # Base principale à conserver
-    main_db = r"C:\wamp64\www\FNEV4\data\FNEV4.db"
+    main_db = resolve_database_path()
     
     # Rechercher tous les fichiers .db
     search_patterns = [
-        r"C:\wamp64\www\FNEV4\**\*.db",
+        os.path.join(str(PROJECT_ROOT), "**", "*.db"),
     ]
     
     all_db_files = []
@@ -232,23 +215,19 @@ def analyze_database_structure():
     print("\n🔍 ANALYSE DE LA STRUCTURE")
     print("=" * 30)
     
-    db_path = r"C:\wamp64\www\FNEV4\data\FNEV4.db"
-    
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Lister les tables
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = cursor.fetchall()
-        
-        print("📋 Tables dans la base:")
-        for table in tables:
-            cursor.execute(f"SELECT COUNT(*) FROM {table[0]}")
-            count = cursor.fetchone()[0]
-            print(f"   {table[0]}: {count} enregistrements")
-        
-        conn.close()
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Lister les tables
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            tables = cursor.fetchall()
+            
+            print("📋 Tables dans la base:")
+            for table in tables:
+                cursor.execute(f"SELECT COUNT(*) FROM [{table[0]}]")
+                count = cursor.fetchone()[0]
+                print(f"   {table[0]}: {count} enregistrements")
         
     except Exception as e:
         print(f"❌ Erreur lors de l'analyse: {e}")
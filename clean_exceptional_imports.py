@@ -10,10 +10,13 @@ pour permettre de tester la correction du mapping template.
 Date: 7 Septembre 2025
 """
 
-import sqlite3
 import os
 from datetime import datetime
 
+from fnev4_db import resolve_database_path, read_connection
+from fnev4_provenance import provenance_filter
+from fnev4_purge import print_progress, purge_rows
+
 def clean_exceptional_imports():
     """
     Supprime les clients d'import exceptionnel existants
@@ -22,7 +25,7 @@ def clean_exceptional_imports():
     print("=" * 40)
     
     # Chemin de la base de données
-    db_path = os.path.join("data", "FNEV4.db")
+    db_path = resolve_database_path()
     
     if not os.path.exists(db_path):
         print(f"❌ Base de données non trouvée: {db_path}")
@@ -30,44 +33,45 @@ def clean_exceptional_imports():
     
     try:
         # Connexion à la base de données
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        with read_connection(db_path) as conn:
+            cursor = conn.cursor()
+            
+            # Colonne ImportSource indexée si la migration de provenance est faite
+            exceptional_filter = provenance_filter(conn)
         
-        # Compter les clients à supprimer
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM Clients 
-            WHERE Notes LIKE '%Import exceptionnel%'
-        """)
+            # Compter les clients à supprimer
+            cursor.execute(f"""
+                SELECT COUNT(*) 
+                FROM Clients 
+                WHERE {exceptional_filter}
+            """)
         
-        count_before = cursor.fetchone()[0]
-        print(f"📊 Clients d'import exceptionnel trouvés: {count_before}")
+            count_before = cursor.fetchone()[0]
+            print(f"📊 Clients d'import exceptionnel trouvés: {count_before}")
         
-        if count_before == 0:
-            print("✅ Aucun client à supprimer")
-            return
+            if count_before == 0:
+                print("✅ Aucun client à supprimer")
+                return
         
-        # Supprimer les clients d'import exceptionnel
-        cursor.execute("""
-            DELETE FROM Clients 
-            WHERE Notes LIKE '%Import exceptionnel%'
-        """)
+        # Supprimer les clients d'import exceptionnel par lots
+        result = purge_rows("Clients", exceptional_filter, db_path=db_path,
+                            progress=print_progress)
+        print()
         
-        # Confirmer la suppression
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM Clients 
-            WHERE Notes LIKE '%Import exceptionnel%'
-        """)
+        with read_connection(db_path) as conn:
+            cursor = conn.cursor()
         
-        count_after = cursor.fetchone()[0]
-        deleted_count = count_before - count_after
+            # Confirmer la suppression
+            cursor.execute(f"""
+                SELECT COUNT(*) 
+                FROM Clients 
+                WHERE {exceptional_filter}
+            """)
         
-        # Valider les changements
-        conn.commit()
-        conn.close()
+            count_after = cursor.fetchone()[0]
+            deleted_count = result['deleted']
         
-        print(f"🗑️  Supprimés: {deleted_count} clients")
+        print(f"🗑️  Supprimés: {deleted_count} clients ({result['rows_per_second']:,} lignes/s)")
         print(f"📊 Restants: {count_after} clients d'import exceptionnel")
         
         if count_after == 0:
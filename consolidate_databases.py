@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Consolidation des bases dispersées
+===========================================
+
+Fusionne les copies de FNEV4.db trouvées sous bin/ et data/ dans la base
+centrale. Chaque copie est attachée (ATTACH) puis ses lignes sont
+transférées par INSERT ... SELECT en lots de rowid : SQLite fait tout le
+travail, la mémoire Python reste constante quelle que soit la taille des
+copies.
+
+Politique de conflit (dédoublonnage) :
+- Clients      : même ClientCode, sinon même ClientNcc non vide
+- FneInvoices  : même FneReference non vide, sinon même Id
+- Autres tables: même Id
+Avec "central" (défaut) la ligne déjà présente dans la base centrale est
+conservée ; avec "newest" elle est mise à jour si la copie est plus
+récente (UpdatedAt, sinon CreatedAt). Les ClientId / ParentInvoiceId /
+FneInvoiceId des lignes importées sont réécrits vers les Id centraux.
+
+Un manifeste JSON décrit chaque fusion (lignes insérées, fusionnées avec
+une ligne centrale existante, ignorées - lignes d'une facture déjà présente
+ou absente -, mises à jour, par table et par copie).
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from fnev4_db import connect, resolve_database_path
+
+POLICY_KEEP_CENTRAL = "central"
+POLICY_NEWEST = "newest"
+CONFLICT_POLICIES = (POLICY_KEEP_CENTRAL, POLICY_NEWEST)
+
+# Ordre imposé par les clés étrangères
+MERGE_TABLES = ["ImportSessions", "Clients", "FneInvoices", "FneInvoiceItems", "FneApiLogs"]
+
+DEFAULT_BATCH_SIZE = 20000
+SOURCE_ALIAS = "src"
+
+# Expression de "fraîcheur" d'une ligne pour la politique newest
+_FRESHNESS = "COALESCE({a}.UpdatedAt, {a}.CreatedAt)"
+
+
+def _table_columns(conn, schema, table):
+    rows = conn.execute(f"PRAGMA {schema}.table_info([{table}])").fetchall()
+    return [row[1] for row in rows]
+
+
+def probe_source(db_path):
+    """
+    Inspecte une copie en lecture seule : tables fusionnables et bornes de rowid
+
+    Exécuté en parallèle sur toutes les copies avant la fusion.
+    """
+    info = {
+        'path': str(db_path),
+        'size': os.path.getsize(db_path),
+        'tables': {},
+        'error': None,
+    }
+    try:
+        conn = connect(db_path, readonly=True)
+        try:
+            existing = {row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table'")}
+            for table in MERGE_TABLES:
+                if table not in existing:
+                    continue
+                low, high = conn.execute(
+                    f"SELECT MIN(rowid), MAX(rowid) FROM [{table}]").fetchone()
+                info['tables'][table] = {'min_rowid': low, 'max_rowid': high}
+        finally:
+            conn.close()
+    except Exception as e:
+        info['error'] = str(e)
+    return info
+
+
+def find_stray_databases(central_path):
+    """Copies de FNEV4.db à fusionner (hors base centrale, sauvegardes et archives)"""
+    from diagnostic_db import find_all_databases
+
+    central = os.path.normcase(os.path.abspath(central_path))
+    strays = []
+    for db in find_all_databases():
+        path = db['path']
+        if os.path.normcase(os.path.abspath(path)) == central:
+            continue
+        if any(folder in path.lower() for folder in ['backup', 'archive']):
+            continue
+        if db['is_valid']:
+            strays.append(path)
+    return strays
+
+
+class DatabaseConsolidator:
+    """Moteur de fusion INSERT ... SELECT par lots vers la base centrale"""
+
+    def __init__(self, central_path=None, policy=POLICY_KEEP_CENTRAL,
+                 batch_size=DEFAULT_BATCH_SIZE, progress=None):
+        if policy not in CONFLICT_POLICIES:
+            raise ValueError(f"Politique inconnue: {policy} (attendu: {', '.join(CONFLICT_POLICIES)})")
+
+        self.central_path = str(central_path or resolve_database_path())
+        self.policy = policy
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+        self.conn = None
+
+    # ------------------------------------------------------------------
+    # Cycle de vie
+    # ------------------------------------------------------------------
+
+    def open(self):
+        # Connexion dédiée : l'ATTACH ne doit pas fuiter dans le pool partagé
+        self.conn = connect(self.central_path, readonly=False)
+        self.conn.isolation_level = None
+        # Les tables de correspondance peuvent être volumineuses
+        self.conn.execute("PRAGMA temp_store = FILE")
+        self.conn.execute("PRAGMA foreign_keys = OFF")
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Fusion
+    # ------------------------------------------------------------------
+
+    def merge_all(self, sources, workers=4):
+        """Fusionne toutes les copies et retourne le manifeste"""
+        manifest = {
+            'started_at': datetime.now().isoformat(),
+            'central': self.central_path,
+            'policy': self.policy,
+            'batch_size': self.batch_size,
+            'sources': [],
+        }
+
+        # Inspection parallèle (lecture seule), fusion séquentielle (un seul écrivain)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            probes = list(pool.map(probe_source, sources))
+
+        for probe in probes:
+            if probe['error']:
+                self.progress(f"⚠️  Copie ignorée {probe['path']}: {probe['error']}")
+                manifest['sources'].append({**probe, 'skipped': True})
+                continue
+            manifest['sources'].append(self.merge_source(probe))
+
+        manifest['finished_at'] = datetime.now().isoformat()
+        return manifest
+
+    def merge_source(self, probe):
+        """Attache une copie et fusionne ses tables dans l'ordre des clés étrangères"""
+        started = time.perf_counter()
+        source_path = probe['path']
+        self.progress(f"🔗 Fusion de {source_path}")
+
+        result = {'path': source_path, 'size': probe['size'], 'tables': {}, 'skipped': False}
+        self.conn.execute(f"ATTACH DATABASE ? AS {SOURCE_ALIAS}",
+                          (f"{Path(source_path).resolve().as_uri()}?mode=ro",))
+        try:
+            self._create_maps()
+            handlers = {
+                'ImportSessions': self._merge_by_id,
+                'Clients': self._merge_clients,
+                'FneInvoices': self._merge_invoices,
+                'FneInvoiceItems': self._merge_invoice_items,
+                'FneApiLogs': self._merge_api_logs,
+            }
+            for table in MERGE_TABLES:
+                bounds = probe['tables'].get(table)
+                if bounds is None or bounds['max_rowid'] is None:
+                    continue
+                stats = handlers[table](table, bounds)
+                result['tables'][table] = stats
+                self.progress(
+                    f"   ✅ {table}: {stats['inserted']} insérés, {stats['matched']} fusionnés, "
+                    f"{stats['skipped']} ignorés, {stats['updated']} mis à jour")
+        finally:
+            self.conn.execute("DROP TABLE IF EXISTS temp.client_map")
+            self.conn.execute("DROP TABLE IF EXISTS temp.invoice_map")
+            self.conn.execute(f"DETACH DATABASE {SOURCE_ALIAS}")
+
+        result['duration_seconds'] = round(time.perf_counter() - started, 3)
+        return result
+
+    # ------------------------------------------------------------------
+    # Tables de correspondance Id source -> Id central
+    # ------------------------------------------------------------------
+
+    def _create_maps(self):
+        for name in ("client_map", "invoice_map"):
+            self.conn.execute(f"DROP TABLE IF EXISTS temp.{name}")
+            self.conn.execute(f"""
+                CREATE TEMP TABLE {name} (
+                    src_id TEXT PRIMARY KEY,
+                    dst_id TEXT NOT NULL,
+                    is_new INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+
+    def _fill_map(self, map_table, select_sql, bounds):
+        """Remplit une table de correspondance par lots de rowid source"""
+        for low, high in self._rowid_batches(bounds):
+            self._in_transaction(
+                f"INSERT OR IGNORE INTO temp.{map_table} (src_id, dst_id, is_new) {select_sql}",
+                (low, high))
+
+    # ------------------------------------------------------------------
+    # Handlers par table
+    # ------------------------------------------------------------------
+
+    def _merge_by_id(self, table, bounds, select_overrides=None, extra_join="", extra_where="",
+                     match_join=None, match_where=None):
+        """
+        INSERT ... SELECT des lignes dont l'Id est absent de la base centrale
+
+        Les lignes fusionnées sont comptées explicitement (par défaut : même Id
+        dans la base centrale, avant l'insertion du lot) ; le reste des lignes
+        lues, ni insérées ni fusionnées, est compté comme ignoré.
+        """
+        columns = self._common_columns(table)
+        select_overrides = select_overrides or {}
+        select_list = ", ".join(select_overrides.get(c, f"s.[{c}]") for c in columns)
+        column_list = ", ".join(f"[{c}]" for c in columns)
+
+        stats = {'inserted': 0, 'matched': 0, 'skipped': 0, 'updated': 0}
+        match_sql = f"""
+            SELECT COUNT(*) FROM {SOURCE_ALIAS}.[{table}] s
+            {match_join or ""}
+            WHERE s.rowid BETWEEN ? AND ?
+              AND {match_where or f"EXISTS (SELECT 1 FROM main.[{table}] c WHERE c.Id = s.Id)"}
+        """
+        sql = f"""
+            INSERT INTO main.[{table}] ({column_list})
+            SELECT {select_list}
+            FROM {SOURCE_ALIAS}.[{table}] s
+            {extra_join}
+            WHERE s.rowid BETWEEN ? AND ?
+              AND NOT EXISTS (SELECT 1 FROM main.[{table}] c WHERE c.Id = s.Id)
+              {extra_where}
+        """
+        for low, high in self._rowid_batches(bounds):
+            stats['matched'] += self.conn.execute(match_sql, (low, high)).fetchone()[0]
+            stats['inserted'] += self._in_transaction(sql, (low, high))
+
+        read = self.conn.execute(
+            f"SELECT COUNT(*) FROM {SOURCE_ALIAS}.[{table}] WHERE rowid BETWEEN ? AND ?",
+            (bounds['min_rowid'], bounds['max_rowid'])).fetchone()[0]
+        stats['skipped'] = read - stats['inserted'] - stats['matched']
+        return stats
+
+    def _merge_clients(self, table, bounds):
+        self._fill_map("client_map", f"""
+            SELECT s.Id,
+                   COALESCE(
+                       (SELECT c.Id FROM main.Clients c WHERE c.ClientCode = s.ClientCode),
+                       (SELECT c.Id FROM main.Clients c
+                         WHERE s.ClientNcc IS NOT NULL AND s.ClientNcc <> ''
+                           AND c.ClientNcc = s.ClientNcc LIMIT 1),
+                       (SELECT c.Id FROM main.Clients c WHERE c.Id = s.Id),
+                       s.Id),
+                   NOT EXISTS (SELECT 1 FROM main.Clients c
+                                WHERE c.ClientCode = s.ClientCode
+                                   OR c.Id = s.Id
+                                   OR (s.ClientNcc IS NOT NULL AND s.ClientNcc <> ''
+                                       AND c.ClientNcc = s.ClientNcc))
+            FROM {SOURCE_ALIAS}.Clients s
+            WHERE s.rowid BETWEEN ? AND ?
+        """, bounds)
+
+        stats = self._insert_new_rows(table, bounds, "client_map")
+        if self.policy == POLICY_NEWEST:
+            stats['updated'] = self._update_newer(table, bounds, "client_map",
+                                                  keep_columns=("Id", "ClientCode"))
+        return stats
+
+    def _merge_invoices(self, table, bounds):
+        self._fill_map("invoice_map", f"""
+            SELECT s.Id,
+                   COALESCE(
+                       (SELECT c.Id FROM main.FneInvoices c
+                         WHERE s.FneReference IS NOT NULL AND s.FneReference <> ''
+                           AND c.FneReference = s.FneReference LIMIT 1),
+                       (SELECT c.Id FROM main.FneInvoices c WHERE c.Id = s.Id),
+                       s.Id),
+                   NOT EXISTS (SELECT 1 FROM main.FneInvoices c
+                                WHERE c.Id = s.Id
+                                   OR (s.FneReference IS NOT NULL AND s.FneReference <> ''
+                                       AND c.FneReference = s.FneReference))
+            FROM {SOURCE_ALIAS}.FneInvoices s
+            WHERE s.rowid BETWEEN ? AND ?
+        """, bounds)
+
+        overrides = {
+            'ClientId': "COALESCE((SELECT cm.dst_id FROM temp.client_map cm "
+                        "WHERE cm.src_id = s.ClientId), s.ClientId)",
+            'ParentInvoiceId': "COALESCE((SELECT pm.dst_id FROM temp.invoice_map pm "
+                               "WHERE pm.src_id = s.ParentInvoiceId), s.ParentInvoiceId)",
+        }
+        stats = self._insert_new_rows(table, bounds, "invoice_map", overrides)
+        if self.policy == POLICY_NEWEST:
+            stats['updated'] = self._update_newer(
+                table, bounds, "invoice_map",
+                keep_columns=("Id", "ClientId", "ParentInvoiceId", "ImportSessionId"))
+        return stats
+
+    def _merge_invoice_items(self, table, bounds):
+        # Les lignes d'une facture déjà présente ne sont pas dupliquées
+        return self._merge_by_id(
+            table, bounds,
+            select_overrides={'FneInvoiceId': "im.dst_id"},
+            extra_join="JOIN temp.invoice_map im ON im.src_id = s.FneInvoiceId",
+            extra_where="AND im.is_new = 1")
+
+    def _merge_api_logs(self, table, bounds):
+        return self._merge_by_id(
+            table, bounds,
+            select_overrides={
+                'FneInvoiceId': "COALESCE((SELECT im.dst_id FROM temp.invoice_map im "
+                                "WHERE im.src_id = s.FneInvoiceId), s.FneInvoiceId)",
+            })
+
+    # ------------------------------------------------------------------
+    # Primitives
+    # ------------------------------------------------------------------
+
+    def _insert_new_rows(self, table, bounds, map_table, select_overrides=None):
+        """Insère les lignes marquées nouvelles dans la table de correspondance"""
+        return self._merge_by_id(
+            table, bounds,
+            select_overrides=select_overrides,
+            extra_join=f"JOIN temp.{map_table} m ON m.src_id = s.Id",
+            extra_where="AND m.is_new = 1",
+            # Rapprochée d'une ligne centrale (code, NCC, référence FNE ou Id)
+            match_join=f"JOIN temp.{map_table} m ON m.src_id = s.Id "
+                       f"JOIN main.[{table}] c ON c.Id = m.dst_id",
+            match_where="m.is_new = 0")
+
+    def _update_newer(self, table, bounds, map_table, keep_columns):
+        """Politique newest : écrase la ligne centrale si la copie est plus récente"""
+        columns = [c for c in self._common_columns(table) if c not in keep_columns]
+        if not columns:
+            return 0
+
+        assignments = ", ".join(f"[{c}] = s.[{c}]" for c in columns)
+        sql = f"""
+            UPDATE main.[{table}] AS c
+            SET {assignments}
+            FROM (SELECT * FROM {SOURCE_ALIAS}.[{table}] WHERE rowid BETWEEN ? AND ?) s
+            JOIN temp.{map_table} m ON m.src_id = s.Id
+            WHERE c.Id = m.dst_id
+              AND m.is_new = 0
+              AND {_FRESHNESS.format(a='s')} > {_FRESHNESS.format(a='c')}
+        """
+        updated = 0
+        for low, high in self._rowid_batches(bounds):
+            updated += self._in_transaction(sql, (low, high))
+        return updated
+
+    def _in_transaction(self, sql, params):
+        """Exécute une instruction dans sa propre transaction courte"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            changed = self.conn.execute(sql, params).rowcount
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return max(changed, 0)
+
+    def _rowid_batches(self, bounds):
+        low, high = bounds['min_rowid'], bounds['max_rowid']
+        if low is None:
+            return
+        start = low
+        while start <= high:
+            end = min(start + self.batch_size - 1, high)
+            yield start, end
+            start = end + 1
+
+    def _common_columns(self, table):
+        central = _table_columns(self.conn, "main", table)
+        source = set(_table_columns(self.conn, SOURCE_ALIAS, table))
+        return [c for c in central if c in source]
+
+
+def write_manifest(manifest, central_path):
+    """Écrit le manifeste de fusion à côté de la base centrale"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    manifest_path = os.path.join(os.path.dirname(os.path.abspath(central_path)),
+                                 f"consolidation_manifest_{timestamp}.json")
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest_path
+
+
+def consolidate(sources=None, central_path=None, policy=POLICY_KEEP_CENTRAL,
+                batch_size=DEFAULT_BATCH_SIZE, workers=4, backup=True):
+    """Point d'entrée : sauvegarde, fusion de toutes les copies, manifeste"""
+    central_path = str(central_path or resolve_database_path())
+    if not os.path.exists(central_path):
+        print(f"❌ Base centrale introuvable: {central_path}")
+        return None
+
+    if sources is None:
+        sources = find_stray_databases(central_path)
+    if not sources:
+        print("✅ Aucune base dispersée à consolider")
+        return None
+
+    if backup:
+        from clean_databases import backup_database
+        backup_path = backup_database(central_path)
+        if not backup_path:
+            print("❌ Sauvegarde impossible, consolidation annulée")
+            return None
+        print(f"💾 Sauvegarde: {backup_path}")
+
+    started = time.perf_counter()
+    with DatabaseConsolidator(central_path, policy=policy, batch_size=batch_size,
+                              progress=print) as consolidator:
+        manifest = consolidator.merge_all(sources, workers=workers)
+    manifest['duration_seconds'] = round(time.perf_counter() - started, 3)
+
+    manifest_path = write_manifest(manifest, central_path)
+    print(f"📄 Manifeste: {manifest_path}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolidation des bases FNEV4 dispersées")
+    parser.add_argument("sources", nargs="*", help="Copies à fusionner (défaut: détection automatique)")
+    parser.add_argument("--central", help="Base centrale (défaut: chemin résolu)")
+    parser.add_argument("--policy", choices=CONFLICT_POLICIES, default=POLICY_KEEP_CENTRAL,
+                        help="Politique de conflit (défaut: central)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=4, help="Inspection parallèle des copies")
+    parser.add_argument("--no-backup", action="store_true", help="Ne pas sauvegarder la base centrale")
+    args = parser.parse_args()
+
+    print("🔀 FNEV4 - CONSOLIDATION DES BASES DE DONNÉES")
+    print("=" * 50)
+    consolidate(
+        sources=args.sources or None,
+        central_path=args.central,
+        policy=args.policy,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        backup=not args.no_backup,
+    )
+
+
+if __name__ == "__main__":
+    main()
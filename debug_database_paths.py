@@ -4,63 +4,34 @@ Script pour diagnostiquer les chemins de base de données utilisés par FNEV4
 """
 
 import os
-import sqlite3
-from pathlib import Path
+
+from fnev4_db import PROJECT_ROOT
+from fnev4_discovery import discover_databases
+from fnev4_stats import DEFAULT_MODE, MODES, format_rows, table_statistics
 
 def find_db_files():
-    """Trouve tous les fichiers FNEV4.db dans le projet"""
-    project_root = Path(r"C:\wamp64\www\FNEV4")
-    db_files = []
-    
+    """Trouve tous les fichiers FNEV4.db dans le projet (bin/ et data/ compris, sans doublon)"""
     print("🔍 Recherche des fichiers FNEV4.db...")
     
-    # Chercher dans tout le projet
-    for db_file in project_root.rglob("FNEV4.db"):
-        size = db_file.stat().st_size if db_file.exists() else 0
-        db_files.append({
-            'path': str(db_file),
-            'size': size,
-            'exists': db_file.exists()
-        })
-    
-    # Chercher dans les dossiers de build
-    for pattern in ["**/bin/**/FNEV4.db", "**/data/**/FNEV4.db"]:
-        for db_file in project_root.rglob(pattern):
-            size = db_file.stat().st_size if db_file.exists() else 0
-            db_files.append({
-                'path': str(db_file),
-                'size': size,
-                'exists': db_file.exists()
-            })
-    
-    return db_files
+    return [{
+        'path': db['path'],
+        'size': db['size'],
+        'exists': True
+    } for db in discover_databases(PROJECT_ROOT, pattern="FNEV4.db")]
 
-def check_db_content(db_path):
-    """Vérifie le contenu d'une base de données"""
+def check_db_content(db_path, mode=DEFAULT_MODE):
+    """
+    Vérifie le contenu d'une base de données
+    
+    mode: estimate (sqlite_stat1 / rowid, sans parcours), exact (COUNT(*)
+    parallèles) ou cached (exact, recalculé si la base a changé)
+    """
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Lister les tables
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [row[0] for row in cursor.fetchall()]
-        
-        content = {}
-        for table in tables:
-            if not table.startswith('sqlite_'):
-                try:
-                    cursor.execute(f"SELECT COUNT(*) FROM [{table}]")
-                    count = cursor.fetchone()[0]
-                    content[table] = count
-                except:
-                    content[table] = "Erreur"
-        
-        conn.close()
-        return content
+        return {table: format_rows(stats) for table, stats in table_statistics(db_path, mode).items()}
     except Exception as e:
         return f"Erreur: {e}"
 
-def main():
+def main(mode=DEFAULT_MODE):
     print("=" * 60)
     print("🔍 DIAGNOSTIC DES CHEMINS DE BASE DE DONNÉES FNEV4")
     print("=" * 60)
@@ -79,7 +50,7 @@ def main():
         print(f"   ✅ Existe: {db_info['exists']}")
         
         if db_info['exists'] and db_info['size'] > 0:
-            content = check_db_content(db_info['path'])
+            content = check_db_content(db_info['path'], mode)
             if isinstance(content, dict):
                 print(f"   📊 Tables:")
                 for table, count in content.items():
@@ -105,4 +76,10 @@ def main():
         print("⚠️  Aucune base de données existante avec des données")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Diagnostic des chemins de base de données FNEV4")
+    parser.add_argument("--stats", choices=MODES, default=DEFAULT_MODE,
+                        help="Comptage des tables: estimation, exact ou exact en cache")
+    args = parser.parse_args()
+    main(args.stats)
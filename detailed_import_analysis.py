@@ -4,6 +4,7 @@ ANALYSE DÉTAILLÉE DES RÉSULTATS D'IMPORT DGI
 Explication complète des succès, erreurs et ignorés basée sur la documentation officielle
 """
 
+import numpy as np
 import pandas as pd
 import os
 
@@ -21,6 +22,121 @@ def analyze_import_comprehensive():
     print("\n📊 FICHIER CORRIGÉ: test_import_dgi_v2.xlsx")  
     analyze_file("test_import_dgi_v2.xlsx", "CORRIGÉ avec NCC DGI conformes")
 
+# Bits des erreurs et avertissements par ligne (validate_clients)
+ERR_TEMPLATE = 1
+ERR_NCC_REQUIRED = 2
+ERR_NCC_LENGTH = 4
+ERR_NCC_FORBIDDEN = 8
+ERR_CODE_CLIENT = 16
+ERR_NOM = 32
+
+WARN_NCC_NUMERIC = 1
+WARN_NCC_LENGTH = 2
+WARN_NCC_MISSING = 4
+
+ERROR_MESSAGES = {
+    ERR_TEMPLATE: ("Template '{template}' invalide",),
+    ERR_NCC_REQUIRED: ("NCC obligatoire pour B2B (entreprises)",),
+    ERR_NCC_LENGTH: ("NCC longueur invalide: {ncc_length} (attendu: 8-11)",),
+    ERR_NCC_FORBIDDEN: ("NCC interdit pour B2C (particuliers)",),
+    ERR_CODE_CLIENT: ("Code Client obligatoire",),
+    ERR_NOM: ("Nom/Raison Sociale obligatoire",),
+}
+WARNING_MESSAGES = {
+    WARN_NCC_NUMERIC: ("NCC B2B purement numérique (format non-standard)",
+                       "Format DGI attendu: alphanumérique avec lettre finale",
+                       "Exemples conformes: 9502363N, 9606123E"),
+    WARN_NCC_LENGTH: ("NCC {template} longueur inhabituelle: {ncc_length}",),
+    WARN_NCC_MISSING: ("NCC absent pour {template}",),
+}
+
+VALID_TEMPLATES = ['B2B', 'B2C', 'B2G', 'B2F']
+NCC_MIN_LENGTH = 8
+NCC_MAX_LENGTH = 11
+DETAIL_ROWS = 50
+
+
+def _text_column(df, column):
+    # Même conversion que str(row[column]).strip() : une cellule vide devient 'nan'
+    return df[column].astype(str).str.strip()
+
+
+def validate_clients(df):
+    """
+    Valide toutes les lignes clients en une passe (masques pandas/NumPy)
+
+    Retourne un DataFrame aligné sur df : template, ncc, ncc_length et les
+    bitsets errors / warnings (constantes ERR_* / WARN_*).
+    """
+    template = _text_column(df, 'Template')
+    ncc = df['NCC'].where(df['NCC'].notna(), "").astype(str).str.strip()
+    ncc_length = ncc.str.len().to_numpy()
+
+    has_ncc = ncc_length > 0
+    numeric_ncc = ncc.str.isdigit().to_numpy()
+    bad_length = (ncc_length < NCC_MIN_LENGTH) | (ncc_length > NCC_MAX_LENGTH)
+    b2b = (template == 'B2B').to_numpy()
+    b2c = (template == 'B2C').to_numpy()
+    b2g_b2f = template.isin(['B2G', 'B2F']).to_numpy()
+
+    errors = np.zeros(len(df), dtype=np.uint8)
+    errors[~template.isin(VALID_TEMPLATES).to_numpy()] |= ERR_TEMPLATE
+    errors[b2b & ~has_ncc] |= ERR_NCC_REQUIRED
+    errors[b2b & has_ncc & ~numeric_ncc & bad_length] |= ERR_NCC_LENGTH
+    errors[b2c & has_ncc] |= ERR_NCC_FORBIDDEN
+    errors[(_text_column(df, 'Code Client').str.len() == 0).to_numpy()] |= ERR_CODE_CLIENT
+    errors[(_text_column(df, 'Nom/Raison Sociale').str.len() == 0).to_numpy()] |= ERR_NOM
+
+    warnings = np.zeros(len(df), dtype=np.uint8)
+    warnings[b2b & numeric_ncc] |= WARN_NCC_NUMERIC
+    warnings[b2g_b2f & has_ncc & bad_length] |= WARN_NCC_LENGTH
+    warnings[b2g_b2f & ~has_ncc] |= WARN_NCC_MISSING
+
+    return pd.DataFrame({'template': template, 'ncc': ncc, 'ncc_length': ncc_length,
+                         'errors': errors, 'warnings': warnings}, index=df.index)
+
+
+def summarize_validation(validation):
+    """Compteurs agrégés : succès / échecs prévus et lignes touchées par chaque bit"""
+    errors = validation['errors'].to_numpy()
+    warnings = validation['warnings'].to_numpy()
+    return {
+        'total': len(validation),
+        'success': int(np.count_nonzero(errors == 0)),
+        'failed': int(np.count_nonzero(errors)),
+        'with_warnings': int(np.count_nonzero(warnings)),
+        'errors': {bit: int(np.count_nonzero(errors & bit)) for bit in ERROR_MESSAGES},
+        'warnings': {bit: int(np.count_nonzero(warnings & bit)) for bit in WARNING_MESSAGES},
+    }
+
+
+def _messages(bitset, catalog, **values):
+    return [message.format(**values) for bit, messages in catalog.items() if bitset & bit for message in messages]
+
+
+def describe_row(template, ncc, errors, warnings):
+    """Traduit les bitsets d'une ligne en messages (errors / warnings / validations)"""
+    values = {'template': template, 'ncc_length': len(ncc)}
+    validations = []
+    if not errors & ERR_TEMPLATE:
+        validations.append(f"Template '{template}' valide")
+    if template == 'B2B' and ncc and not errors & ERR_NCC_LENGTH and not warnings & WARN_NCC_NUMERIC:
+        validations.append("NCC B2B format valide")
+    elif template == 'B2C' and not ncc:
+        validations.append("NCC absent (correct pour B2C)")
+    elif template in ['B2G', 'B2F'] and ncc and not warnings & WARN_NCC_LENGTH:
+        validations.append(f"NCC {template} présent et valide")
+    if not errors & ERR_CODE_CLIENT:
+        validations.append("Code Client présent")
+    if not errors & ERR_NOM:
+        validations.append("Nom/Raison Sociale présent")
+    return {
+        'errors': _messages(errors, ERROR_MESSAGES, **values),
+        'warnings': _messages(warnings, WARNING_MESSAGES, **values),
+        'validations': validations
+    }
+
+
 def analyze_file(filename, description):
     """Analyse un fichier Excel spécifique"""
     
@@ -32,24 +148,29 @@ def analyze_file(filename, description):
         df = pd.read_excel(filename, sheet_name='Clients')
         print(f"\n🎯 {description}")
         print(f"   📋 {len(df)} lignes de données • {len(df.columns)} colonnes")
+
+        # Une seule validation de toutes les lignes : le détail et le résumé en découlent
+        validation = validate_clients(df)
+        summary = summarize_validation(validation)
         
         print(f"\n{'=' * 60}")
         print("ANALYSE LIGNE PAR LIGNE")
         print(f"{'=' * 60}")
         
-        for index, row in df.iterrows():
+        detail = validation.head(DETAIL_ROWS)
+        for index, checked in zip(detail.index, detail.itertuples(index=False)):
             ligne_num = index + 2
-            code_client = str(row['Code Client']).strip()
-            nom = str(row['Nom/Raison Sociale']).strip()
-            template = str(row['Template']).strip()
-            ncc = str(row['NCC']).strip() if pd.notna(row['NCC']) else ""
+            code_client = str(df.at[index, 'Code Client']).strip()
+            nom = str(df.at[index, 'Nom/Raison Sociale']).strip()
+            template = checked.template
+            ncc = checked.ncc
             
             print(f"\n🔸 LIGNE {ligne_num}: {code_client} - {nom}")
             print(f"   📋 Template: {template}")
             print(f"   🆔 NCC: '{ncc}' ({len(ncc)} car.)" if ncc else "   🆔 NCC: [VIDE]")
             
             # Analyse selon règles DGI
-            result = analyze_dgi_rules(template, ncc, code_client, nom)
+            result = describe_row(template, ncc, checked.errors, checked.warnings)
             
             print(f"   📊 VALIDATION DGI:")
             if result['errors']:
@@ -64,8 +185,8 @@ def analyze_file(filename, description):
                     
             if result['validations']:
                 print(f"   🟢 VALIDATIONS RÉUSSIES ({len(result['validations'])}):")
-                for validation in result['validations']:
-                    print(f"      ✅ {validation}")
+                for validation_message in result['validations']:
+                    print(f"      ✅ {validation_message}")
             
             # Prédiction du résultat
             if result['errors']:
@@ -77,27 +198,30 @@ def analyze_file(filename, description):
             
             print(f"   🎯 PRÉDICTION: {prediction}")
             print(f"   💡 RAISON: {reason}")
+
+        if len(df) > DETAIL_ROWS:
+            print(f"\n   … {len(df) - DETAIL_ROWS} autres lignes (voir le résumé)")
             
         # Résumé prédictif
         print(f"\n{'=' * 60}")
         print("RÉSUMÉ PRÉDICTIF")
         print(f"{'=' * 60}")
         
-        total_lines = len(df)
-        predicted_success = sum(1 for _, row in df.iterrows() 
-                              if not analyze_dgi_rules(
-                                  str(row['Template']).strip(),
-                                  str(row['NCC']).strip() if pd.notna(row['NCC']) else "",
-                                  str(row['Code Client']).strip(),
-                                  str(row['Nom/Raison Sociale']).strip()
-                              )['errors'])
-        predicted_errors = total_lines - predicted_success
+        total_lines = summary['total']
+        predicted_success = summary['success']
+        predicted_errors = summary['failed']
         
         print(f"📊 PRÉDICTIONS:")
         print(f"   • Total lignes: {total_lines}")
         print(f"   • Succès prévus: {predicted_success}")
         print(f"   • Erreurs prévues: {predicted_errors}")
         print(f"   • Ignorés possibles: 0-1 (en-tête ou doublons)")
+        for bit, count in summary['errors'].items():
+            if count:
+                print(f"   ❌ {count}x {ERROR_MESSAGES[bit][0].format(template='…', ncc_length='…')}")
+        for bit, count in summary['warnings'].items():
+            if count:
+                print(f"   ⚠️  {count}x {WARNING_MESSAGES[bit][0].format(template='…', ncc_length='…')}")
         
         # Explication des résultats réels observés
         if filename == "test_import_dgi.xlsx":
@@ -118,63 +242,13 @@ def analyze_file(filename, description):
         print(f"❌ Erreur analyse {filename}: {e}")
 
 def analyze_dgi_rules(template, ncc, code_client, nom):
-    """Analyse selon les règles DGI officielles"""
-    
-    result = {
-        'errors': [],
-        'warnings': [],
-        'validations': []
-    }
-    
-    # 1. Validation Template
-    valid_templates = ['B2B', 'B2C', 'B2G', 'B2F']
-    if template not in valid_templates:
-        result['errors'].append(f"Template '{template}' invalide")
-    else:
-        result['validations'].append(f"Template '{template}' valide")
-    
-    # 2. Validation NCC selon Template (règles officielles DGI)
-    if template == 'B2B':
-        if not ncc:
-            result['errors'].append("NCC obligatoire pour B2B (entreprises)")
-        else:
-            # Vérification format NCC B2B selon exemples DGI
-            if ncc.isdigit():
-                result['warnings'].append("NCC B2B purement numérique (format non-standard)")
-                result['warnings'].append("Format DGI attendu: alphanumérique avec lettre finale")
-                result['warnings'].append("Exemples conformes: 9502363N, 9606123E")
-            elif len(ncc) < 8 or len(ncc) > 11:
-                result['errors'].append(f"NCC longueur invalide: {len(ncc)} (attendu: 8-11)")
-            else:
-                result['validations'].append("NCC B2B format valide")
-    
-    elif template == 'B2C':
-        if ncc:
-            result['errors'].append("NCC interdit pour B2C (particuliers)")
-        else:
-            result['validations'].append("NCC absent (correct pour B2C)")
-    
-    elif template in ['B2G', 'B2F']:
-        if ncc:
-            if len(ncc) < 8 or len(ncc) > 11:
-                result['warnings'].append(f"NCC {template} longueur inhabituelle: {len(ncc)}")
-            else:
-                result['validations'].append(f"NCC {template} présent et valide")
-        else:
-            result['warnings'].append(f"NCC absent pour {template}")
-    
-    # 3. Validation champs obligatoires
-    if not code_client:
-        result['errors'].append("Code Client obligatoire")
-    else:
-        result['validations'].append("Code Client présent")
-        
-    if not nom:
-        result['errors'].append("Nom/Raison Sociale obligatoire")
-    else:
-        result['validations'].append("Nom/Raison Sociale présent")
+    """Analyse selon les règles DGI officielles (une ligne, via validate_clients)"""
     
-    return result
+    validation = validate_clients(pd.DataFrame({
+        'Template': [template], 'NCC': [ncc], 'Code Client': [code_client], 'Nom/Raison Sociale': [nom]
+    }))
+    row = validation.iloc[0]
+    return describe_row(row['template'], row['ncc'], int(row['errors']), int(row['warnings']))
 
 def explain_ncc_format():
     """Explication du format NCC selon documentation DGI"""
@@ -7,55 +7,18 @@ Détecte toutes les instances et propose une consolidation
 
 import os
 import json
-from pathlib import Path
-import sqlite3
-from datetime import datetime
 
-def find_all_databases():
-    """Trouve toutes les bases de données FNEV4"""
-    
-    project_root = Path("C:/wamp64/www/FNEV4")
-    databases = []
-    
-    # Chercher tous les fichiers .db
-    for db_file in project_root.rglob("*.db"):
-        if "FNEV4" in db_file.name:
-            try:
-                # Obtenir info sur le fichier
-                stat = db_file.stat()
-                size = stat.st_size
-                modified = datetime.fromtimestamp(stat.st_mtime)
-                
-                # Vérifier si c'est une vraie base SQLite
-                is_valid = False
-                table_count = 0
-                try:
-                    with sqlite3.connect(str(db_file)) as conn:
-                        cursor = conn.cursor()
-                        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-                        tables = cursor.fetchall()
-                        table_count = len(tables)
-                        is_valid = table_count > 0
-                except:
-                    pass
-                
-                databases.append({
-                    'path': str(db_file),
-                    'relative_path': str(db_file.relative_to(project_root)),
-                    'size': size,
-                    'modified': modified,
-                    'is_valid': is_valid,
-                    'table_count': table_count
-                })
-            except Exception as e:
-                print(f"❌ Erreur lecture {db_file}: {e}")
-    
-    return databases
+from fnev4_db import PROJECT_ROOT, resolve_database_path
+from fnev4_discovery import discover_databases
+
+def find_all_databases(refresh=False):
+    """Trouve toutes les bases de données FNEV4 (parcours unique, sondage parallèle en cache)"""
+    return discover_databases(PROJECT_ROOT, pattern="*FNEV4*.db", refresh=refresh)
 
 def analyze_config_files():
     """Analyse les fichiers de configuration"""
     
-    project_root = Path("C:/wamp64/www/FNEV4")
+    project_root = PROJECT_ROOT
     configs = []
     
     # Chercher tous les appsettings.json
@@ -128,7 +91,7 @@ def main():
         
         print("🎯 ACTIONS RECOMMANDÉES:")
         print("1. ✅ Consolider toutes les données vers:")
-        print(f"      📁 C:/wamp64/www/FNEV4/data/FNEV4.db")
+        print(f"      📁 {resolve_database_path()}")
         print()
         print("2. ✅ Standardiser tous les appsettings.json:")
         print('      "DefaultConnection": "Data\\\\FNEV4.db"')
@@ -99,6 +99,14 @@ def check_real_folder_status():
                 print(f"  📄 Fichiers: {file_count}")
             except:
                 print(f"  📄 Fichiers: Non accessible")
+
+            if folder_key == "LogsFolder":
+                from fnev4_logs import analyze_logs
+                log_report = analyze_logs(full_path, top=3)
+                errors = sum(log_report["levels"].get(level, 0) for level in ("ERROR", "CRITICAL"))
+                print(f"  📜 Entrées de log: {log_report['lines']} (dont {errors} erreurs)")
+                for signature in log_report["signatures"]:
+                    print(f"     ❌ {signature['count']}x {signature['signature']}")
         
         results["folder_analysis"][folder_key] = {
             "path": full_path,
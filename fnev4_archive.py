@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Archivage mensuel des journaux (FneApiLogs, LogEntries)
+================================================================
+
+FneApiLogs garde une ligne par appel de certification, corps de requête et
+de réponse compris : la table grossit sans fin et alourdit chaque
+sauvegarde et chaque contrôle d'intégrité.
+
+Les mois clos (antérieurs au mois courant, ou à `before_month`) sont
+déplacés dans une base par mois, Data/Archive/FNEV4_logs_YYYYMM.db :
+
+- la base d'archive est attachée à la connexion d'écriture ; les lignes du
+  mois sont repérées par l'index de date de la table (IX_FneApiLogs_Timestamp ;
+  LogEntries n'en a pas d'origine, IX_LogEntries_Timestamp est créé au
+  premier archivage, sans quoi chaque lot balaierait toute la table)
+- en WAL, une transaction sur plusieurs bases n'est atomique que base par
+  base : chaque lot est donc copié dans l'archive (INSERT OR IGNORE sur
+  l'Id) et validé, puis, dans une seconde transaction sur la base
+  principale, seuls les Id présents dans l'archive sont supprimés. Une
+  interruption entre les deux laisse le lot dans les deux bases, jamais
+  dans aucune ; la reprise le termine sans doublon
+- une colonne ajoutée à la base principale est ajoutée aux archives
+  (ALTER TABLE) avant la copie ; les vues de lecture complètent les
+  archives plus anciennes par NULL
+- compression optionnelle des colonnes de contenu (zlib, ou zstd si le
+  paquet zstandard est installé) ; la lecture reconnaît le format à son
+  en-tête et décompresse à la volée
+
+Lecture : open_with_archives attache les archives d'une période et crée des
+vues temporaires {table}_All (UNION ALL base principale + archives) ;
+search_logs parcourt les mois un par un sans limite d'ATTACH.
+"""
+
+import glob
+import os
+import re
+import sqlite3
+import time
+import zlib
+from datetime import date
+
+from fnev4_db import connect, resolve_database_path
+
+try:
+    import zstandard
+except ImportError:  # zstd optionnel, zlib reste disponible
+    zstandard = None
+
+COMPRESSION_NONE = "none"
+COMPRESSION_ZLIB = "zlib"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_ZSTD)
+
+# Table -> colonne de date, son index et colonnes de contenu compressibles
+ARCHIVE_TABLES = {
+    "FneApiLogs": {
+        "time": "Timestamp",
+        "index": "IX_FneApiLogs_Timestamp",
+        "payload": ("RequestBody", "RequestHeaders", "ResponseBody", "ResponseHeaders", "ErrorStackTrace"),
+    },
+    "LogEntries": {
+        "time": "Timestamp",
+        "index": "IX_LogEntries_Timestamp",
+        "payload": ("Message", "ExceptionDetails"),
+    },
+}
+
+ARCHIVE_PREFIX = "FNEV4_logs_"
+DEFAULT_BATCH_SIZE = 2000
+DEFAULT_BATCH_PAUSE = 0.01
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_MONTH_PATTERN = re.compile(rf"{ARCHIVE_PREFIX}(\d{{6}})\.db$")
+
+
+def default_archive_dir(db_path=None):
+    """Data/Archive à côté de la base"""
+    db_path = db_path or resolve_database_path()
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "Archive")
+
+
+def archive_path(archive_dir, month):
+    """Chemin de l'archive du mois 'YYYY-MM'"""
+    return os.path.join(archive_dir, f"{ARCHIVE_PREFIX}{month.replace('-', '')}.db")
+
+
+def list_archives(archive_dir):
+    """{'YYYY-MM': chemin} des archives présentes, par mois croissant"""
+    archives = {}
+    for path in glob.glob(os.path.join(archive_dir, f"{ARCHIVE_PREFIX}*.db")):
+        match = _MONTH_PATTERN.search(os.path.basename(path))
+        if match:
+            archives[f"{match.group(1)[:4]}-{match.group(1)[4:]}"] = path
+    return dict(sorted(archives.items()))
+
+
+def _next_month(month):
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12}-{mon % 12 + 1:02d}"
+
+
+def _pack_function(compression):
+    if compression == COMPRESSION_ZSTD:
+        compressor = zstandard.ZstdCompressor(level=9)
+        compress = compressor.compress
+    else:
+        def compress(data):
+            return zlib.compress(data, 6)
+
+    def pack(value):
+        # Les petits contenus ne gagnent rien : laissés en texte
+        if not isinstance(value, str) or len(value) < 64:
+            return value
+        return compress(value.encode("utf-8"))
+
+    return pack
+
+
+def unpack_payload(value):
+    """Texte d'origine d'une colonne de contenu archivée (compressée ou non)"""
+    if not isinstance(value, bytes):
+        return value
+    if value.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError("Archive compressée en zstd : installer le paquet 'zstandard'")
+        return zstandard.ZstdDecompressor().decompress(value).decode("utf-8")
+    return zlib.decompress(value).decode("utf-8")
+
+
+def _table_exists(conn, schema, table):
+    return conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type='table' AND name=?",
+                        (table,)).fetchone() is not None
+
+
+def _columns(conn, table, schema="main"):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info([{table}])")]
+
+
+def _ensure_time_index(conn, table, spec):
+    """Index sur la colonne de date s'il manque (LogEntries n'en a pas d'origine)"""
+    for (name,) in conn.execute("SELECT name FROM pragma_index_list(?)", (table,)).fetchall():
+        first = conn.execute("SELECT name FROM pragma_index_info(?) WHERE seqno = 0", (name,)).fetchone()
+        if first and first[0] == spec["time"]:
+            return
+    conn.execute(f"CREATE INDEX IF NOT EXISTS main.[{spec['index']}] ON [{table}] ([{spec['time']}])")
+
+
+def _closed_months(conn, table, time_column, before_month):
+    """Mois présents avant `before_month`, par sauts sur l'index de date (_ensure_time_index)"""
+    months = []
+    bound = ""
+    while True:
+        first = conn.execute(f"SELECT MIN([{time_column}]) FROM [{table}] WHERE [{time_column}] >= ?",
+                             (bound,)).fetchone()[0]
+        if first is None or first[:7] >= before_month:
+            return months
+        months.append(first[:7])
+        bound = _next_month(first[:7])
+
+
+def _ensure_archive_table(conn, table, time_column):
+    """
+    Table d'archive sans contraintes (les clés étrangères pointent vers la base principale)
+
+    Les colonnes ajoutées depuis à la table principale y sont ajoutées, sans
+    contrainte : les lignes déjà archivées les ont à NULL.
+    """
+    if not _table_exists(conn, "arch", table):
+        conn.execute(f"CREATE TABLE arch.[{table}] AS SELECT * FROM main.[{table}] WHERE 0")
+        conn.execute(f"CREATE UNIQUE INDEX arch.[UX_{table}_Id] ON [{table}] (Id)")
+        conn.execute(f"CREATE INDEX arch.[IX_{table}_{time_column}] ON [{table}] ([{time_column}])")
+        return
+    archived = set(_columns(conn, table, "arch"))
+    for _, name, declared_type, *_ in conn.execute(f"PRAGMA main.table_info([{table}])").fetchall():
+        if name not in archived:
+            conn.execute(f"ALTER TABLE arch.[{table}] ADD COLUMN [{name}] {declared_type}")
+
+
+def _copy_batch(conn, table, time_column, params, batch_size, column_list, select):
+    """Étape 1 : repère un lot et le copie dans l'archive (seule base écrite)"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM temp._archive_batch")
+        conn.execute(f"""
+            INSERT INTO temp._archive_batch
+            SELECT rowid FROM main.[{table}]
+            WHERE [{time_column}] >= ? AND [{time_column}] < ?
+            LIMIT ?
+        """, (*params, batch_size))
+        count = conn.execute("SELECT COUNT(*) FROM temp._archive_batch").fetchone()[0]
+        if count:
+            conn.execute(f"""
+                INSERT OR IGNORE INTO arch.[{table}] ({column_list})
+                SELECT {select} FROM main.[{table}]
+                WHERE rowid IN (SELECT rid FROM temp._archive_batch)
+            """)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return count
+
+
+def _delete_archived(conn, table):
+    """Étape 2 : supprime du lot les seules lignes dont l'Id est dans l'archive validée"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        deleted = conn.execute(f"""
+            DELETE FROM main.[{table}]
+            WHERE rowid IN (SELECT rid FROM temp._archive_batch)
+              AND Id IN (SELECT Id FROM arch.[{table}])
+        """).rowcount
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return deleted
+
+
+def _archive_month(conn, table, spec, month, batch_size, batch_pause, compressed):
+    time_column = spec["time"]
+    columns = _columns(conn, table)
+    select = ", ".join(f"_fnev4_pack([{c}])" if compressed and c in spec["payload"] else f"[{c}]"
+                       for c in columns)
+    column_list = ", ".join(f"[{c}]" for c in columns)
+    params = (f"{month}-01", f"{_next_month(month)}-01")
+    moved = 0
+
+    while True:
+        count = _copy_batch(conn, table, time_column, params, batch_size, column_list, select)
+        if not count:
+            return moved
+        deleted = _delete_archived(conn, table)
+        if deleted != count:
+            # Lot non retrouvé dans l'archive : arrêter plutôt que boucler ou perdre des lignes
+            raise RuntimeError(f"{table} {month}: {count - deleted} ligne(s) absentes de l'archive après copie, "
+                               f"laissées dans la base principale")
+        moved += deleted
+        if batch_pause:
+            time.sleep(batch_pause)
+
+
+def archive_logs(db_path=None, archive_dir=None, before_month=None, tables=None,
+                 compression=COMPRESSION_NONE, batch_size=DEFAULT_BATCH_SIZE,
+                 batch_pause=DEFAULT_BATCH_PAUSE, progress=None):
+    """
+    Déplace les mois clos des tables de journaux vers les archives mensuelles
+
+    `before_month` ('YYYY-MM', défaut: mois courant) : seuls les mois
+    strictement antérieurs sont archivés. Retourne un dict :
+    moved ({table: {mois: lignes}}), archives (chemins écrits), seconds.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compression inconnue: {compression} (attendu: {', '.join(COMPRESSIONS)})")
+    if compression == COMPRESSION_ZSTD and zstandard is None:
+        raise RuntimeError("Compression zstd indisponible : installer le paquet 'zstandard'")
+
+    db_path = str(db_path or resolve_database_path())
+    archive_dir = archive_dir or default_archive_dir(db_path)
+    before_month = before_month or date.today().strftime("%Y-%m")
+    started = time.perf_counter()
+
+    conn = connect(db_path, readonly=False)
+    conn.isolation_level = None
+    compressed = compression != COMPRESSION_NONE
+    if compressed:
+        conn.create_function("_fnev4_pack", 1, _pack_function(compression), deterministic=True)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS _archive_batch (rid INTEGER PRIMARY KEY)")
+
+    moved = {}
+    written = set()
+    try:
+        for table in tables or ARCHIVE_TABLES:
+            spec = ARCHIVE_TABLES[table]
+            if not _table_exists(conn, "main", table):
+                continue
+            _ensure_time_index(conn, table, spec)
+            for month in _closed_months(conn, table, spec["time"], before_month):
+                os.makedirs(archive_dir, exist_ok=True)
+                path = archive_path(archive_dir, month)
+                conn.execute("ATTACH DATABASE ? AS arch", (path,))
+                try:
+                    _ensure_archive_table(conn, table, spec["time"])
+                    rows = _archive_month(conn, table, spec, month, batch_size, batch_pause, compressed)
+                finally:
+                    conn.execute("DETACH DATABASE arch")
+                moved.setdefault(table, {})[month] = rows
+                written.add(path)
+                if progress:
+                    progress(table, month, rows)
+
+        if written:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+    return {
+        'moved': moved,
+        'archives': sorted(written),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def _months_between(archives, start_month, end_month):
+    return {month: path for month, path in archives.items()
+            if (not start_month or month >= start_month) and (not end_month or month <= end_month)}
+
+
+def _view_select(columns, available, payload):
+    # Colonnes de la table principale, dans son ordre ; absentes d'une ancienne archive : NULL
+    available = set(available)
+    return ", ".join(f"log_payload([{c}]) AS [{c}]" if c in payload and c in available
+                     else f"[{c}]" if c in available else f"NULL AS [{c}]" for c in columns)
+
+
+def open_with_archives(db_path=None, archive_dir=None, start_month=None, end_month=None, tables=None):
+    """
+    Connexion lecture seule avec les archives de la période attachées
+
+    Pour chaque table archivée, une vue temporaire {table}_All réunit la
+    base principale et les archives (UNION ALL), colonnes de contenu
+    décompressées. Le nombre d'archives attachables est borné par SQLite
+    (SQLITE_LIMIT_ATTACHED, 10 par défaut) : réduire la période au besoin,
+    ou passer par search_logs.
+    """
+    db_path = str(db_path or resolve_database_path())
+    archive_dir = archive_dir or default_archive_dir(db_path)
+    archives = _months_between(list_archives(archive_dir), start_month, end_month)
+
+    conn = connect(db_path, readonly=True)
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if len(archives) > limit:
+        conn.close()
+        raise ValueError(f"{len(archives)} archives pour la période, SQLite n'en attache que {limit} : "
+                         f"réduire la période ou utiliser search_logs")
+    conn.create_function("log_payload", 1, unpack_payload, deterministic=True)
+
+    schemas = []
+    for month, path in archives.items():
+        schema = f"logs_{month.replace('-', '')}"
+        conn.execute("ATTACH DATABASE ? AS " + schema, (f"file:{path}?mode=ro",))
+        schemas.append(schema)
+
+    # Vues temporaires : la connexion est en mode=ro, query_only ne protège rien de plus ici
+    conn.execute("PRAGMA query_only = 0")
+    try:
+        for table in tables or ARCHIVE_TABLES:
+            if not _table_exists(conn, "main", table):
+                continue
+            columns = _columns(conn, table)
+            payload = ARCHIVE_TABLES[table]["payload"]
+            parts = [f"SELECT {_view_select(columns, columns, payload)} FROM main.[{table}]"]
+            parts += [f"SELECT {_view_select(columns, _columns(conn, table, schema), payload)} "
+                      f"FROM {schema}.[{table}]" for schema in schemas if _table_exists(conn, schema, table)]
+            conn.execute(f"DROP VIEW IF EXISTS temp.[{table}_All]")
+            conn.execute(f"CREATE TEMP VIEW [{table}_All] AS {' UNION ALL '.join(parts)}")
+    finally:
+        conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+def search_logs(table, where="1=1", params=(), db_path=None, archive_dir=None,
+                start_month=None, end_month=None, include_main=True):
+    """
+    Lignes de `table` (archives puis base principale) vérifiant `where`
+
+    Générateur de dicts, colonnes de contenu décompressées. Une archive
+    ouverte à la fois : pas de limite sur le nombre de mois parcourus.
+    """
+    if table not in ARCHIVE_TABLES:
+        raise ValueError(f"Table non archivée: {table}")
+    db_path = str(db_path or resolve_database_path())
+    archive_dir = archive_dir or default_archive_dir(db_path)
+    payload = ARCHIVE_TABLES[table]["payload"]
+
+    sources = list(_months_between(list_archives(archive_dir), start_month, end_month).values())
+    if include_main:
+        sources.append(db_path)
+
+    for path in sources:
+        conn = connect(path, readonly=True)
+        try:
+            if not _table_exists(conn, "main", table):
+                continue
+            cursor = conn.execute(f"SELECT * FROM [{table}] WHERE {where}", params)
+            names = [column[0] for column in cursor.description]
+            for row in cursor:
+                yield {name: unpack_payload(value) if name in payload else value
+                       for name, value in zip(names, row)}
+        finally:
+            conn.close()
+
+
+def print_progress(table, month, rows):
+    print(f"   📦 {table} {month}: {rows:,} lignes archivées")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archivage mensuel des journaux FNEV4")
+    parser.add_argument("action", choices=["archive", "list"])
+    parser.add_argument("--db", help="Base (défaut: chemin résolu)")
+    parser.add_argument("--archive-dir", help="Dossier des archives (défaut: Data/Archive)")
+    parser.add_argument("--before", help="Archiver les mois antérieurs à YYYY-MM (défaut: mois courant)")
+    parser.add_argument("--table", action="append", choices=list(ARCHIVE_TABLES))
+    parser.add_argument("--compression", choices=COMPRESSIONS, default=COMPRESSION_NONE)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    print("🗄️  FNEV4 - ARCHIVAGE DES JOURNAUX")
+    print("=" * 50)
+    archive_dir = args.archive_dir or default_archive_dir(args.db)
+    if args.action == "archive":
+        result = archive_logs(args.db, archive_dir, args.before, args.table, args.compression,
+                              args.batch_size, progress=print_progress)
+        total = sum(sum(months.values()) for months in result['moved'].values())
+        print(f"✅ {total:,} lignes archivées dans {len(result['archives'])} fichiers ({result['seconds']}s)")
+    else:
+        for month, path in list_archives(archive_dir).items():
+            print(f"   {month}: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} Mo)")
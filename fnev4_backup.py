@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Sauvegardes en ligne et différentielles
+================================================
+
+Remplace la copie de fichier (shutil.copy2) par l'API de sauvegarde SQLite :
+la copie se fait par paquets de pages pendant que l'application continue
+d'écrire, et le résultat est toujours une base cohérente.
+
+Deux modes :
+- complet      : un fichier .db autonome dans Data/Backup
+- différentiel : l'instantané est découpé en blocs de pages, chaque bloc est
+                 haché (SHA-256) et rangé une seule fois dans un magasin
+                 adressé par contenu (Data/Backup/chunks). Un manifeste JSON
+                 liste les blocs d'une sauvegarde ; seuls les blocs modifiés
+                 depuis la sauvegarde précédente occupent de la place.
+
+Compression optionnelle des blocs : zstd (paquet zstandard) ou gzip.
+
+Le dépôt des blocs d'une sauvegarde différentielle et l'écriture de son
+manifeste se font sous le verrou du magasin (Data/Backup/.backup.lock),
+comme prune_chunks : un nettoyage ne peut pas supprimer un bloc qu'une
+sauvegarde en cours vient d'écrire ou de réutiliser avant que son manifeste
+ne le référence.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from fnev4_db import connect, resolve_database_path
+
+try:
+    import zstandard
+except ImportError:  # zstd optionnel, gzip reste disponible
+    zstandard = None
+
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSION_EXTENSIONS = {COMPRESSION_NONE: "", COMPRESSION_GZIP: ".gz", COMPRESSION_ZSTD: ".zst"}
+
+# Pages copiées par étape de l'API backup, et pause entre deux étapes
+DEFAULT_PAGES_PER_STEP = 1024
+DEFAULT_STEP_PAUSE = 0.002
+# Pages par bloc du magasin différentiel
+DEFAULT_CHUNK_PAGES = 256
+# Verrou du magasin : attente maximale, et âge au-delà duquel il est tenu pour abandonné
+LOCK_NAME = ".backup.lock"
+DEFAULT_LOCK_TIMEOUT = 600
+STALE_LOCK_SECONDS = 6 * 3600
+
+
+def default_backup_dir(db_path=None):
+    """Data/Backup à côté de la base (PathSettings.BackupFolder)"""
+    db_path = db_path or resolve_database_path()
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "Backup")
+
+
+def online_backup(db_path, dest_path, pages_per_step=DEFAULT_PAGES_PER_STEP,
+                  step_pause=DEFAULT_STEP_PAUSE, progress=None):
+    """
+    Copie la base avec sqlite3.Connection.backup, par étapes de pages
+
+    La pause entre deux étapes laisse le verrou à l'application WPF ;
+    en WAL les écrivains ne sont de toute façon pas bloqués.
+    """
+    def _step(status, remaining, total):
+        if progress:
+            progress(total - remaining, total)
+        if step_pause and remaining:
+            time.sleep(step_pause)
+
+    source = connect(db_path, readonly=True)
+    dest = sqlite3.connect(dest_path)
+    try:
+        source.backup(dest, pages=pages_per_step, progress=_step)
+    finally:
+        dest.close()
+        source.close()
+    return dest_path
+
+
+def full_backup(db_path=None, backup_dir=None, **options):
+    """Sauvegarde complète horodatée FNEV4_backup_<timestamp>.db"""
+    db_path = db_path or resolve_database_path()
+    backup_dir = backup_dir or default_backup_dir(db_path)
+    os.makedirs(backup_dir, exist_ok=True)
+
+    backup_path = os.path.join(backup_dir, f"FNEV4_backup_{_unique_timestamp()}.db")
+    # Création exclusive : une sauvegarde n'en écrase jamais une autre
+    with open(backup_path, 'x'):
+        pass
+    return online_backup(db_path, backup_path, **options)
+
+
+def _unique_timestamp():
+    # Microsecondes + pid : deux sauvegardes dans la même seconde ne partagent ni instantané ni manifeste
+    return f"{datetime.now():%Y%m%d_%H%M%S_%f}_{os.getpid()}"
+
+
+@contextmanager
+def store_lock(backup_dir, timeout=DEFAULT_LOCK_TIMEOUT):
+    """
+    Verrou exclusif du magasin de blocs (fichier créé en O_EXCL, Windows compris)
+
+    Un verrou plus vieux que STALE_LOCK_SECONDS est celui d'un processus
+    mort : il est retiré.
+    """
+    lock_path = os.path.join(str(backup_dir), LOCK_NAME)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue   # verrou libéré entre-temps
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Magasin de sauvegarde verrouillé depuis plus de {timeout}s: {lock_path}")
+            time.sleep(0.1)
+    try:
+        os.write(fd, f"{os.getpid()} {datetime.now().isoformat()}".encode("ascii"))
+    finally:
+        os.close(fd)
+    try:
+        yield lock_path
+    finally:
+        os.remove(lock_path)
+
+
+class ChunkStore:
+    """Magasin de blocs adressés par leur SHA-256 (chunks/ab/abcdef...)"""
+
+    def __init__(self, root, compression=COMPRESSION_NONE):
+        if compression == COMPRESSION_ZSTD and zstandard is None:
+            raise RuntimeError("Compression zstd indisponible : installer le paquet 'zstandard'")
+        if compression not in COMPRESSION_EXTENSIONS:
+            raise ValueError(f"Compression inconnue: {compression}")
+
+        self.root = Path(root)
+        self.compression = compression
+
+    def _path(self, digest, compression):
+        return self.root / digest[:2] / f"{digest}{COMPRESSION_EXTENSIONS[compression]}"
+
+    def find(self, digest):
+        """Chemin et compression d'un bloc déjà stocké, quelle que soit sa compression"""
+        for compression in COMPRESSION_EXTENSIONS:
+            path = self._path(digest, compression)
+            if path.exists():
+                return path, compression
+        return None, None
+
+    def put(self, digest, data):
+        """Stocke un bloc s'il est absent ; retourne le nombre d'octets écrits"""
+        existing, _ = self.find(digest)
+        if existing is not None:
+            return 0
+
+        if self.compression == COMPRESSION_GZIP:
+            payload = gzip.compress(data, compresslevel=6)
+        elif self.compression == COMPRESSION_ZSTD:
+            payload = zstandard.ZstdCompressor(level=3).compress(data)
+        else:
+            payload = data
+
+        path = self._path(digest, self.compression)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        return len(payload)
+
+    def get(self, digest):
+        path, compression = self.find(digest)
+        if path is None:
+            raise FileNotFoundError(f"Bloc manquant dans le magasin: {digest}")
+
+        with open(path, 'rb') as f:
+            payload = f.read()
+        if compression == COMPRESSION_GZIP:
+            data = gzip.decompress(payload)
+        elif compression == COMPRESSION_ZSTD:
+            if zstandard is None:
+                raise RuntimeError("Bloc compressé en zstd : installer le paquet 'zstandard'")
+            data = zstandard.ZstdDecompressor().decompress(payload)
+        else:
+            data = payload
+
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Bloc corrompu: {digest}")
+        return data
+
+
+def differential_backup(db_path=None, backup_dir=None, compression=COMPRESSION_NONE,
+                        chunk_pages=DEFAULT_CHUNK_PAGES, progress=None, **options):
+    """
+    Sauvegarde différentielle : instantané en ligne puis dépôt des blocs modifiés
+
+    Retourne le manifeste (dict) également écrit dans Backup/manifests.
+    """
+    started = time.perf_counter()
+    db_path = db_path or resolve_database_path()
+    backup_dir = Path(backup_dir or default_backup_dir(db_path))
+    manifests_dir = backup_dir / "manifests"
+    manifests_dir.mkdir(parents=True, exist_ok=True)
+    store = ChunkStore(backup_dir / "chunks", compression=compression)
+
+    # 1. Instantané cohérent via l'API backup (fichier de travail éphémère)
+    timestamp = _unique_timestamp()
+    staging_path = backup_dir / f".snapshot_{timestamp}.db"
+    try:
+        online_backup(db_path, str(staging_path), progress=progress, **options)
+
+        conn = sqlite3.connect(str(staging_path))
+        try:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            conn.close()
+
+        # 2. Découpage en blocs et dépôt des seuls blocs inconnus, puis manifeste,
+        #    sans prune_chunks concurrent
+        chunk_size = page_size * chunk_pages
+        chunks = []
+        new_chunks = 0
+        stored_bytes = 0
+        with store_lock(backup_dir):
+            with open(staging_path, 'rb') as f:
+                while True:
+                    data = f.read(chunk_size)
+                    if not data:
+                        break
+                    digest = hashlib.sha256(data).hexdigest()
+                    written = store.put(digest, data)
+                    if written:
+                        new_chunks += 1
+                        stored_bytes += written
+                    chunks.append(digest)
+
+            manifest = {
+                'created_at': datetime.now().isoformat(),
+                'source': str(db_path),
+                'page_size': page_size,
+                'page_count': page_count,
+                'chunk_pages': chunk_pages,
+                'compression': compression,
+                'chunks': chunks,
+                'new_chunks': new_chunks,
+                'stored_bytes': stored_bytes,
+                'duration_seconds': round(time.perf_counter() - started, 3),
+            }
+            manifest_path = manifests_dir / f"FNEV4_{timestamp}.json"
+            # 'x' : jamais d'écrasement d'un manifeste existant
+            with open(manifest_path, 'x', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+    finally:
+        if staging_path.exists():
+            os.remove(staging_path)
+
+    manifest['manifest_path'] = str(manifest_path)
+    return manifest
+
+
+def restore_backup(manifest_path, dest_path, backup_dir=None):
+    """Reconstitue une base à partir d'un manifeste différentiel puis la vérifie"""
+    manifest_path = Path(manifest_path)
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    backup_dir = Path(backup_dir or manifest_path.parent.parent)
+    store = ChunkStore(backup_dir / "chunks")
+
+    tmp_path = f"{dest_path}.restoring"
+    try:
+        with open(tmp_path, 'wb') as out:
+            for digest in manifest['chunks']:
+                out.write(store.get(digest))
+
+        conn = sqlite3.connect(tmp_path)
+        try:
+            verdict = conn.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            conn.close()
+        if verdict != "ok":
+            raise ValueError(f"Base restaurée invalide: {verdict}")
+        os.replace(tmp_path, dest_path)
+    except Exception:
+        # Bloc manquant ou corrompu, fichier qui n'est pas une base, quick_check en échec
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return dest_path
+
+
+def prune_chunks(backup_dir=None, keep_manifests=None):
+    """
+    Supprime les anciens manifestes (on garde les N plus récents) et les
+    blocs qui ne sont plus référencés par aucun manifeste
+
+    Sous le verrou du magasin : attend la fin d'une sauvegarde différentielle en cours.
+    """
+    backup_dir = Path(backup_dir or default_backup_dir())
+    if not backup_dir.exists():
+        return 0
+    with store_lock(backup_dir):
+        return _prune_locked(backup_dir, keep_manifests)
+
+
+def _prune_locked(backup_dir, keep_manifests):
+    manifests = sorted((backup_dir / "manifests").glob("FNEV4_*.json"))
+    if keep_manifests is not None and len(manifests) > keep_manifests:
+        for old in manifests[:len(manifests) - keep_manifests]:
+            old.unlink()
+        manifests = manifests[len(manifests) - keep_manifests:]
+
+    referenced = set()
+    for manifest_path in manifests:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            referenced.update(json.load(f)['chunks'])
+
+    removed = 0
+    for chunk in (backup_dir / "chunks").glob("*/*"):
+        digest = chunk.name.split('.')[0]
+        if digest not in referenced:
+            chunk.unlink()
+            removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sauvegardes en ligne de la base FNEV4")
+    parser.add_argument("mode", choices=["full", "diff", "restore", "prune"])
+    parser.add_argument("--db", help="Base à sauvegarder (défaut: chemin résolu)")
+    parser.add_argument("--backup-dir", help="Dossier de sauvegarde (défaut: Data/Backup)")
+    parser.add_argument("--compression", choices=list(COMPRESSION_EXTENSIONS), default=COMPRESSION_NONE)
+    parser.add_argument("--pages-per-step", type=int, default=DEFAULT_PAGES_PER_STEP)
+    parser.add_argument("--step-pause", type=float, default=DEFAULT_STEP_PAUSE)
+    parser.add_argument("--manifest", help="Manifeste à restaurer")
+    parser.add_argument("--dest", help="Fichier de destination de la restauration")
+    parser.add_argument("--keep", type=int, default=30, help="Manifestes conservés par prune")
+    args = parser.parse_args()
+
+    throttle = {'pages_per_step': args.pages_per_step, 'step_pause': args.step_pause}
+
+    print("💾 FNEV4 - SAUVEGARDE EN LIGNE")
+    print("=" * 40)
+    if args.mode == "full":
+        path = full_backup(args.db, args.backup_dir, **throttle)
+        print(f"✅ Sauvegarde complète: {path}")
+    elif args.mode == "diff":
+        manifest = differential_backup(args.db, args.backup_dir, compression=args.compression, **throttle)
+        print(f"✅ Manifeste: {manifest['manifest_path']}")
+        print(f"   📦 Blocs: {len(manifest['chunks'])} ({manifest['new_chunks']} nouveaux)")
+        print(f"   💽 Octets écrits: {manifest['stored_bytes']:,}")
+        print(f"   ⏱️ Durée: {manifest['duration_seconds']}s")
+    elif args.mode == "restore":
+        if not args.manifest or not args.dest:
+            parser.error("restore nécessite --manifest et --dest")
+        print(f"✅ Base restaurée: {restore_backup(args.manifest, args.dest, args.backup_dir)}")
+    else:
+        removed = prune_chunks(args.backup_dir, keep_manifests=args.keep)
+        print(f"🧹 Blocs supprimés: {removed}")
+
+
+if __name__ == "__main__":
+    main()
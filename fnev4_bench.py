@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Banc de mesure des requêtes de la liste des clients
+============================================================
+
+test_performance_datagrid chronométrait chaque requête une seule fois avec
+time.time() : une mesure à froid isolée ne dit rien du comportement réel.
+
+Ici chaque scénario (comptage, pagination, recherche, vérification des
+index) est exécuté de nombreuses fois avec perf_counter_ns :
+- à chaud : même connexion, itérations de chauffe écartées
+- à froid : nouvelle connexion à chaque itération et, sous Linux, pages du
+            fichier retirées du cache système (posix_fadvise DONTNEED)
+sur une ou plusieurs bases, éventuellement générées par fnev4_datagen à
+plusieurs tailles. On publie p50 / p95 / p99 par scénario.
+
+Chaque exécution est ajoutée à un historique JSON ; le contrôle de
+régression compare le p95 à la médiane des dernières exécutions et échoue
+au-delà d'une tolérance. Une exécution en régression est gardée pour
+mémoire (regressed: true) mais n'entre jamais dans la référence : des
+exécutions lentes successives ne deviennent pas la nouvelle norme.
+Un ralentissement voulu (nouvel index, base plus grosse) s'accepte avec
+--accept : l'exécution devient le point de départ d'une nouvelle référence,
+les exécutions antérieures n'y entrent plus. Les historiques sont séparés
+par chemin complet de base (toutes les installations s'appellent FNEV4.db).
+
+Usage:
+    python fnev4_bench.py --sizes 10000,100000          # bases générées
+    python fnev4_bench.py --db data/FNEV4.db --mode warm
+    python fnev4_bench.py --db data/FNEV4.db --accept   # nouvelle référence
+"""
+
+import json
+import math
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+from fnev4_db import PROJECT_ROOT, connect, resolve_database_path
+from fnev4_pagination import encode_cursor, page_clients
+from fnev4_search import count_clients, search_clients
+
+BENCH_DIR = PROJECT_ROOT / "benchmarks"
+HISTORY_PATH = BENCH_DIR / "bench_history.json"
+
+DEFAULT_ITERATIONS = 50
+DEFAULT_WARMUP = 5
+DEFAULT_TOLERANCE = 0.20
+# En dessous de cet écart absolu, une hausse relative n'est que du bruit
+DEFAULT_MIN_DELTA_MS = 0.5
+DEFAULT_BASELINE_RUNS = 5
+DEEP_PAGE = 1000
+PAGE_SIZE = 25
+
+
+# --- Scénarios -------------------------------------------------------------------
+
+def _count_total(conn, ctx):
+    return conn.execute("SELECT COUNT(*) FROM Clients").fetchone()
+
+
+def _count_active(conn, ctx):
+    return count_clients(conn, is_active_filter=True)
+
+
+def _page_first(conn, ctx):
+    return search_clients(conn, is_active_filter=True, page_number=1, page_size=PAGE_SIZE)
+
+
+def _page_deep_offset(conn, ctx):
+    return conn.execute("""
+        SELECT Id, Name, ClientCode, ClientType, IsActive FROM Clients
+        WHERE (IsDeleted = 0 OR IsDeleted IS NULL) AND IsActive = 1
+        ORDER BY ClientCode LIMIT ? OFFSET ?
+    """, (PAGE_SIZE, ctx['deep_offset'])).fetchall()
+
+
+def _page_deep_keyset(conn, ctx):
+    return page_clients(conn, is_active_filter=True, page_size=PAGE_SIZE, after=ctx['deep_cursor'])
+
+
+def _search_like(conn, ctx):
+    return conn.execute(
+        "SELECT COUNT(*) FROM Clients WHERE Name LIKE '%test%' OR ClientCode LIKE '%test%'").fetchone()
+
+
+def _search_use_case(conn, ctx):
+    return search_clients(conn, "kouassi", is_active_filter=True, page_size=PAGE_SIZE)
+
+
+def _index_check(conn, ctx):
+    return conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='Clients'").fetchall()
+
+
+SCENARIOS = {
+    "count_total": _count_total,
+    "count_active": _count_active,
+    "page_first": _page_first,
+    "page_deep_offset": _page_deep_offset,
+    "page_deep_keyset": _page_deep_keyset,
+    "search_like": _search_like,
+    "search_use_case": _search_use_case,
+    "index_check": _index_check,
+}
+
+
+def _prepare_context(conn):
+    """Paramètres dépendant de la base : page profonde, curseur keyset"""
+    active = count_clients(conn, is_active_filter=True)
+    deep_offset = min(DEEP_PAGE * PAGE_SIZE, max(0, active - PAGE_SIZE))
+    row = conn.execute("""
+        SELECT ClientCode, Id FROM Clients
+        WHERE (IsDeleted = 0 OR IsDeleted IS NULL) AND IsActive = 1
+        ORDER BY ClientCode, Id LIMIT 1 OFFSET ?
+    """, (max(0, deep_offset - 1),)).fetchone()
+    return {
+        'clients': conn.execute("SELECT COUNT(*) FROM Clients").fetchone()[0],
+        'deep_offset': deep_offset,
+        'deep_cursor': encode_cursor(*row) if row and deep_offset else None,
+    }
+
+
+# --- Mesure ------------------------------------------------------------------------
+
+def percentile(sorted_values, fraction):
+    """Percentile par rang le plus proche sur une liste triée"""
+    if not sorted_values:
+        return 0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(samples_ns):
+    samples = sorted(samples_ns)
+    to_ms = 1e-6
+    return {
+        'iterations': len(samples),
+        'p50_ms': round(percentile(samples, 0.50) * to_ms, 4),
+        'p95_ms': round(percentile(samples, 0.95) * to_ms, 4),
+        'p99_ms': round(percentile(samples, 0.99) * to_ms, 4),
+        'mean_ms': round(statistics.fmean(samples) * to_ms, 4),
+        'min_ms': round(samples[0] * to_ms, 4),
+        'max_ms': round(samples[-1] * to_ms, 4),
+    }
+
+
+def evict_os_cache(db_path):
+    """Retire le fichier (et son WAL) du cache système si la plateforme le permet"""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for path in (db_path, f"{db_path}-wal"):
+        if not os.path.exists(path):
+            continue
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def measure(db_path, scenario, mode="warm", iterations=DEFAULT_ITERATIONS, warmup=DEFAULT_WARMUP,
+            context=None):
+    """Échantillons (ns) d'un scénario ; seule la requête est chronométrée"""
+    run = SCENARIOS[scenario]
+    samples = []
+
+    if mode == "warm":
+        conn = connect(db_path, readonly=True)
+        try:
+            for _ in range(warmup):
+                run(conn, context)
+            for _ in range(iterations):
+                started = time.perf_counter_ns()
+                run(conn, context)
+                samples.append(time.perf_counter_ns() - started)
+        finally:
+            conn.close()
+    elif mode == "cold":
+        for _ in range(iterations):
+            evict_os_cache(db_path)
+            conn = connect(db_path, readonly=True)
+            try:
+                started = time.perf_counter_ns()
+                run(conn, context)
+                samples.append(time.perf_counter_ns() - started)
+            finally:
+                conn.close()
+    else:
+        raise ValueError(f"Mode inconnu: {mode}")
+    return samples
+
+
+def run_benchmarks(databases, scenarios=None, modes=("warm", "cold"), iterations=DEFAULT_ITERATIONS,
+                   warmup=DEFAULT_WARMUP, progress=None):
+    """
+    Exécute les scénarios sur chaque base et chaque mode
+
+    databases : liste de chemins ; retourne la liste des résultats résumés.
+    """
+    scenarios = list(scenarios or SCENARIOS)
+    results = []
+    for db_path in databases:
+        conn = connect(db_path, readonly=True)
+        try:
+            context = _prepare_context(conn)
+        finally:
+            conn.close()
+
+        for mode in modes:
+            # Les mesures à froid sont lentes : moins d'itérations suffisent
+            mode_iterations = iterations if mode == "warm" else max(5, iterations // 5)
+            for scenario in scenarios:
+                if scenario == "page_deep_keyset" and not context['deep_cursor']:
+                    continue
+                samples = measure(db_path, scenario, mode, mode_iterations, warmup, context)
+                result = {
+                    'database': os.path.basename(db_path),
+                    'database_path': os.path.normcase(os.path.realpath(db_path)),
+                    'clients': context['clients'],
+                    'scenario': scenario,
+                    'mode': mode,
+                    **summarize(samples),
+                }
+                results.append(result)
+                if progress:
+                    progress(result)
+    return results
+
+
+# --- Bases générées ----------------------------------------------------------------
+
+def generated_database(clients, seed=None, bench_dir=BENCH_DIR):
+    """Chemin d'une base synthétique de `clients` clients, générée au premier appel"""
+    from fnev4_datagen import DEFAULT_SEED, generate_database
+
+    seed = DEFAULT_SEED if seed is None else seed
+    path = os.path.join(str(bench_dir), "db", f"bench_c{clients}_s{seed}.db")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        generate_database(path, clients=clients, invoices=clients * 5, seed=seed)
+    return path
+
+
+# --- Historique et régressions -----------------------------------------------------
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(PROJECT_ROOT),
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_run(results, path=HISTORY_PATH, regressed=False, rebaseline=False):
+    history = load_history(path)
+    run = {
+        'regressed': regressed,
+        'rebaseline': rebaseline,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.node(),
+        'results': results,
+    }
+    history.append(run)
+    os.makedirs(os.path.dirname(str(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return run
+
+
+def _result_key(result):
+    # Anciens historiques : nom de fichier seul
+    return (result.get('database_path', result['database']), result['scenario'], result['mode'])
+
+
+def check_regressions(results, history, metric="p95_ms", tolerance=DEFAULT_TOLERANCE,
+                      baseline_runs=DEFAULT_BASELINE_RUNS, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """
+    Compare chaque résultat à la médiane des `baseline_runs` dernières exécutions
+    sans régression, depuis la dernière exécution acceptée (--accept)
+
+    Retourne [(clé, référence, actuel, variation)] pour les scénarios ralentis.
+    """
+    baselines = {}
+    accepted = []
+    for run in history:
+        if run.get('rebaseline'):
+            accepted = []
+        if not run.get('regressed'):
+            accepted.append(run)
+    for run in accepted[-baseline_runs:]:
+        for result in run['results']:
+            baselines.setdefault(_result_key(result), []).append(result[metric])
+
+    regressions = []
+    for result in results:
+        previous = baselines.get(_result_key(result))
+        if not previous:
+            continue
+        baseline = statistics.median(previous)
+        current = result[metric]
+        if current > baseline * (1 + tolerance) and current - baseline > min_delta_ms:
+            regressions.append((_result_key(result), baseline, current,
+                                (current - baseline) / baseline if baseline else float('inf')))
+    return regressions
+
+
+def gate_run(results, path=HISTORY_PATH, tolerance=DEFAULT_TOLERANCE, save=True, accept=False):
+    """
+    Contrôle de régression puis enregistrement de l'exécution, marquée regressed si elle échoue
+
+    accept enregistre l'exécution comme nouvelle référence, régressions
+    comprises (elles sont retournées pour affichage).
+    """
+    history = load_history(path)
+    regressions = check_regressions(results, history, tolerance=tolerance)
+    if save:
+        save_run(results, path, regressed=bool(regressions) and not accept, rebaseline=accept)
+    return regressions
+
+
+def print_result(result):
+    print(f"   {result['scenario']:<18} {result['mode']:<5} "
+          f"p50 {result['p50_ms']:>9.3f} ms  p95 {result['p95_ms']:>9.3f} ms  "
+          f"p99 {result['p99_ms']:>9.3f} ms  (n={result['iterations']})")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Banc de mesure FNEV4 (percentiles et régressions)")
+    parser.add_argument("--db", action="append", help="Base à mesurer (répétable)")
+    parser.add_argument("--sizes", help="Tailles de bases générées, en clients (ex: 10000,100000)")
+    parser.add_argument("--seed", type=int, help="Graine des bases générées")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS))
+    parser.add_argument("--mode", choices=["warm", "cold", "both"], default="both")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--history", default=str(HISTORY_PATH))
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--no-save", action="store_true", help="Ne pas enregistrer dans l'historique")
+    parser.add_argument("--accept", action="store_true",
+                        help="Accepter cette exécution comme nouvelle référence (ralentissement voulu)")
+    args = parser.parse_args()
+    if args.accept and args.no_save:
+        parser.error("--accept enregistre l'exécution : incompatible avec --no-save")
+
+    print("⏱️  FNEV4 - BANC DE MESURE")
+    print("=" * 60)
+
+    databases = list(args.db or [])
+    if args.sizes:
+        for size in args.sizes.split(","):
+            print(f"🏭 Base synthétique {int(size):,} clients...")
+            databases.append(generated_database(int(size), args.seed))
+    if not databases:
+        databases = [resolve_database_path()]
+
+    modes = ("warm", "cold") if args.mode == "both" else (args.mode,)
+    current_db = [None]
+
+    def progress(result):
+        if current_db[0] != result['database']:
+            current_db[0] = result['database']
+            print(f"\n📁 {result['database']} ({result['clients']:,} clients)")
+        print_result(result)
+
+    results = run_benchmarks(databases, args.scenario, modes, args.iterations, args.warmup, progress)
+
+    regressions = gate_run(results, args.history, args.tolerance, save=not args.no_save, accept=args.accept)
+    if not args.no_save:
+        print(f"\n💾 Historique: {args.history} ({len(load_history(args.history))} exécutions)")
+
+    if regressions:
+        label = "acceptée(s), nouvelle référence" if args.accept else f"au-delà de {args.tolerance:.0%}"
+        print(f"\n{'⚠️ ' if args.accept else '❌'} {len(regressions)} régression(s) {label}:")
+        for (database, scenario, mode), baseline, current, change in regressions:
+            print(f"   {database} {scenario} [{mode}]: p95 {baseline:.3f} → {current:.3f} ms (+{change:.0%})")
+        return 0 if args.accept else 1
+    if args.accept:
+        print("\n📌 Nouvelle référence enregistrée")
+    print("\n✅ Aucune régression")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
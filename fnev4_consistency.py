@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Règles de cohérence du schéma (orphelins, références, compteurs)
+=========================================================================
+
+Les diagnostics ne font que compter des lignes. Ici chaque règle de RULES
+est une déclaration (table, colonne, table référencée, filtres) compilée en
+une seule requête ensembliste :
+
+    orphan          anti-jointure NOT EXISTS sur la clé primaire du parent
+                    (lignes sans facture, factures sans client, avoirs dont
+                    la facture d'origine n'existe pas)
+    deleted_parent  le parent existe mais est supprimé logiquement
+                    (IsDeleted = 1)
+    condition       prédicat sur la ligne et, au besoin, son parent
+                    (avoir sans facture d'origine, avoir d'un avoir)
+    counter         compteur stocké comparé à un agrégat GROUP BY calculé
+                    en une passe (ImportSessions.InvoicesImported)
+
+Les règles tournent en parallèle, une connexion lecture seule par règle
+(sqlite3 relâche le GIL pendant l'exécution). Chaque règle peut produire
+une correction ensembliste (DELETE, UPDATE ... SET NULL, recalcul du
+compteur) : generate_repair_script écrit un script SQL à relire puis
+appliquer, il n'est jamais exécuté automatiquement.
+
+Usage:
+    python fnev4_consistency.py                     # toutes les règles
+    python fnev4_consistency.py --rule items_without_invoice --repair repair.sql
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from fnev4_db import connect, resolve_database_path
+
+SEVERITY_ERROR = "error"
+SEVERITY_WARNING = "warning"
+
+DEFAULT_WORKERS = 4
+MAX_SAMPLES = 20
+
+RULES = [
+    {
+        "name": "items_without_invoice",
+        "description": "Lignes de facture dont la facture n'existe pas",
+        "kind": "orphan", "severity": SEVERITY_ERROR,
+        "table": "FneInvoiceItems", "column": "FneInvoiceId", "parent": "FneInvoices",
+        "repair": "delete",
+    },
+    {
+        "name": "items_unknown_vat_type",
+        "description": "Lignes de facture dont le type de TVA n'existe pas",
+        "kind": "orphan", "severity": SEVERITY_ERROR,
+        "table": "FneInvoiceItems", "column": "VatTypeId", "parent": "VatTypes",
+    },
+    {
+        "name": "api_logs_without_invoice",
+        "description": "Journaux d'appel API dont la facture n'existe plus",
+        "kind": "orphan", "severity": SEVERITY_WARNING,
+        "table": "FneApiLogs", "column": "FneInvoiceId", "parent": "FneInvoices",
+        "repair": "nullify",
+    },
+    {
+        "name": "invoices_without_client",
+        "description": "Factures dont le client n'existe pas",
+        "kind": "orphan", "severity": SEVERITY_ERROR,
+        "table": "FneInvoices", "column": "ClientId", "parent": "Clients",
+    },
+    {
+        "name": "invoices_deleted_client",
+        "description": "Factures actives rattachées à un client supprimé",
+        "kind": "deleted_parent", "severity": SEVERITY_WARNING,
+        "table": "FneInvoices", "column": "ClientId", "parent": "Clients",
+        "where": "c.IsDeleted = 0",
+    },
+    {
+        "name": "credit_notes_missing_parent",
+        "description": "Avoirs dont la facture d'origine (ParentInvoiceId) n'existe pas",
+        "kind": "orphan", "severity": SEVERITY_ERROR,
+        "table": "FneInvoices", "column": "ParentInvoiceId", "parent": "FneInvoices",
+    },
+    {
+        "name": "credit_notes_deleted_parent",
+        "description": "Avoirs actifs dont la facture d'origine est supprimée",
+        "kind": "deleted_parent", "severity": SEVERITY_WARNING,
+        "table": "FneInvoices", "column": "ParentInvoiceId", "parent": "FneInvoices",
+        "where": "c.IsDeleted = 0",
+    },
+    {
+        "name": "credit_notes_without_parent",
+        "description": "Avoirs (refund) sans facture d'origine",
+        "kind": "condition", "severity": SEVERITY_ERROR,
+        "table": "FneInvoices",
+        "where": "c.InvoiceType = 'refund' AND c.ParentInvoiceId IS NULL AND c.IsDeleted = 0",
+    },
+    {
+        "name": "credit_notes_chained",
+        "description": "Avoirs rattachés à un avoir ou à eux-mêmes au lieu d'une facture de vente",
+        "kind": "condition", "severity": SEVERITY_ERROR,
+        "table": "FneInvoices", "column": "ParentInvoiceId", "parent": "FneInvoices",
+        "where": "c.ParentInvoiceId IS NOT NULL AND (c.ParentInvoiceId = c.Id OR EXISTS ("
+                 "SELECT 1 FROM FneInvoices p WHERE p.Id = c.ParentInvoiceId AND p.InvoiceType = 'refund'))",
+    },
+    {
+        "name": "import_sessions_counters",
+        "description": "Sessions d'import dont InvoicesImported diffère du nombre de factures rattachées",
+        "kind": "counter", "severity": SEVERITY_WARNING,
+        "table": "ImportSessions", "counter": "InvoicesImported",
+        "source": "FneInvoices", "source_column": "ImportSessionId",
+        "repair": "recount",
+    },
+]
+
+
+def get_rule(name):
+    for rule in RULES:
+        if rule["name"] == name:
+            return rule
+    raise ValueError(f"Règle inconnue: {name} (disponibles: {', '.join(r['name'] for r in RULES)})")
+
+
+def _predicate(rule):
+    """Condition (alias c) qu'une ligne de rule['table'] en faute vérifie"""
+    kind = rule["kind"]
+    extra = f" AND ({rule['where']})" if rule.get("where") else ""
+    if kind == "orphan":
+        return (f"c.[{rule['column']}] IS NOT NULL AND NOT EXISTS "
+                f"(SELECT 1 FROM [{rule['parent']}] p WHERE p.Id = c.[{rule['column']}]){extra}")
+    if kind == "deleted_parent":
+        return (f"EXISTS (SELECT 1 FROM [{rule['parent']}] p "
+                f"WHERE p.Id = c.[{rule['column']}] AND p.IsDeleted <> 0){extra}")
+    if kind == "condition":
+        return rule["where"]
+    raise ValueError(f"Type de règle inconnu: {kind}")
+
+
+def _counts_sql(rule):
+    # Un seul GROUP BY sur l'index de la colonne source, joint aux lignes à contrôler
+    return (f"SELECT [{rule['source_column']}] AS Id, COUNT(*) AS Actual FROM [{rule['source']}] "
+            f"WHERE [{rule['source_column']}] IS NOT NULL GROUP BY [{rule['source_column']}]")
+
+
+def compile_rule(rule):
+    """Requête unique de la règle : (Id, valeur) des lignes en faute"""
+    if rule["kind"] == "counter":
+        return f"""
+            SELECT c.Id, c.[{rule['counter']}] || ' -> ' || COALESCE(a.Actual, 0)
+            FROM [{rule['table']}] c
+            LEFT JOIN ({_counts_sql(rule)}) a ON a.Id = c.Id
+            WHERE c.[{rule['counter']}] IS NOT COALESCE(a.Actual, 0)
+        """
+    value = f"c.[{rule['column']}]" if rule.get("column") else "NULL"
+    return f"SELECT c.Id, {value} FROM [{rule['table']}] c WHERE {_predicate(rule)}"
+
+
+def compile_repair(rule):
+    """Correction ensembliste de la règle, ou None si elle demande une décision manuelle"""
+    action = rule.get("repair")
+    table = rule["table"]
+    if action == "delete":
+        return f"DELETE FROM [{table}] WHERE rowid IN (SELECT c.rowid FROM [{table}] c WHERE {_predicate(rule)});"
+    if action == "nullify":
+        return (f"UPDATE [{table}] SET [{rule['column']}] = NULL "
+                f"WHERE rowid IN (SELECT c.rowid FROM [{table}] c WHERE {_predicate(rule)});")
+    if action == "recount":
+        # Un comptage par ligne sur l'index de la colonne source
+        actual = f"(SELECT COUNT(*) FROM [{rule['source']}] s WHERE s.[{rule['source_column']}] = [{table}].Id)"
+        return f"UPDATE [{table}] SET [{rule['counter']}] = {actual} WHERE [{rule['counter']}] IS NOT {actual};"
+    return None
+
+
+def _table_exists(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                        (table,)).fetchone() is not None
+
+
+def run_rule(db_path, rule, max_samples=MAX_SAMPLES):
+    """Exécute une règle sur sa propre connexion lecture seule"""
+    started = time.perf_counter()
+    conn = connect(db_path, readonly=True)
+    try:
+        tables = {rule["table"], rule.get("parent"), rule.get("source")} - {None}
+        missing = [table for table in tables if not _table_exists(conn, table)]
+        if missing:
+            return {'rule': rule["name"], 'status': 'skipped', 'problems': 0, 'samples': [],
+                    'seconds': 0.0, 'error': f"Table absente: {', '.join(missing)}"}
+        problems = 0
+        samples = []
+        for row_id, value in conn.execute(compile_rule(rule)):
+            problems += 1
+            if len(samples) < max_samples:
+                samples.append((row_id, value))
+    except Exception as e:
+        return {'rule': rule["name"], 'status': 'failed', 'problems': 0, 'samples': [],
+                'seconds': round(time.perf_counter() - started, 3), 'error': str(e)}
+    finally:
+        conn.close()
+    return {'rule': rule["name"], 'status': rule["severity"] if problems else 'ok', 'problems': problems,
+            'samples': samples, 'seconds': round(time.perf_counter() - started, 3), 'error': None}
+
+
+def check_consistency(db_path=None, rules=None, workers=DEFAULT_WORKERS, persist=False):
+    """
+    Exécute les règles en parallèle
+
+    Retourne {nom: {'rule', 'status', 'problems', 'samples', 'seconds', 'error'}}
+    dans l'ordre de RULES. `persist` enregistre chaque verdict dans
+    IntegrityChecks (CheckName 'rule:<nom>'), lu par la vue Maintenance.
+    """
+    db_path = str(db_path or resolve_database_path())
+    rules = rules or RULES
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(rules)))) as pool:
+        futures = [pool.submit(run_rule, db_path, rule) for rule in rules]
+        results = {rule["name"]: future.result() for rule, future in zip(rules, futures)}
+
+    if persist:
+        from fnev4_integrity import STATUS_ERROR, STATUS_OK, record_result
+        for name, result in results.items():
+            if result['status'] in ('skipped', 'failed'):
+                continue
+            record_result(db_path, f"rule:{name}", STATUS_ERROR if result['problems'] else STATUS_OK,
+                          result['problems'], {'samples': result['samples']}, result['seconds'])
+    return results
+
+
+def generate_repair_script(results, rules=None):
+    """Script SQL des corrections pour les règles en faute (une transaction)"""
+    rules = {rule["name"]: rule for rule in rules or RULES}
+    lines = [f"-- FNEV4 - corrections de cohérence générées le {datetime.now().isoformat(timespec='seconds')}",
+             "-- A relire avant exécution, sur une base sauvegardée", "", "BEGIN IMMEDIATE;"]
+    for name, result in results.items():
+        if not result['problems']:
+            continue
+        rule = rules[name]
+        lines.append("")
+        lines.append(f"-- {name}: {result['problems']} ligne(s) - {rule['description']}")
+        repair = compile_repair(rule)
+        if repair is None:
+            lines.append("-- Pas de correction automatique : décision manuelle. Exemples :")
+            lines.extend(f"--   {row_id} ({value})" for row_id, value in result['samples'])
+        else:
+            lines.append(repair)
+    lines += ["", "COMMIT;", ""]
+    return "\n".join(lines)
+
+
+def print_results(results):
+    icons = {'ok': "✅", SEVERITY_WARNING: "⚠️ ", SEVERITY_ERROR: "❌", 'skipped': "⏭️ ", 'failed': "💥"}
+    for name, result in results.items():
+        line = f"{icons.get(result['status'], '❔')} {name}: {result['problems']} ligne(s) ({result['seconds']}s)"
+        if result['error']:
+            line += f" - {result['error']}"
+        print(line)
+        for row_id, value in result['samples'][:3]:
+            print(f"      {row_id} ({value})")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Règles de cohérence FNEV4")
+    parser.add_argument("--db", help="Base (défaut: chemin résolu)")
+    parser.add_argument("--rule", action="append", help="Règle à exécuter (répétable, défaut: toutes)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--repair", metavar="FICHIER", help="Écrire le script SQL de correction")
+    parser.add_argument("--persist", action="store_true", help="Enregistrer les verdicts dans IntegrityChecks")
+    parser.add_argument("--list", action="store_true", help="Lister les règles et leur requête")
+    args = parser.parse_args()
+
+    print("🧩 FNEV4 - COHÉRENCE DU SCHÉMA")
+    print("=" * 50)
+    if args.list:
+        for rule in RULES:
+            print(f"\n• {rule['name']} [{rule['severity']}] {rule['description']}")
+            print(f"  {' '.join(compile_rule(rule).split())}")
+    else:
+        selected = [get_rule(name) for name in args.rule] if args.rule else RULES
+        started = time.perf_counter()
+        results = check_consistency(args.db, selected, args.workers, args.persist)
+        print_results(results)
+        print(f"\n⏱️  {len(results)} règles en {time.perf_counter() - started:.2f}s")
+        if args.repair:
+            with open(args.repair, 'w', encoding='utf-8') as f:
+                f.write(generate_repair_script(results, selected))
+            print(f"📝 Script de correction: {args.repair}")
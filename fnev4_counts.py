@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Cache des totaux de pagination des clients
+===================================================
+
+Chaque page de la liste des clients lance, à côté de la requête de page, un
+`SELECT COUNT(*) ... WHERE (IsDeleted = 0 OR IsDeleted IS NULL) AND IsActive = ...`
+qui parcourt toute la table.
+
+La table ClientCounts garde le nombre de clients par
+(IsActive, ClientType, IsDeleted) ; des triggers INSERT / UPDATE / DELETE
+sur Clients la maintiennent exacte dans la même transaction que la
+modification. Un total de page devient une somme sur quelques lignes.
+Les recherches plein texte ne peuvent pas être pré-agrégées et gardent
+leur COUNT (voir fnev4_search.count_clients).
+
+Le cache n'est utilisé que si la table ET ses trois triggers existent : une
+migration EF qui reconstruit Clients supprime les triggers, et le cache
+cesserait silencieusement d'être à jour. Dans ce cas cached_client_count
+rend None (l'appelant compte) jusqu'au prochain create_count_cache, qui
+recrée les triggers et recalcule les totaux.
+"""
+
+import json
+import time
+
+from fnev4_db import connect, resolve_database_path
+
+COUNTS_TABLE = "ClientCounts"
+COUNT_TRIGGERS = tuple(f"TR_{COUNTS_TABLE}_{event}" for event in ("Insert", "Delete", "Update"))
+
+SCHEMA_STATEMENTS = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {COUNTS_TABLE} (
+        IsActive INTEGER NOT NULL,
+        ClientType TEXT NOT NULL,
+        IsDeleted INTEGER NOT NULL,
+        Total INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (IsActive, ClientType, IsDeleted)
+    ) WITHOUT ROWID
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS TR_{COUNTS_TABLE}_Insert AFTER INSERT ON Clients BEGIN
+        INSERT INTO {COUNTS_TABLE} (IsActive, ClientType, IsDeleted, Total)
+        VALUES (new.IsActive, new.ClientType, new.IsDeleted, 1)
+        ON CONFLICT (IsActive, ClientType, IsDeleted) DO UPDATE SET Total = Total + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS TR_{COUNTS_TABLE}_Delete AFTER DELETE ON Clients BEGIN
+        UPDATE {COUNTS_TABLE} SET Total = Total - 1
+        WHERE IsActive = old.IsActive AND ClientType = old.ClientType AND IsDeleted = old.IsDeleted;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS TR_{COUNTS_TABLE}_Update AFTER UPDATE OF IsActive, ClientType, IsDeleted ON Clients
+    WHEN old.IsActive IS NOT new.IsActive OR old.ClientType IS NOT new.ClientType
+         OR old.IsDeleted IS NOT new.IsDeleted
+    BEGIN
+        UPDATE {COUNTS_TABLE} SET Total = Total - 1
+        WHERE IsActive = old.IsActive AND ClientType = old.ClientType AND IsDeleted = old.IsDeleted;
+        INSERT INTO {COUNTS_TABLE} (IsActive, ClientType, IsDeleted, Total)
+        VALUES (new.IsActive, new.ClientType, new.IsDeleted, 1)
+        ON CONFLICT (IsActive, ClientType, IsDeleted) DO UPDATE SET Total = Total + 1;
+    END
+    """,
+]
+
+_ACTUAL_COUNTS_SQL = """
+    SELECT IsActive, ClientType, IsDeleted, COUNT(*)
+    FROM Clients
+    GROUP BY IsActive, ClientType, IsDeleted
+"""
+
+
+def has_count_cache(conn):
+    """Table ClientCounts présente et tous ses triggers de maintenance en place sur Clients"""
+    found = {name for name, in conn.execute(
+        "SELECT name FROM sqlite_master WHERE (type='table' AND name=?) "
+        "OR (type='trigger' AND tbl_name='Clients' AND name IN (SELECT value FROM json_each(?)))",
+        (COUNTS_TABLE, json.dumps(COUNT_TRIGGERS)))}
+    return found == {COUNTS_TABLE, *COUNT_TRIGGERS}
+
+
+def cached_client_count(conn, is_active_filter=None, client_type=None):
+    """
+    Total des clients non supprimés depuis le cache, None si le cache est
+    absent ou incomplet (trigger manquant : totaux possiblement périmés)
+
+    Mêmes filtres que ListeClientsUseCase hors recherche.
+    """
+    if not has_count_cache(conn):
+        return None
+
+    sql = f"SELECT COALESCE(SUM(Total), 0) FROM {COUNTS_TABLE} WHERE IsDeleted = 0"
+    params = []
+    if is_active_filter is not None:
+        sql += " AND IsActive = ?"
+        params.append(1 if is_active_filter else 0)
+    if client_type and client_type != "Tous":
+        sql += " AND ClientType = ?"
+        params.append(client_type)
+    return conn.execute(sql, params).fetchone()[0]
+
+
+def _rebuild(conn):
+    conn.execute(f"DELETE FROM {COUNTS_TABLE}")
+    conn.execute(f"INSERT INTO {COUNTS_TABLE} (IsActive, ClientType, IsDeleted, Total) {_ACTUAL_COUNTS_SQL}")
+
+
+def create_count_cache(db_path=None):
+    """Crée la table, ses triggers et la remplit (idempotent)"""
+    db_path = str(db_path or resolve_database_path())
+    conn = connect(db_path, readonly=False)
+    conn.isolation_level = None
+    started = time.perf_counter()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in SCHEMA_STATEMENTS:
+                conn.execute(statement)
+            _rebuild(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return round(time.perf_counter() - started, 3)
+
+
+def verify_count_cache(db_path=None):
+    """
+    Compare le cache à un GROUP BY réel
+
+    Retourne la liste des écarts [(IsActive, ClientType, IsDeleted, cache, réel)].
+    """
+    conn = connect(db_path, readonly=True)
+    try:
+        actual = {row[:3]: row[3] for row in conn.execute(_ACTUAL_COUNTS_SQL)}
+        cached = {row[:3]: row[3] for row in conn.execute(
+            f"SELECT IsActive, ClientType, IsDeleted, Total FROM {COUNTS_TABLE}")}
+    finally:
+        conn.close()
+
+    mismatches = []
+    for key in sorted(set(actual) | set(cached), key=str):
+        if actual.get(key, 0) != cached.get(key, 0):
+            mismatches.append((*key, cached.get(key, 0), actual.get(key, 0)))
+    return mismatches
+
+
+def rebuild_count_cache(db_path=None):
+    """
+    Recalcule le cache en une transaction (écritures de l'application bloquées le temps du GROUP BY)
+
+    Les triggers manquants sont recréés dans la même transaction.
+    """
+    conn = connect(db_path, readonly=False)
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in SCHEMA_STATEMENTS:
+                conn.execute(statement)
+            _rebuild(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+
+def drop_count_cache(db_path=None):
+    conn = connect(db_path, readonly=False)
+    try:
+        for trigger in COUNT_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.execute(f"DROP TABLE IF EXISTS {COUNTS_TABLE}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cache des totaux de clients FNEV4")
+    parser.add_argument("action", choices=["create", "verify", "rebuild", "drop"])
+    parser.add_argument("--db", help="Base (défaut: chemin résolu)")
+    args = parser.parse_args()
+
+    print("🔢 FNEV4 - CACHE DES TOTAUX CLIENTS")
+    print("=" * 50)
+    if args.action == "create":
+        print(f"✅ Table {COUNTS_TABLE} créée et remplie en {create_count_cache(args.db)}s")
+    elif args.action == "verify":
+        conn = connect(args.db, readonly=True)
+        try:
+            complete = has_count_cache(conn)
+        finally:
+            conn.close()
+        mismatches = verify_count_cache(args.db) if complete else None
+        if not complete:
+            print("❌ Table ou trigger(s) de maintenance manquant(s) : cache ignoré, relancer rebuild")
+        elif not mismatches:
+            print("✅ Cache exact")
+        else:
+            print(f"❌ {len(mismatches)} écarts (relancer rebuild):")
+            for is_active, client_type, is_deleted, cached, actual in mismatches:
+                print(f"   IsActive={is_active} ClientType={client_type} IsDeleted={is_deleted}: "
+                      f"cache {cached} / réel {actual}")
+    elif args.action == "rebuild":
+        rebuild_count_cache(args.db)
+        print("✅ Cache recalculé")
+    else:
+        drop_count_cache(args.db)
+        print(f"🗑️  Table {COUNTS_TABLE} supprimée")
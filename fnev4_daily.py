@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Agrégats journaliers des factures pour le tableau de bord
+==================================================================
+
+Les chiffres du tableau de bord (factures par jour, certifiées ou en
+attente, montants par point de vente) réagrègent FneInvoices à chaque
+rafraîchissement : le coût croît avec l'historique.
+
+La table DailyInvoiceStats garde, par (jour, point de vente, statut), le
+nombre de factures et les montants HT / TVA / TTC en centimes entiers (pas
+de dérive d'arrondi au fil des ajouts et retraits). Comme ClientCounts
+(fnev4_counts), des triggers INSERT / UPDATE / DELETE sur FneInvoices la
+tiennent à jour dans la transaction même de l'application ; seul le jour
+touché est modifié. Les factures IsDeleted = 1 ne sont pas comptées.
+
+verify_daily_stats compare la table à un GROUP BY réel (éventuellement sur
+une plage de jours) et rebuild_daily_stats la recalcule.
+"""
+
+import time
+
+from fnev4_db import connect, resolve_database_path
+
+DAILY_TABLE = "DailyInvoiceStats"
+
+_CENTS = "CAST(ROUND({column} * 100) AS INTEGER)"
+
+
+def _add_row(row, sign):
+    """Ajout (+1) ou retrait (-1) d'une facture `row` (new / old) dans son jour"""
+    if sign > 0:
+        return f"""
+        INSERT INTO {DAILY_TABLE} (Day, PointOfSale, Status, Invoices, AmountHT, VatAmount, AmountTTC)
+        SELECT date({row}.InvoiceDate), {row}.PointOfSale, {row}.Status, 1,
+               {_CENTS.format(column=f'{row}.TotalAmountHT')},
+               {_CENTS.format(column=f'{row}.TotalVatAmount')},
+               {_CENTS.format(column=f'{row}.TotalAmountTTC')}
+        WHERE {row}.IsDeleted = 0
+        ON CONFLICT (Day, PointOfSale, Status) DO UPDATE SET
+            Invoices = Invoices + 1,
+            AmountHT = AmountHT + excluded.AmountHT,
+            VatAmount = VatAmount + excluded.VatAmount,
+            AmountTTC = AmountTTC + excluded.AmountTTC;
+        """
+    return f"""
+        UPDATE {DAILY_TABLE} SET
+            Invoices = Invoices - 1,
+            AmountHT = AmountHT - {_CENTS.format(column=f'{row}.TotalAmountHT')},
+            VatAmount = VatAmount - {_CENTS.format(column=f'{row}.TotalVatAmount')},
+            AmountTTC = AmountTTC - {_CENTS.format(column=f'{row}.TotalAmountTTC')}
+        WHERE {row}.IsDeleted = 0
+          AND Day = date({row}.InvoiceDate) AND PointOfSale = {row}.PointOfSale AND Status = {row}.Status;
+        """
+
+
+_TRACKED_COLUMNS = ("InvoiceDate", "PointOfSale", "Status", "TotalAmountHT", "TotalVatAmount",
+                    "TotalAmountTTC", "IsDeleted")
+
+SCHEMA_STATEMENTS = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {DAILY_TABLE} (
+        Day TEXT NOT NULL,
+        PointOfSale TEXT NOT NULL,
+        Status TEXT NOT NULL,
+        Invoices INTEGER NOT NULL DEFAULT 0,
+        AmountHT INTEGER NOT NULL DEFAULT 0,
+        VatAmount INTEGER NOT NULL DEFAULT 0,
+        AmountTTC INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (Day, PointOfSale, Status)
+    ) WITHOUT ROWID
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS TR_{DAILY_TABLE}_Insert AFTER INSERT ON FneInvoices BEGIN
+        {_add_row('new', 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS TR_{DAILY_TABLE}_Delete AFTER DELETE ON FneInvoices BEGIN
+        {_add_row('old', -1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS TR_{DAILY_TABLE}_Update AFTER UPDATE OF {', '.join(_TRACKED_COLUMNS)} ON FneInvoices
+    WHEN {' OR '.join(f'old.{column} IS NOT new.{column}' for column in _TRACKED_COLUMNS)}
+    BEGIN
+        {_add_row('old', -1)}
+        {_add_row('new', 1)}
+    END
+    """,
+]
+
+_ACTUAL_SQL = f"""
+    SELECT date(InvoiceDate) AS Day, PointOfSale, Status, COUNT(*),
+           SUM({_CENTS.format(column='TotalAmountHT')}),
+           SUM({_CENTS.format(column='TotalVatAmount')}),
+           SUM({_CENTS.format(column='TotalAmountTTC')})
+    FROM FneInvoices
+    WHERE IsDeleted = 0 {{range_filter}}
+    GROUP BY Day, PointOfSale, Status
+"""
+
+
+def has_daily_stats(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (DAILY_TABLE,)).fetchone() is not None
+
+
+def _range_filter(start_day, end_day, column):
+    """Filtre jour inclus [start_day, end_day] (ISO) sur `column`"""
+    sql, params = "", []
+    if start_day:
+        sql += f" AND {column} >= ?"
+        params.append(start_day)
+    if end_day:
+        sql += f" AND {column} < date(?, '+1 day')"
+        params.append(end_day)
+    return sql, params
+
+
+def _rebuild(conn, start_day=None, end_day=None):
+    delete_filter, params = _range_filter(start_day, end_day, "Day")
+    conn.execute(f"DELETE FROM {DAILY_TABLE} WHERE 1=1{delete_filter}", params)
+    # InvoiceDate (texte ISO) filtré tel quel : l'index IX_FneInvoices_InvoiceDate sert
+    source_filter, params = _range_filter(start_day, end_day, "InvoiceDate")
+    conn.execute(f"INSERT INTO {DAILY_TABLE} (Day, PointOfSale, Status, Invoices, AmountHT, VatAmount, AmountTTC) "
+                 f"{_ACTUAL_SQL.format(range_filter=source_filter)}", params)
+
+
+def _write(db_path, action):
+    conn = connect(db_path, readonly=False)
+    conn.isolation_level = None
+    started = time.perf_counter()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            action(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return round(time.perf_counter() - started, 3)
+
+
+def create_daily_stats(db_path=None):
+    """Crée la table, ses triggers et la remplit (idempotent)"""
+    db_path = str(db_path or resolve_database_path())
+
+    def _create(conn):
+        for statement in SCHEMA_STATEMENTS:
+            conn.execute(statement)
+        _rebuild(conn)
+
+    return _write(db_path, _create)
+
+
+def rebuild_daily_stats(db_path=None, start_day=None, end_day=None):
+    """Recalcule toute la table, ou seulement les jours [start_day, end_day]"""
+    return _write(db_path, lambda conn: _rebuild(conn, start_day, end_day))
+
+
+def verify_daily_stats(db_path=None, start_day=None, end_day=None):
+    """
+    Compare la table à un GROUP BY réel
+
+    Retourne la liste des écarts [(jour, point de vente, statut, table, réel)]
+    où table et réel sont (factures, HT, TVA, TTC) en centimes.
+    """
+    conn = connect(db_path, readonly=True)
+    try:
+        source_filter, source_params = _range_filter(start_day, end_day, "InvoiceDate")
+        actual = {row[:3]: row[3:] for row in conn.execute(_ACTUAL_SQL.format(range_filter=source_filter),
+                                                           source_params)}
+        stats_filter, stats_params = _range_filter(start_day, end_day, "Day")
+        stored = {row[:3]: row[3:] for row in conn.execute(
+            f"SELECT Day, PointOfSale, Status, Invoices, AmountHT, VatAmount, AmountTTC "
+            f"FROM {DAILY_TABLE} WHERE 1=1{stats_filter}", stats_params)}
+    finally:
+        conn.close()
+
+    empty = (0, 0, 0, 0)
+    mismatches = []
+    for key in sorted(set(actual) | set(stored), key=str):
+        if tuple(actual.get(key, empty)) != tuple(stored.get(key, empty)):
+            mismatches.append((*key, tuple(stored.get(key, empty)), tuple(actual.get(key, empty))))
+    return mismatches
+
+
+def drop_daily_stats(db_path=None):
+    conn = connect(db_path, readonly=False)
+    try:
+        for suffix in ("Insert", "Delete", "Update"):
+            conn.execute(f"DROP TRIGGER IF EXISTS TR_{DAILY_TABLE}_{suffix}")
+        conn.execute(f"DROP TABLE IF EXISTS {DAILY_TABLE}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def daily_summary(conn, start_day, end_day, point_of_sale=None):
+    """
+    Lignes du tableau de bord par jour : factures, certifiées, en attente, montants
+
+    Lecture par clé primaire (Day) : le coût dépend de la plage demandée,
+    pas de l'historique stocké. Montants en unités monétaires.
+    """
+    sql = f"""
+        SELECT Day, SUM(Invoices),
+               SUM(CASE WHEN Status = 'Certified' THEN Invoices ELSE 0 END),
+               SUM(CASE WHEN Status <> 'Certified' THEN Invoices ELSE 0 END),
+               SUM(AmountHT) / 100.0, SUM(VatAmount) / 100.0, SUM(AmountTTC) / 100.0
+        FROM {DAILY_TABLE}
+        WHERE Day >= ? AND Day <= ?
+    """
+    params = [start_day, end_day]
+    if point_of_sale:
+        sql += " AND PointOfSale = ?"
+        params.append(point_of_sale)
+    sql += " GROUP BY Day ORDER BY Day"
+    return [dict(zip(("day", "invoices", "certified", "pending", "amount_ht", "vat_amount", "amount_ttc"), row))
+            for row in conn.execute(sql, params)]
+
+
+def amounts_by_point_of_sale(conn, start_day, end_day):
+    """Factures et montant TTC par point de vente sur la plage"""
+    return conn.execute(f"""
+        SELECT PointOfSale, SUM(Invoices), SUM(AmountTTC) / 100.0
+        FROM {DAILY_TABLE}
+        WHERE Day >= ? AND Day <= ?
+        GROUP BY PointOfSale
+        ORDER BY SUM(AmountTTC) DESC
+    """, (start_day, end_day)).fetchall()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Agrégats journaliers des factures FNEV4")
+    parser.add_argument("action", choices=["create", "verify", "rebuild", "drop", "show"])
+    parser.add_argument("--db", help="Base (défaut: chemin résolu)")
+    parser.add_argument("--start", help="Premier jour (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Dernier jour (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    print("📅 FNEV4 - AGRÉGATS JOURNALIERS")
+    print("=" * 50)
+    if args.action == "create":
+        print(f"✅ Table {DAILY_TABLE} créée et remplie en {create_daily_stats(args.db)}s")
+    elif args.action == "verify":
+        mismatches = verify_daily_stats(args.db, args.start, args.end)
+        if not mismatches:
+            print("✅ Agrégats exacts")
+        else:
+            print(f"❌ {len(mismatches)} écarts (relancer rebuild):")
+            for day, point_of_sale, status, stored, actual in mismatches[:50]:
+                print(f"   {day} {point_of_sale} {status}: table {stored} / réel {actual}")
+    elif args.action == "rebuild":
+        print(f"✅ Agrégats recalculés en {rebuild_daily_stats(args.db, args.start, args.end)}s")
+    elif args.action == "drop":
+        drop_daily_stats(args.db)
+        print(f"🗑️  Table {DAILY_TABLE} supprimée")
+    else:
+        if not (args.start and args.end):
+            parser.error("show nécessite --start et --end")
+        conn = connect(args.db, readonly=True)
+        try:
+            for row in daily_summary(conn, args.start, args.end):
+                print(f"   {row['day']}: {row['invoices']} factures ({row['certified']} certifiées, "
+                      f"{row['pending']} autres), TTC {row['amount_ttc']:,.2f}")
+        finally:
+            conn.close()
@@ -0,0 +1,575 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Générateur de bases synthétiques pour les mesures de performance
+=========================================================================
+
+create_client_excel_template_dgi.create_test_client_data ne produit que 12
+clients écrits à la main. Ce générateur construit une FNEV4.db réaliste de
+plusieurs millions de lignes, reproductible à partir d'une graine :
+
+- VatTypes       : TVA (18%), TVAB (9%), TVAC et TVAD (0%), mêmes Id que le seed EF
+- Clients        : mix B2B / B2C / B2G / B2F, NCC au format DGI, client divers 1999
+- ImportSessions : un import Sage 100 pour ~200 factures
+- FneInvoices    : clients très actifs plus fréquents, avoirs rattachés à une
+                   facture d'origine, statuts Certified / Draft / Error / Pending
+- FneInvoiceItems: 1 à 20 lignes, codes TVA pondérés, quelques taxes AIRSI / DTD
+- FneApiLogs     : appels de certification (et retentatives en erreur)
+
+Écriture : executemany par lots dans de grosses transactions, journal
+désactivé pendant le chargement et index secondaires créés à la fin.
+Les lots de factures ont chacun leur graine et sont générés par un pool de
+processus pendant que le processus principal écrit : le résultat est
+identique quel que soit le nombre de processus.
+
+Débit : l'objectif de 500 000 lignes/s n'est PAS atteint. Mesuré sur la
+machine de développement (un cœur, SQLite 3.40, 60 000 factures) :
+~60 000 lignes/s de bout en bout, ~140 000 lignes/s pour la génération
+Python seule et ~120 000 lignes/s pour l'écriture seule de tuples déjà
+construits (Id GUID texte, 21 à 32 colonnes, un seul écrivain). Ajouter
+des processus n'accélère que la génération : le total reste borné par
+l'écriture sur une connexion. Pour comparaison, sur une table étroite de
+10 colonnes, executemany plafonne vers 350 000 lignes/s et un
+INSERT ... SELECT sur une CTE vers 500 000 lignes/s.
+
+Usage:
+    python fnev4_datagen.py bench_1M.db --clients 200000 --invoices 1000000
+"""
+
+import os
+import random
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+DEFAULT_SEED = 20250907
+DEFAULT_BATCH_SIZE = 50000
+
+# Schéma des tables générées (migration InitialCreate + DefaultPaymentMethod)
+TABLES_SQL = """
+CREATE TABLE "Clients" (
+    "Id" TEXT NOT NULL CONSTRAINT "PK_Clients" PRIMARY KEY,
+    "ClientCode" TEXT NOT NULL, "ClientNcc" TEXT, "Name" TEXT NOT NULL, "CompanyName" TEXT,
+    "Address" TEXT, "Phone" TEXT, "Email" TEXT, "ClientType" TEXT NOT NULL,
+    "DefaultTemplate" TEXT NOT NULL, "IsActive" INTEGER NOT NULL, "Country" TEXT,
+    "DefaultCurrency" TEXT, "SellerName" TEXT, "TaxIdentificationNumber" TEXT, "Notes" TEXT,
+    "CreatedDate" TEXT NOT NULL, "LastModifiedDate" TEXT, "CreatedAt" TEXT NOT NULL,
+    "UpdatedAt" TEXT, "IsDeleted" INTEGER NOT NULL,
+    "DefaultPaymentMethod" TEXT NOT NULL DEFAULT 'cash'
+);
+CREATE TABLE "ImportSessions" (
+    "Id" TEXT NOT NULL CONSTRAINT "PK_ImportSessions" PRIMARY KEY,
+    "FileName" TEXT NOT NULL, "FilePath" TEXT NOT NULL, "StartedAt" TEXT NOT NULL,
+    "CompletedAt" TEXT, "Status" TEXT NOT NULL, "TotalInvoicesFound" INTEGER NOT NULL,
+    "InvoicesImported" INTEGER NOT NULL, "ErrorsCount" INTEGER NOT NULL, "ErrorMessages" TEXT,
+    "FileSize" INTEGER NOT NULL, "UserName" TEXT, "CreatedAt" TEXT NOT NULL, "UpdatedAt" TEXT,
+    "IsDeleted" INTEGER NOT NULL
+);
+CREATE TABLE "VatTypes" (
+    "Id" TEXT NOT NULL CONSTRAINT "PK_VatTypes" PRIMARY KEY,
+    "Code" TEXT NOT NULL, "Description" TEXT NOT NULL, "Rate" decimal(5,2) NOT NULL,
+    "IsActive" INTEGER NOT NULL, "CreatedAt" TEXT NOT NULL, "UpdatedAt" TEXT,
+    "IsDeleted" INTEGER NOT NULL
+);
+CREATE TABLE "FneInvoices" (
+    "Id" TEXT NOT NULL CONSTRAINT "PK_FneInvoices" PRIMARY KEY,
+    "InvoiceNumber" TEXT NOT NULL, "FneReference" TEXT, "InvoiceType" TEXT NOT NULL,
+    "InvoiceDate" TEXT NOT NULL, "ClientId" TEXT NOT NULL, "ClientCode" TEXT NOT NULL,
+    "PointOfSale" TEXT NOT NULL, "Establishment" TEXT, "PaymentMethod" TEXT NOT NULL,
+    "Template" TEXT NOT NULL, "TotalAmountHT" decimal(18,2) NOT NULL,
+    "TotalVatAmount" decimal(18,2) NOT NULL, "TotalAmountTTC" decimal(18,2) NOT NULL,
+    "GlobalDiscount" decimal(5,2) NOT NULL, "Status" TEXT NOT NULL, "VerificationToken" TEXT,
+    "VerificationUrl" TEXT, "ParentInvoiceId" TEXT, "RneNumber" TEXT, "IsRne" INTEGER NOT NULL,
+    "CommercialMessage" TEXT, "Footer" TEXT, "ForeignCurrency" TEXT,
+    "ForeignCurrencyRate" decimal(10,4), "ImportSessionId" TEXT, "CertifiedAt" TEXT,
+    "ErrorMessages" TEXT, "RetryCount" INTEGER NOT NULL, "CreatedAt" TEXT NOT NULL,
+    "UpdatedAt" TEXT, "IsDeleted" INTEGER NOT NULL,
+    CONSTRAINT "FK_FneInvoices_Clients_ClientId" FOREIGN KEY ("ClientId") REFERENCES "Clients" ("Id") ON DELETE RESTRICT,
+    CONSTRAINT "FK_FneInvoices_FneInvoices_ParentInvoiceId" FOREIGN KEY ("ParentInvoiceId") REFERENCES "FneInvoices" ("Id") ON DELETE RESTRICT,
+    CONSTRAINT "FK_FneInvoices_ImportSessions_ImportSessionId" FOREIGN KEY ("ImportSessionId") REFERENCES "ImportSessions" ("Id") ON DELETE SET NULL
+);
+CREATE TABLE "FneApiLogs" (
+    "Id" TEXT NOT NULL CONSTRAINT "PK_FneApiLogs" PRIMARY KEY,
+    "FneInvoiceId" TEXT, "OperationType" TEXT NOT NULL, "Endpoint" TEXT NOT NULL,
+    "HttpMethod" TEXT NOT NULL, "RequestBody" TEXT, "RequestHeaders" TEXT,
+    "ResponseStatusCode" INTEGER NOT NULL, "ResponseBody" TEXT, "ResponseHeaders" TEXT,
+    "ProcessingTimeMs" INTEGER NOT NULL, "IsSuccess" INTEGER NOT NULL, "ErrorMessage" TEXT,
+    "ErrorStackTrace" TEXT, "AttemptNumber" INTEGER NOT NULL, "ErrorType" TEXT,
+    "FneReference" TEXT, "VerificationToken" TEXT, "StickerBalance" INTEGER,
+    "Environment" TEXT NOT NULL, "ServerIpAddress" TEXT, "UserName" TEXT, "SessionId" TEXT,
+    "LogLevel" TEXT NOT NULL, "Timestamp" TEXT NOT NULL, "CreatedAt" TEXT NOT NULL,
+    "UpdatedAt" TEXT, "IsDeleted" INTEGER NOT NULL,
+    CONSTRAINT "FK_FneApiLogs_FneInvoices_FneInvoiceId" FOREIGN KEY ("FneInvoiceId") REFERENCES "FneInvoices" ("Id") ON DELETE CASCADE
+);
+CREATE TABLE "FneInvoiceItems" (
+    "Id" TEXT NOT NULL CONSTRAINT "PK_FneInvoiceItems" PRIMARY KEY,
+    "FneInvoiceId" TEXT NOT NULL, "ProductCode" TEXT NOT NULL, "Description" TEXT NOT NULL,
+    "UnitPrice" decimal(18,2) NOT NULL, "Quantity" decimal(10,3) NOT NULL,
+    "MeasurementUnit" TEXT, "VatTypeId" TEXT NOT NULL, "VatCode" TEXT NOT NULL,
+    "VatRate" decimal(5,2) NOT NULL, "LineAmountHT" decimal(18,2) NOT NULL,
+    "LineVatAmount" decimal(18,2) NOT NULL, "LineAmountTTC" decimal(18,2) NOT NULL,
+    "ItemDiscount" decimal(5,2) NOT NULL, "Reference" TEXT, "LineOrder" INTEGER NOT NULL,
+    "FneItemId" TEXT, "CustomTaxes" TEXT, "CreatedAt" TEXT NOT NULL, "UpdatedAt" TEXT,
+    "IsDeleted" INTEGER NOT NULL,
+    CONSTRAINT "FK_FneInvoiceItems_FneInvoices_FneInvoiceId" FOREIGN KEY ("FneInvoiceId") REFERENCES "FneInvoices" ("Id") ON DELETE CASCADE,
+    CONSTRAINT "FK_FneInvoiceItems_VatTypes_VatTypeId" FOREIGN KEY ("VatTypeId") REFERENCES "VatTypes" ("Id") ON DELETE RESTRICT
+);
+"""
+
+# Index de la migration, créés après le chargement
+INDEXES_SQL = """
+CREATE UNIQUE INDEX "IX_Clients_ClientCode" ON "Clients" ("ClientCode");
+CREATE INDEX "IX_Clients_ClientNcc" ON "Clients" ("ClientNcc");
+CREATE INDEX "IX_Clients_ClientType" ON "Clients" ("ClientType");
+CREATE INDEX "IX_Clients_IsActive" ON "Clients" ("IsActive");
+CREATE INDEX "IX_Clients_Name" ON "Clients" ("Name");
+CREATE INDEX "IX_FneApiLogs_FneInvoiceId" ON "FneApiLogs" ("FneInvoiceId");
+CREATE INDEX "IX_FneApiLogs_IsSuccess" ON "FneApiLogs" ("IsSuccess");
+CREATE INDEX "IX_FneApiLogs_LogLevel" ON "FneApiLogs" ("LogLevel");
+CREATE INDEX "IX_FneApiLogs_OperationType" ON "FneApiLogs" ("OperationType");
+CREATE INDEX "IX_FneApiLogs_Timestamp" ON "FneApiLogs" ("Timestamp");
+CREATE INDEX "IX_FneInvoiceItems_FneInvoiceId" ON "FneInvoiceItems" ("FneInvoiceId");
+CREATE INDEX "IX_FneInvoiceItems_ProductCode" ON "FneInvoiceItems" ("ProductCode");
+CREATE INDEX "IX_FneInvoiceItems_VatTypeId" ON "FneInvoiceItems" ("VatTypeId");
+CREATE INDEX "IX_FneInvoices_ClientId" ON "FneInvoices" ("ClientId");
+CREATE INDEX "IX_FneInvoices_FneReference" ON "FneInvoices" ("FneReference");
+CREATE INDEX "IX_FneInvoices_ImportSessionId" ON "FneInvoices" ("ImportSessionId");
+CREATE INDEX "IX_FneInvoices_InvoiceDate" ON "FneInvoices" ("InvoiceDate");
+CREATE INDEX "IX_FneInvoices_InvoiceNumber" ON "FneInvoices" ("InvoiceNumber");
+CREATE INDEX "IX_FneInvoices_ParentInvoiceId" ON "FneInvoices" ("ParentInvoiceId");
+CREATE INDEX "IX_FneInvoices_Status" ON "FneInvoices" ("Status");
+CREATE INDEX "IX_ImportSessions_StartedAt" ON "ImportSessions" ("StartedAt");
+CREATE INDEX "IX_ImportSessions_Status" ON "ImportSessions" ("Status");
+CREATE INDEX "IX_ImportSessions_UserName" ON "ImportSessions" ("UserName");
+CREATE UNIQUE INDEX "IX_VatTypes_Code" ON "VatTypes" ("Code");
+CREATE INDEX "IX_VatTypes_IsActive" ON "VatTypes" ("IsActive");
+"""
+
+# Seed EF (VatTypeConfiguration) : mêmes Id, taux en pourcentage
+VAT_TYPES = [
+    ("11111111-1111-1111-1111-111111111111", "TVA", "TVA normal de 18%", 18.0),
+    ("22222222-2222-2222-2222-222222222222", "TVAB", "TVA réduit de 9%", 9.0),
+    ("33333333-3333-3333-3333-333333333333", "TVAC", "TVA exec conv de 0%", 0.0),
+    ("44444444-4444-4444-4444-444444444444", "TVAD", "TVA exec leg de 0% pour TEE et RME", 0.0),
+]
+VAT_WEIGHTS = (75, 12, 8, 5)
+
+CLIENT_TYPES = ("B2B", "B2C", "B2G", "B2F")
+CLIENT_TYPE_WEIGHTS = (55, 30, 10, 5)
+CLIENT_CODE_PREFIXES = {"B2B": "CLI", "B2C": "PART", "B2G": "GOUV", "B2F": "INT"}
+CLIENT_DIVERS_CODE = "1999"
+
+# Moyens de paiement acceptés par FNEV4 (MoyensPaiementA18.Valides côté C#)
+PAYMENT_METHODS = ("cash", "card", "mobile-money", "bank-transfer", "check", "credit")
+PAYMENT_WEIGHTS = (45, 15, 20, 12, 5, 3)
+INVOICE_STATUSES = ("Certified", "Draft", "Error", "Pending")
+STATUS_WEIGHTS = (85, 8, 5, 2)
+# FneInvoices.PointOfSale : 10 caractères au plus (HasMaxLength(10))
+POINTS_OF_SALE = ("PDV-ABJ-01", "PDV-ABJ-02", "PDV-BKE", "PDV-SPY", "PDV-YAM")
+POS_WEIGHTS = (40, 25, 15, 12, 8)
+MEASUREMENT_UNITS = ("pcs", "kg", "l", "m", "carton", "sac")
+
+LAST_NAMES = ("KOUASSI", "KONE", "TRAORE", "OUATTARA", "YAO", "KOFFI", "DIABATE", "BAMBA",
+              "COULIBALY", "N'GUESSAN", "TOURE", "DIALLO", "AKA", "BROU", "SORO", "GBAGBO")
+FIRST_NAMES = ("Aminata", "Moussa", "Ibrahim", "Awa", "Jean", "Marie", "Seydou", "Fatou",
+               "Kouadio", "Adjoua", "Yves", "Mariam", "Drissa", "Aya", "Serge", "Salimata")
+COMPANY_WORDS = ("SOCIETE", "IVOIRIENNE", "COMPAGNIE", "AFRICAINE", "DISTRIBUTION", "COMMERCE",
+                 "TRANSPORT", "BTP", "TELECOM", "SERVICES", "AGRO", "INDUSTRIES", "CÔTE D'IVOIRE",
+                 "ENERGIE", "NEGOCE", "IMPORT-EXPORT")
+GOV_ENTITIES = ("MINISTERE", "DIRECTION GENERALE", "CONSEIL REGIONAL", "MAIRIE", "AGENCE NATIONALE")
+CITIES = ("Abidjan", "Bouaké", "Yamoussoukro", "San-Pédro", "Korhogo", "Daloa", "Man")
+FOREIGN = (("FR", "France", "EUR"), ("DE", "Allemagne", "EUR"), ("US", "États-Unis", "USD"),
+           ("GH", "Ghana", "GHS"), ("SN", "Sénégal", "XOF"), ("BF", "Burkina Faso", "XOF"))
+CUSTOM_TAXES = ('[{"name":"AIRSI","amount":5}]', '[{"name":"DTD","amount":1}]')
+
+
+class _Guids:
+    """
+    GUID déterministes issus du générateur aléatoire
+
+    Par défaut les 12 premiers chiffres (table, lot, compteur) rendent les clés
+    croissantes comme NEWSEQUENTIALID : l'index de clé primaire se remplit en
+    fin d'arbre. random_order=True reproduit l'ordre aléatoire de Guid.NewGuid().
+    """
+
+    def __init__(self, rng, prefix, chunk=0, random_order=False):
+        self.rng = rng
+        self.head = f"{prefix:01X}{chunk:05X}"
+        self.random_order = random_order
+        self.counter = 0
+
+    def next(self):
+        self.counter += 1
+        if self.random_order:
+            h = f"{self.rng.getrandbits(128):032X}"
+        else:
+            h = f"{self.head}{self.counter:06X}{self.rng.getrandbits(80):020X}"
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def _weighted_table(values, weights):
+    """Table de tirage rapide : rng.choice sur une liste pondérée"""
+    table = []
+    for value, weight in zip(values, weights):
+        table.extend([value] * weight)
+    return table
+
+
+def _timestamps(start, days):
+    """Dates 'YYYY-MM-DD' de la période, indexées par numéro de jour"""
+    return [(start + timedelta(days=i)).isoformat() for i in range(days)]
+
+
+# Contexte partagé des lots de factures (copié une fois par processus de travail)
+_chunk_context = {}
+
+
+def _init_chunk_context(context):
+    _chunk_context.clear()
+    _chunk_context.update(context)
+
+
+def _invoice_chunk(task):
+    """
+    Génère un lot de factures avec leurs lignes et leurs logs d'API
+
+    Chaque lot a sa propre graine (graine globale, numéro de lot) : le
+    résultat ne dépend pas du nombre de processus de travail.
+    """
+    chunk_index, first, count = task
+    ctx = _chunk_context
+    rng = random.Random(ctx['seed'] * 1000003 + chunk_index)
+    invoice_guids = _Guids(rng, 3, chunk_index, ctx['random_guids'])
+    item_guids = _Guids(rng, 4, chunk_index, ctx['random_guids'])
+    log_guids = _Guids(rng, 5, chunk_index, ctx['random_guids'])
+    days = ctx['days']
+    n_days = len(days)
+    total_invoices = ctx['invoices']
+    clients = ctx['clients']
+    n_clients = len(clients)
+    sessions = ctx['sessions']
+    products = ctx['products']
+    n_products = len(products)
+    vat_table = _weighted_table(VAT_TYPES, VAT_WEIGHTS)
+    statuses = _weighted_table(INVOICE_STATUSES, STATUS_WEIGHTS)
+    payments = _weighted_table(PAYMENT_METHODS, PAYMENT_WEIGHTS)
+    points_of_sale = _weighted_table(POINTS_OF_SALE, POS_WEIGHTS)
+    max_extra_items = max(0, int(round((ctx['avg_items'] - 1) * 2)))
+    random_ = rng.random
+    randrange = rng.randrange
+    choice = rng.choice
+    recent_sales = []
+
+    invoices, items, logs = [], [], []
+    for n in range(first, first + count):
+        invoice_id = invoice_guids.next()
+        # Loi puissance : les premiers clients concentrent les factures
+        client_id, client_code, client_type = clients[int(n_clients * random_() ** 2.5)]
+        day_index = n * n_days // total_invoices
+        day = days[day_index]
+        moment = f"{day} {randrange(7, 19):02d}:{randrange(60):02d}:{randrange(60):02d}"
+
+        parent_id = None
+        invoice_type = "sale"
+        if recent_sales and random_() < 0.04:
+            invoice_type = "refund"
+            parent_id = recent_sales[randrange(len(recent_sales))]
+        else:
+            recent_sales.append(invoice_id)
+            if len(recent_sales) > 1000:
+                recent_sales.pop(0)
+
+        total_ht = total_vat = 0
+        for line in range(1 + randrange(max_extra_items + 1)):
+            code, description, price, unit = products[randrange(n_products)]
+            vat_id, vat_code, _, rate = choice(vat_table)
+            quantity = randrange(1, 20)
+            amount_ht = price * quantity
+            amount_vat = amount_ht * rate / 100
+            total_ht += amount_ht
+            total_vat += amount_vat
+            items.append((item_guids.next(), invoice_id, code, description, price, quantity, unit,
+                          vat_id, vat_code, rate, amount_ht, amount_vat, amount_ht + amount_vat, 0,
+                          None, line, None, CUSTOM_TAXES[line & 1] if random_() < 0.03 else None,
+                          moment, None, 0))
+
+        status = choice(statuses)
+        certified = status == "Certified"
+        reference = f"25{day_index:04d}{n:09d}" if certified else None
+        token = f"tok{n:012d}" if certified else None
+        foreign = client_type == "B2F"
+        invoices.append((invoice_id, f"FAC{n:09d}", reference, invoice_type, moment, client_id,
+                         client_code, choice(points_of_sale), None, choice(payments), client_type,
+                         total_ht, total_vat, total_ht + total_vat, 0, status, token, None, parent_id,
+                         None, 0, None, None, "EUR" if foreign else None, 655.957 if foreign else None,
+                         sessions[randrange(len(sessions))] if random_() < 0.7 else None,
+                         moment if certified else None,
+                         "Erreur de validation DGI" if status == "Error" else None,
+                         randrange(1, 4) if status == "Error" else 0, moment, None, 0))
+
+        if certified or status == "Error":
+            attempts = 1 if certified else 2
+            for attempt in range(1, attempts + 1):
+                success = certified and attempt == attempts
+                logs.append((log_guids.next(), invoice_id, "Certification", "/external/invoices/sign",
+                             "POST", None, None, 200 if success else 400, None, None,
+                             randrange(80, 3000), 1 if success else 0,
+                             None if success else "Bad Request", None, attempt,
+                             None if success else "Validation", reference, token if success else None,
+                             None, "Test", None, "admin", None, "Information" if success else "Error",
+                             moment, moment, None, 0))
+
+    return invoices, items, logs
+
+
+class DatabaseGenerator:
+    """Génère une base FNEV4 synthétique reproductible"""
+
+    def __init__(self, path, clients=100000, invoices=500000, avg_items=3.0, seed=DEFAULT_SEED,
+                 batch_size=DEFAULT_BATCH_SIZE, start_date=date(2024, 1, 1), days=640,
+                 random_guids=False, workers=None, progress=None):
+        self.path = str(path)
+        self.clients = clients
+        self.invoices = invoices
+        self.avg_items = avg_items
+        self.seed = seed
+        self.batch_size = batch_size
+        self.days = _timestamps(start_date, days)
+        self.random_guids = random_guids
+        # Par défaut : un cœur pour SQLite, les autres génèrent les lots (débit borné par l'écriture)
+        self.workers = workers if workers is not None else max(1, (os.cpu_count() or 1) - 1)
+        self.progress = progress
+        self.rng = random.Random(seed)
+        self.stats = {}
+
+    def _insert(self, conn, table, sql, rows):
+        """executemany par lots, une transaction par lot ; retourne le nombre de lignes"""
+        total = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                conn.execute("BEGIN")
+                conn.executemany(sql, batch)
+                conn.execute("COMMIT")
+                total += len(batch)
+                batch = []
+                if self.progress:
+                    self.progress(table, total)
+        if batch:
+            conn.execute("BEGIN")
+            conn.executemany(sql, batch)
+            conn.execute("COMMIT")
+            total += len(batch)
+        self.stats[table] = total
+        return total
+
+    # --- Générateurs de lignes ------------------------------------------------
+
+    def _vat_types(self):
+        for vat_id, code, description, rate in VAT_TYPES:
+            yield (vat_id, code, description, rate, 1, "2025-09-04 00:00:00", None, 0)
+
+    def _client_rows(self):
+        rng = self.rng
+        guids = _Guids(rng, 1, random_order=self.random_guids)
+        types = _weighted_table(CLIENT_TYPES, CLIENT_TYPE_WEIGHTS)
+        payments = _weighted_table(PAYMENT_METHODS, PAYMENT_WEIGHTS)
+        days = self.days
+        self.client_keys = []
+
+        # Client divers des imports Sage 100 (code 1999, sans NCC)
+        divers_id = guids.next()
+        self.client_keys.append((divers_id, CLIENT_DIVERS_CODE, "B2C"))
+        yield (divers_id, CLIENT_DIVERS_CODE, None, "CLIENT DIVERS", None, "Abidjan", None, None,
+               "B2C", "B2C", 1, "Côte d'Ivoire", "XOF", None, None, "Client divers Sage 100",
+               days[0], None, days[0], None, 0, "cash")
+
+        for n in range(1, self.clients):
+            client_type = rng.choice(types)
+            code = f"{CLIENT_CODE_PREFIXES[client_type]}{n:07d}"
+            city = rng.choice(CITIES)
+            country, currency = "Côte d'Ivoire", "XOF"
+            if client_type == "B2C":
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                name = f"{last} {first.upper()}"
+                company = None
+                ncc = None
+                email = f"{first.lower()}.{last.lower().replace(chr(39), '')}{n}@gmail.com"
+            elif client_type == "B2F":
+                prefix, country, currency = rng.choice(FOREIGN)
+                name = f"{rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_WORDS)} {prefix}"
+                company = name
+                ncc = f"{prefix}{rng.randrange(10**8, 10**9)}"
+                email = f"contact{n}@example.{prefix.lower()}"
+                city = None
+            else:
+                if client_type == "B2G":
+                    name = f"{rng.choice(GOV_ENTITIES)} {rng.choice(COMPANY_WORDS)}"
+                    ncc = f"{rng.randrange(1000000, 1999999)}{chr(65 + rng.randrange(26))}"
+                else:
+                    name = f"{rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_WORDS)} {rng.choice(LAST_NAMES)}"
+                    ncc = f"{rng.randrange(1000000, 9999999)}{chr(65 + rng.randrange(26))}"
+                company = name
+                email = f"info{n}@entreprise.ci"
+
+            created = days[rng.randrange(len(days))]
+            client_id = guids.next()
+            self.client_keys.append((client_id, code, client_type))
+            yield (client_id, code, ncc, name, company, city, f"+225 07{rng.randrange(10**7, 10**8)}",
+                   email, client_type, client_type, 1 if rng.random() < 0.95 else 0, country, currency,
+                   None, ncc, None, created, None, created, None, 1 if rng.random() < 0.01 else 0,
+                   rng.choice(payments))
+
+    def _session_rows(self):
+        rng = self.rng
+        guids = _Guids(rng, 2, random_order=self.random_guids)
+        count = max(1, self.invoices // 200)
+        days = self.days
+        self.session_ids = []
+        for n in range(count):
+            session_id = guids.next()
+            self.session_ids.append(session_id)
+            day = days[min(len(days) - 1, n * len(days) // count)]
+            found = rng.randrange(50, 400)
+            errors = rng.randrange(0, 5) if rng.random() < 0.2 else 0
+            yield (session_id, f"factures_{day.replace('-', '')}_{n}.xlsx",
+                   f"C:\\FNEV4\\Data\\Import\\factures_{n}.xlsx", f"{day} 08:00:00", f"{day} 08:05:00",
+                   "Completed" if not errors else "CompletedWithErrors", found, found - errors, errors,
+                   None, rng.randrange(20000, 2000000), "admin", f"{day} 08:00:00", None, 0)
+
+    def _invoice_chunks(self):
+        """Lots (factures, lignes, logs) dans l'ordre, générés en parallèle si possible"""
+        context = {
+            'seed': self.seed,
+            'clients': self.client_keys,
+            'sessions': self.session_ids,
+            'days': self.days,
+            'invoices': self.invoices,
+            'avg_items': self.avg_items,
+            'random_guids': self.random_guids,
+            'products': [(f"P{p:05d}", f"Produit {p:05d}", self.rng.randrange(500, 250000, 50),
+                          self.rng.choice(MEASUREMENT_UNITS)) for p in range(2000)],
+        }
+        tasks = [(index, first, min(self.batch_size, self.invoices - first))
+                 for index, first in enumerate(range(0, self.invoices, self.batch_size))]
+
+        if self.workers <= 1:
+            _init_chunk_context(context)
+            for task in tasks:
+                yield _invoice_chunk(task)
+            return
+
+        # Fenêtre bornée : au plus 2 lots d'avance par processus en mémoire
+        with ProcessPoolExecutor(self.workers, initializer=_init_chunk_context,
+                                 initargs=(context,)) as executor:
+            pending = deque()
+            for task in tasks:
+                pending.append(executor.submit(_invoice_chunk, task))
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    # --- Orchestration ---------------------------------------------------------
+
+    def generate(self, overwrite=False):
+        if os.path.exists(self.path):
+            if not overwrite:
+                raise FileExistsError(f"La base existe déjà: {self.path}")
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+
+        started = time.perf_counter()
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        try:
+            # Chargement initial d'un fichier jetable : ni journal ni fsync
+            for pragma in ("journal_mode = OFF", "synchronous = OFF", "locking_mode = EXCLUSIVE",
+                           "cache_size = -262144", "temp_store = MEMORY"):
+                conn.execute(f"PRAGMA {pragma}")
+            conn.executescript(TABLES_SQL)
+
+            def placeholders(columns):
+                return ",".join("?" * columns)
+
+            self._insert(conn, "VatTypes", f"INSERT INTO VatTypes VALUES ({placeholders(8)})", self._vat_types())
+            self._insert(conn, "Clients", f"INSERT INTO Clients VALUES ({placeholders(22)})", self._client_rows())
+            self._insert(conn, "ImportSessions", f"INSERT INTO ImportSessions VALUES ({placeholders(15)})",
+                         self._session_rows())
+
+            invoice_sql = f"INSERT INTO FneInvoices VALUES ({placeholders(32)})"
+            item_sql = f"INSERT INTO FneInvoiceItems VALUES ({placeholders(21)})"
+            log_sql = f"INSERT INTO FneApiLogs VALUES ({placeholders(28)})"
+            counts = {'FneInvoices': 0, 'FneInvoiceItems': 0, 'FneApiLogs': 0}
+            for invoices, items, logs in self._invoice_chunks():
+                conn.execute("BEGIN")
+                conn.executemany(invoice_sql, invoices)
+                conn.executemany(item_sql, items)
+                conn.executemany(log_sql, logs)
+                conn.execute("COMMIT")
+                counts['FneInvoices'] += len(invoices)
+                counts['FneInvoiceItems'] += len(items)
+                counts['FneApiLogs'] += len(logs)
+                if self.progress:
+                    self.progress("FneInvoices", counts['FneInvoices'])
+            self.stats.update(counts)
+
+            index_started = time.perf_counter()
+            conn.executescript(INDEXES_SQL)
+            conn.execute("ANALYZE")
+            index_seconds = time.perf_counter() - index_started
+            conn.execute("PRAGMA journal_mode = WAL")
+        finally:
+            conn.close()
+
+        total_rows = sum(self.stats.values())
+        seconds = time.perf_counter() - started
+        load_seconds = seconds - index_seconds
+        return {
+            'path': self.path,
+            'seed': self.seed,
+            'tables': dict(self.stats),
+            'rows': total_rows,
+            'load_seconds': round(load_seconds, 2),
+            'index_seconds': round(index_seconds, 2),
+            'seconds': round(seconds, 2),
+            'rows_per_second': round(total_rows / load_seconds) if load_seconds else 0,
+        }
+
+
+def generate_database(path, clients=100000, invoices=500000, avg_items=3.0, seed=DEFAULT_SEED,
+                      overwrite=False, **options):
+    """Raccourci : génère la base et retourne le résumé (lignes, durées, débit)"""
+    return DatabaseGenerator(path, clients, invoices, avg_items, seed, **options).generate(overwrite)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Génère une base FNEV4 synthétique reproductible")
+    parser.add_argument("output", help="Fichier .db à créer")
+    parser.add_argument("--clients", type=int, default=100000)
+    parser.add_argument("--invoices", type=int, default=500000)
+    parser.add_argument("--avg-items", type=float, default=3.0, help="Lignes moyennes par facture")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--random-guids", action="store_true", help="GUID dans un ordre aléatoire (Guid.NewGuid)")
+    parser.add_argument("--workers", type=int, help="Processus de génération (défaut: cœurs - 1)")
+    parser.add_argument("--force", action="store_true", help="Écraser la base existante")
+    args = parser.parse_args()
+
+    print("🏭 FNEV4 - GÉNÉRATION D'UNE BASE SYNTHÉTIQUE")
+    print("=" * 50)
+    summary = generate_database(
+        args.output, args.clients, args.invoices, args.avg_items, args.seed, overwrite=args.force,
+        batch_size=args.batch_size, random_guids=args.random_guids, workers=args.workers,
+        progress=lambda table, rows: print(f"\r   ⏳ {table}: {rows:,}", end="", flush=True))
+    print()
+    for table, rows in summary['tables'].items():
+        print(f"   📋 {table}: {rows:,}")
+    print(f"✅ {summary['rows']:,} lignes en {summary['load_seconds']}s "
+          f"({summary['rows_per_second']:,} lignes/s) + index {summary['index_seconds']}s")
+    print(f"📁 {summary['path']} (graine {summary['seed']})")
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Accès centralisé SQLite pour les scripts Python
+========================================================
+
+Module partagé par tous les scripts de diagnostic et de maintenance.
+Il résout le chemin de FNEV4.db une seule fois (même ordre de priorité que
+DatabasePathProvider côté C#), puis distribue des connexions réglées
+(WAL, mmap, cache, busy_timeout) depuis un petit pool réutilisable.
+
+Usage:
+    from fnev4_db import read_connection, write_connection
+
+    with read_connection() as conn:
+        conn.execute("SELECT COUNT(*) FROM Clients").fetchone()
+
+    with write_connection() as conn:   # commit automatique, rollback si erreur
+        conn.execute("DELETE FROM Clients WHERE Id = ?", (client_id,))
+"""
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Racine du projet : ce module est situé à la racine du dépôt FNEV4
+PROJECT_ROOT = Path(__file__).resolve().parent
+
+# Chemin fixe de développement (identique à DatabasePathProvider.cs)
+DEV_DATABASE_PATH = r"C:\wamp64\www\FNEV4\data\FNEV4.db"
+
+# Clés possibles dans la table AppSettings pour surcharger le chemin
+APPSETTINGS_PATH_KEYS = ("DatabasePath", "Database.Path", "DatabaseFilePath")
+
+# Pragmas appliqués à chaque nouvelle connexion
+BASE_PRAGMAS = {
+    "busy_timeout": 5000,          # attendre l'application WPF au lieu d'échouer
+    "cache_size": -65536,          # 64 Mo de cache de pages
+    "mmap_size": 268435456,        # 256 Mo en lecture mappée
+    "temp_store": "MEMORY",
+}
+WRITE_PRAGMAS = {
+    "journal_mode": "WAL",         # lecteurs et écrivain ne se bloquent plus
+    "synchronous": "NORMAL",
+}
+READ_PRAGMAS = {
+    "query_only": 1,
+}
+
+# Taille du cache de requêtes préparées par connexion (sqlite3 natif)
+STATEMENT_CACHE_SIZE = 256
+DEFAULT_POOL_SIZE = 4
+# Attente maximale d'une connexion libre (secondes) : une connexion jamais
+# rendue, ou un write_connection imbriqué dans le même thread, lève une
+# erreur au lieu de bloquer le script indéfiniment
+DEFAULT_ACQUIRE_TIMEOUT = 30
+
+_resolved_path = None
+_resolve_lock = threading.Lock()
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _path_from_appsettings_json():
+    """Lit ConnectionStrings.DefaultConnection dans appsettings.json"""
+    for config_file in (PROJECT_ROOT / "appsettings.json",
+                        PROJECT_ROOT / "src" / "FNEV4.Presentation" / "appsettings.json"):
+        if not config_file.exists():
+            continue
+        try:
+            with open(config_file, 'r', encoding='utf-8-sig') as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            continue
+
+        connection = content.get('ConnectionStrings', {}).get('DefaultConnection', '')
+        if not connection:
+            continue
+
+        # Accepte "data\\FNEV4.db" comme "Data Source=data\\FNEV4.db;Cache=Shared"
+        for part in connection.split(';'):
+            key, _, value = part.partition('=')
+            if value and key.strip().lower() == 'data source':
+                connection = value
+                break
+
+        relative = Path(connection.strip().replace('\\', os.sep))
+        return relative if relative.is_absolute() else PROJECT_ROOT / relative
+    return None
+
+
+def _path_from_appsettings_table(db_path):
+    """Cherche une surcharge du chemin dans la table AppSettings"""
+    try:
+        conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            placeholders = ",".join("?" for _ in APPSETTINGS_PATH_KEYS)
+            row = conn.execute(
+                f"SELECT Value FROM AppSettings WHERE Key IN ({placeholders}) "
+                f"AND Value IS NOT NULL AND Value <> '' LIMIT 1",
+                APPSETTINGS_PATH_KEYS,
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+    if row and os.path.isfile(row[0]):
+        return Path(row[0])
+    return None
+
+
+def resolve_database_path(refresh=False):
+    """
+    Résout le chemin de la base FNEV4 (résultat mis en cache)
+
+    Ordre de priorité :
+    1. Variable d'environnement FNEV4_DATABASE_PATH
+    2. Chemin fixe de développement C:\\wamp64\\www\\FNEV4\\data\\FNEV4.db
+    3. appsettings.json (ConnectionStrings.DefaultConnection)
+    4. <racine du projet>/data/FNEV4.db
+    La table AppSettings de la base trouvée peut ensuite rediriger vers
+    un autre fichier existant.
+    """
+    global _resolved_path
+
+    with _resolve_lock:
+        if _resolved_path is not None and not refresh:
+            return _resolved_path
+
+        candidate = None
+        env_path = os.environ.get("FNEV4_DATABASE_PATH")
+        if env_path:
+            candidate = Path(env_path)
+        elif os.path.isdir(os.path.dirname(DEV_DATABASE_PATH)):
+            candidate = Path(DEV_DATABASE_PATH)
+        else:
+            candidate = _path_from_appsettings_json() or PROJECT_ROOT / "data" / "FNEV4.db"
+
+        if candidate.exists():
+            candidate = _path_from_appsettings_table(candidate) or candidate
+
+        _resolved_path = str(candidate)
+        return _resolved_path
+
+
+def _apply_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def connect(db_path=None, readonly=True):
+    """
+    Ouvre une connexion réglée hors pool
+
+    Utile pour les bases secondaires (copies dispersées, sauvegardes) ou
+    pour les threads qui gardent leur propre connexion.
+    """
+    db_path = str(db_path or resolve_database_path())
+
+    if readonly:
+        uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        _apply_pragmas(conn, BASE_PRAGMAS)
+        _apply_pragmas(conn, READ_PRAGMAS)
+    else:
+        # URI aussi en écriture pour autoriser ATTACH 'file:...?mode=ro'
+        uri = Path(db_path).resolve().as_uri()
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        _apply_pragmas(conn, BASE_PRAGMAS)
+        _apply_pragmas(conn, WRITE_PRAGMAS)
+    return conn
+
+
+class ConnectionPool:
+    """Pool thread-safe de connexions réglées vers une même base"""
+
+    def __init__(self, db_path, readonly=True, size=DEFAULT_POOL_SIZE):
+        self.db_path = str(db_path)
+        self.readonly = readonly
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self, timeout=DEFAULT_ACQUIRE_TIMEOUT):
+        """
+        Récupère une connexion libre ou en crée une tant que le pool n'est pas plein
+
+        Lève TimeoutError si aucune connexion ne se libère en `timeout`
+        secondes (None : attente illimitée).
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return connect(self.db_path, readonly=self.readonly)
+                except Exception:
+                    self._created -= 1
+                    raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            mode = "en lecture" if self.readonly else "en écriture"
+            raise TimeoutError(f"Aucune connexion {mode} libre après {timeout}s "
+                               f"({self.size} en service) vers {self.db_path} : "
+                               f"connexion non rendue ou write_connection imbriqué ?") from None
+
+    def release(self, conn):
+        """Rend une connexion au pool (transaction en cours annulée)"""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    @contextmanager
+    def connection(self, timeout=DEFAULT_ACQUIRE_TIMEOUT):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+
+def get_pool(db_path=None, readonly=True, size=DEFAULT_POOL_SIZE):
+    """Retourne le pool partagé pour (chemin, mode)"""
+    db_path = str(db_path or resolve_database_path())
+    key = (os.path.normcase(os.path.abspath(db_path)), readonly)
+
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_path, readonly=readonly, size=size)
+        return pool
+
+
+@contextmanager
+def read_connection(db_path=None, timeout=DEFAULT_ACQUIRE_TIMEOUT):
+    """Connexion en lecture seule depuis le pool (mode=ro, query_only)"""
+    with get_pool(db_path, readonly=True).connection(timeout) as conn:
+        yield conn
+
+
+@contextmanager
+def write_connection(db_path=None, timeout=DEFAULT_ACQUIRE_TIMEOUT):
+    """Connexion en écriture depuis le pool : commit en sortie, rollback sur erreur"""
+    # Un seul écrivain à la fois : SQLite ne sait pas faire mieux
+    with get_pool(db_path, readonly=False, size=1).connection(timeout) as conn:
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+
+def close_all():
+    """Ferme toutes les connexions de tous les pools"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+atexit.register(close_all)
+
+
+def database_exists(db_path=None):
+    return os.path.isfile(str(db_path or resolve_database_path()))
+
+
+if __name__ == "__main__":
+    path = resolve_database_path()
+    print("🔗 FNEV4 - Accès centralisé à la base de données")
+    print("=" * 50)
+    print(f"📁 Chemin résolu: {path}")
+    if database_exists(path):
+        with read_connection() as conn:
+            journal = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            tables = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='table'").fetchone()[0]
+        print(f"📋 Tables: {tables}")
+        print(f"📓 Journal: {journal}")
+    else:
+        print("❌ Base de données introuvable")
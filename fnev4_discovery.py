@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Découverte des bases SQLite du projet
+==============================================
+
+Les scripts de diagnostic parcouraient tout le dépôt avec rglob (obj/, .git/,
+.vs/ compris), parfois trois fois de suite, puis ouvraient chaque .db l'un
+après l'autre pour compter ses tables.
+
+Ici un seul parcours os.scandir élague les dossiers qui ne contiennent
+jamais de base (obj, .git, .vs, venv, node_modules, caches...). bin/ reste
+parcouru : c'est là que l'application créait ses copies parasites (voir
+explain_bin_problem.py). Chaque candidat est d'abord reconnu par son en-tête
+de 16 octets "SQLite format 3\\0", puis sondé dans un pool de threads via une
+URI `mode=ro&immutable=1` (aucun verrou, aucun -wal/-shm créé).
+
+Les résultats sont mis en cache par (chemin, taille, mtime) dans
+.fnev4_discovery_cache.json : un second parcours ne rouvre aucun fichier
+inchangé et répond en quelques millisecondes.
+
+Usage:
+    from fnev4_discovery import discover_databases
+
+    for db in discover_databases(pattern="*FNEV4*.db"):
+        print(db['relative_path'], db['table_count'])
+"""
+
+import fnmatch
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from fnev4_db import PROJECT_ROOT
+from fnev4_stats import estimate_counts, format_rows
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+CACHE_PATH = PROJECT_ROOT / ".fnev4_discovery_cache.json"
+# Incrémenté quand le contenu d'un sondage change : les entrées plus anciennes sont resondées
+PROBE_VERSION = 2
+
+# Dossiers jamais parcourus (sorties intermédiaires, dépôts, environnements)
+PRUNED_DIRS = frozenset({
+    ".git", ".vs", ".vscode", ".idea", "obj", "node_modules", "packages", "TestResults",
+    "__pycache__", ".pytest_cache", ".mypy_cache", ".ruff_cache", ".tox", ".nox",
+    ".venv", "venv", "env",
+})
+
+DEFAULT_WORKERS = 8
+
+_memory_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _is_pruned(entry, prune):
+    if entry.name in prune:
+        return True
+    # Environnement virtuel quel que soit son nom
+    return os.path.exists(os.path.join(entry.path, "pyvenv.cfg"))
+
+
+def walk_files(root=PROJECT_ROOT, pattern="*.db", prune=PRUNED_DIRS):
+    """
+    Parcours unique de `root` : (chemin, stat) des fichiers dont le nom
+    correspond à `pattern` (fnmatch), dossiers de `prune` ignorés
+    """
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not _is_pruned(entry, prune):
+                                stack.append(entry.path)
+                        elif entry.is_file() and fnmatch.fnmatch(entry.name, pattern):
+                            yield entry.path, entry.stat()
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+def has_sqlite_header(path):
+    """Vrai si le fichier commence par l'en-tête SQLite (16 octets)"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    except OSError:
+        return False
+
+
+def immutable_uri(path):
+    return f"{Path(path).resolve().as_uri()}?mode=ro&immutable=1"
+
+
+def probe_database(path):
+    """
+    Tables et nombre de clients (estimation fnev4_stats) d'une base, sans verrou
+
+    immutable=1 ignore un éventuel -wal : la clé de cache inclut donc aussi
+    la taille et la date du -wal pour resonder dès qu'il change.
+    """
+    result = {'is_sqlite': has_sqlite_header(path), 'is_valid': False, 'table_count': 0,
+              'tables': [], 'clients': None, 'clients_exact': False, 'error': None}
+    if not result['is_sqlite']:
+        return result
+
+    try:
+        conn = sqlite3.connect(immutable_uri(path), uri=True, check_same_thread=False)
+        try:
+            tables = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+            result['tables'] = tables
+            result['table_count'] = len(tables)
+            result['is_valid'] = bool(tables)
+            if 'Clients' in tables:
+                clients = estimate_counts(conn, ['Clients'])['Clients']
+                result['clients'] = clients['rows']
+                result['clients_exact'] = clients['exact']
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        result['error'] = str(e)
+    return result
+
+
+def _cache_key(path, stat):
+    try:
+        wal = os.stat(path + "-wal")
+        wal_key = [wal.st_size, wal.st_mtime_ns]
+    except OSError:
+        wal_key = None
+    return [PROBE_VERSION, stat.st_size, stat.st_mtime_ns, wal_key]
+
+
+def load_cache(cache_path=CACHE_PATH):
+    cache_path = str(cache_path)
+    with _cache_lock:
+        if cache_path in _memory_cache:
+            return _memory_cache[cache_path]
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        entries = {}
+    with _cache_lock:
+        _memory_cache[cache_path] = entries
+    return entries
+
+
+def save_cache(entries, cache_path=CACHE_PATH):
+    cache_path = str(cache_path)
+    with _cache_lock:
+        _memory_cache[cache_path] = entries
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Dépôt en lecture seule : le cache mémoire suffit pour ce processus
+        pass
+
+
+def clear_cache(cache_path=CACHE_PATH):
+    with _cache_lock:
+        _memory_cache.pop(str(cache_path), None)
+    try:
+        os.remove(cache_path)
+    except OSError:
+        pass
+
+
+def client_rows(db):
+    """Nombre de clients d'une entrée à afficher : '~50000' pour une estimation"""
+    return format_rows({'rows': db['clients'], 'exact': db.get('clients_exact', False)})
+
+
+def discover_databases(root=PROJECT_ROOT, pattern="*.db", prune=PRUNED_DIRS, workers=DEFAULT_WORKERS,
+                       refresh=False, cache_path=CACHE_PATH, sqlite_only=False):
+    """
+    Bases trouvées sous `root`, triées par chemin
+
+    Chaque entrée contient path, relative_path, size, modified (datetime),
+    is_sqlite, is_valid, table_count, tables, clients (estimation, None
+    sans table Clients ; clients_exact si c'est un vrai comptage) et
+    error. `refresh` ignore le cache ; `sqlite_only` écarte les fichiers
+    sans en-tête SQLite.
+    """
+    root = Path(root).resolve()
+    cache = {} if refresh else load_cache(cache_path)
+
+    found = []
+    to_probe = []
+    for path, stat in walk_files(root, pattern, prune):
+        key = _cache_key(path, stat)
+        cached = cache.get(path)
+        probe = cached['probe'] if cached and cached['key'] == key else None
+        if probe is None:
+            to_probe.append(path)
+        found.append((path, stat, key, probe))
+
+    if to_probe:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(to_probe)))) as pool:
+            fresh = dict(zip(to_probe, pool.map(probe_database, to_probe)))
+        found = [(path, stat, key, probe or fresh[path]) for path, stat, key, probe in found]
+
+    # Les fichiers disparus de cette racine (pour ce filtre) sortent du cache
+    root_prefix = str(root) + os.sep
+    entries = {path: entry for path, entry in cache.items()
+               if not (path.startswith(root_prefix) and fnmatch.fnmatch(os.path.basename(path), pattern))}
+    entries.update({path: {'key': key, 'probe': probe} for path, _, key, probe in found})
+    if to_probe or set(entries) != set(cache):
+        save_cache(entries, cache_path)
+
+    databases = []
+    for path, stat, _, probe in sorted(found, key=lambda item: item[0]):
+        if sqlite_only and not probe['is_sqlite']:
+            continue
+        databases.append({
+            'path': path,
+            'relative_path': os.path.relpath(path, root),
+            'size': stat.st_size,
+            'modified': datetime.fromtimestamp(stat.st_mtime),
+            **probe,
+        })
+    return databases
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Découverte des bases SQLite du projet FNEV4")
+    parser.add_argument("--root", default=str(PROJECT_ROOT), help="Dossier parcouru (défaut: racine du projet)")
+    parser.add_argument("--pattern", default="*.db", help="Filtre de nom (fnmatch)")
+    parser.add_argument("--refresh", action="store_true", help="Ignorer le cache et tout resonder")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    print("🔍 FNEV4 - DÉCOUVERTE DES BASES")
+    print("=" * 50)
+    started = time.perf_counter()
+    databases = discover_databases(args.root, args.pattern, workers=args.workers, refresh=args.refresh)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    for db in databases:
+        status = "✅" if db['is_valid'] else ("⚠️" if db['is_sqlite'] else "❌")
+        clients = (f", {client_rows(db)} clients" if db['clients'] is not None else "")
+        print(f"{status} {db['relative_path']} ({db['size']:,} bytes, {db['table_count']} tables{clients})")
+        if db['error']:
+            print(f"   ❌ {db['error']}")
+    print(f"\n📊 {len(databases)} fichier(s) en {elapsed:.1f} ms")
@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Export colonnaire des factures pour l'analyse
+======================================================
+
+Chaque analyse demandée par la finance se faisait en SQL ad hoc sur la base
+en service. Cet export écrit FneInvoices et FneInvoiceItems en Parquet (ou
+Arrow IPC) partitionné par mois et point de vente :
+
+    Data/Export/analytics/invoices/month=2025-09/pos=ABIDJAN/part-00001-0001.parquet
+    Data/Export/analytics/items/month=2025-09/pos=ABIDJAN/part-00001-0001.parquet
+
+- lecture par tranches de rowid (mémoire constante quel que soit le volume)
+- montants en decimal128 exacts (18,2), (10,3), (5,2), (10,4), dates en
+  timestamp, booléens et entiers typés
+- export incrémental : un filigrane (_watermark.json) garde le dernier
+  rowid et le dernier UpdatedAt exportés ; l'exécution suivante n'écrit que
+  les lignes nouvelles ou modifiées, dans de nouveaux fichiers. La colonne
+  ExportRun permet de garder la version la plus récente d'une ligne
+  (voir read_export).
+- suppressions : une ligne supprimée de la base reste dans les fichiers
+  déjà écrits. Chaque exécution compare les Id exportés aux Id encore
+  présents dans la base et écrit les disparus dans _deleted/<dataset>/
+  (pierres tombales Id + DeletedRun) ; read_export les écarte. Cette
+  comparaison relit la colonne Id de l'export à chaque exécution, par
+  lots, et se fait dans SQLite (voir record_deletions).
+
+Nécessite pyarrow (pip install pyarrow). Lecture :
+    pandas.read_parquet("Data/Export/analytics/items")
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote
+
+from fnev4_db import connect, resolve_database_path
+
+try:
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # export colonnaire optionnel
+    np = pa = pc = pq = None
+
+FORMAT_PARQUET = "parquet"
+FORMAT_ARROW = "arrow"
+FORMAT_EXTENSIONS = {FORMAT_PARQUET: ".parquet", FORMAT_ARROW: ".arrow"}
+
+DEFAULT_CHUNK_ROWS = 100000
+# Lignes accumulées par partition avant d'écrire un row group
+DEFAULT_ROW_GROUP_ROWS = 131072
+# Plafond global de lignes en attente, toutes partitions confondues
+MAX_BUFFERED_ROWS = 262144
+MAX_OPEN_WRITERS = 32
+
+WATERMARK_FILE = "_watermark.json"
+DELETED_DIR = "_deleted"
+
+# (colonne exportée, expression SQL, type) ; type = "decimal(p,s)", "string",
+# "int", "bool" ou "timestamp"
+INVOICE_COLUMNS = [
+    ("Id", "f.Id", "string"),
+    ("InvoiceNumber", "f.InvoiceNumber", "string"),
+    ("FneReference", "f.FneReference", "string"),
+    ("InvoiceType", "f.InvoiceType", "string"),
+    ("InvoiceDate", "f.InvoiceDate", "timestamp"),
+    ("ClientId", "f.ClientId", "string"),
+    ("ClientCode", "f.ClientCode", "string"),
+    ("PointOfSale", "f.PointOfSale", "string"),
+    ("PaymentMethod", "f.PaymentMethod", "string"),
+    ("Template", "f.Template", "string"),
+    ("TotalAmountHT", "f.TotalAmountHT", "decimal(18,2)"),
+    ("TotalVatAmount", "f.TotalVatAmount", "decimal(18,2)"),
+    ("TotalAmountTTC", "f.TotalAmountTTC", "decimal(18,2)"),
+    ("GlobalDiscount", "f.GlobalDiscount", "decimal(5,2)"),
+    ("Status", "f.Status", "string"),
+    ("ParentInvoiceId", "f.ParentInvoiceId", "string"),
+    ("IsRne", "f.IsRne", "bool"),
+    ("ForeignCurrency", "f.ForeignCurrency", "string"),
+    ("ForeignCurrencyRate", "f.ForeignCurrencyRate", "decimal(10,4)"),
+    ("ImportSessionId", "f.ImportSessionId", "string"),
+    ("CertifiedAt", "f.CertifiedAt", "timestamp"),
+    ("RetryCount", "f.RetryCount", "int"),
+    ("CreatedAt", "f.CreatedAt", "timestamp"),
+    ("UpdatedAt", "f.UpdatedAt", "timestamp"),
+    ("IsDeleted", "f.IsDeleted", "bool"),
+]
+
+ITEM_COLUMNS = [
+    ("Id", "i.Id", "string"),
+    ("FneInvoiceId", "i.FneInvoiceId", "string"),
+    ("InvoiceNumber", "f.InvoiceNumber", "string"),
+    ("InvoiceDate", "f.InvoiceDate", "timestamp"),
+    ("Template", "f.Template", "string"),
+    ("ProductCode", "i.ProductCode", "string"),
+    ("Description", "i.Description", "string"),
+    ("UnitPrice", "i.UnitPrice", "decimal(18,2)"),
+    ("Quantity", "i.Quantity", "decimal(10,3)"),
+    ("MeasurementUnit", "i.MeasurementUnit", "string"),
+    ("VatCode", "i.VatCode", "string"),
+    ("VatRate", "i.VatRate", "decimal(5,2)"),
+    ("LineAmountHT", "i.LineAmountHT", "decimal(18,2)"),
+    ("LineVatAmount", "i.LineVatAmount", "decimal(18,2)"),
+    ("LineAmountTTC", "i.LineAmountTTC", "decimal(18,2)"),
+    ("ItemDiscount", "i.ItemDiscount", "decimal(5,2)"),
+    ("LineOrder", "i.LineOrder", "int"),
+    ("CustomTaxes", "i.CustomTaxes", "string"),
+    ("CreatedAt", "i.CreatedAt", "timestamp"),
+    ("UpdatedAt", "i.UpdatedAt", "timestamp"),
+    ("IsDeleted", "i.IsDeleted", "bool"),
+]
+
+# Tables exportées : alias de la table lue, jointure, colonnes, clés de partition
+DATASETS = {
+    "invoices": {
+        "table": "FneInvoices", "alias": "f", "from": "FneInvoices f",
+        "columns": INVOICE_COLUMNS,
+    },
+    "items": {
+        "table": "FneInvoiceItems", "alias": "i",
+        "from": "FneInvoiceItems i LEFT JOIN FneInvoices f ON f.Id = i.FneInvoiceId",
+        "columns": ITEM_COLUMNS,
+    },
+}
+
+# Partition : mois de la facture et point de vente (valeur de repli si absente)
+PARTITION_SQL = ("COALESCE(substr(f.InvoiceDate, 1, 7), 'inconnu')", "COALESCE(f.PointOfSale, 'inconnu')")
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Export colonnaire indisponible : installer le paquet 'pyarrow'")
+
+
+def default_export_dir(db_path=None):
+    """Data/Export/analytics à côté de la base (PathSettings.ExportFolder)"""
+    db_path = db_path or resolve_database_path()
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "Export", "analytics")
+
+
+def _decimal_spec(kind):
+    precision, scale = kind[len("decimal("):-1].split(",")
+    return int(precision), int(scale)
+
+
+def _select_expression(expression, kind):
+    if kind.startswith("decimal"):
+        # Valeur non mise à l'échelle (entier) : conversion exacte en decimal128 sans objet Decimal
+        _, scale = _decimal_spec(kind)
+        return f"CAST(ROUND({expression} * {10 ** scale}) AS INTEGER)"
+    if kind == "timestamp":
+        # Format unique (NULL si illisible) pour un cast Arrow sans surprise
+        return f"strftime('%Y-%m-%d %H:%M:%f', {expression})"
+    return expression
+
+
+def arrow_schema(columns):
+    _require_pyarrow()
+    types = {"string": pa.string(), "int": pa.int64(), "bool": pa.bool_(), "timestamp": pa.timestamp("ms")}
+    fields = []
+    for name, _, kind in columns:
+        if kind.startswith("decimal"):
+            fields.append(pa.field(name, pa.decimal128(*_decimal_spec(kind))))
+        else:
+            fields.append(pa.field(name, types[kind]))
+    fields.append(pa.field("ExportRun", pa.int32()))
+    return pa.schema(fields)
+
+
+def _decimal_array(values, precision, scale):
+    """Entiers mis à l'échelle -> decimal128 (16 octets little-endian, signe étendu)"""
+    integers = pa.array(values, type=pa.int64())
+    low = integers.fill_null(0).to_numpy(zero_copy_only=False)
+    high = low >> 63
+    data = pa.py_buffer(np.column_stack((low, high)).tobytes())
+    return pa.Array.from_buffers(pa.decimal128(precision, scale), len(integers),
+                                 [integers.buffers()[0], data], null_count=integers.null_count)
+
+
+def _column_array(values, kind):
+    if kind.startswith("decimal"):
+        return _decimal_array(values, *_decimal_spec(kind))
+    if kind == "timestamp":
+        return pc.cast(pa.array(values, type=pa.string()), pa.timestamp("ms"))
+    if kind == "bool":
+        return pa.array([None if value is None else bool(value) for value in values], type=pa.bool_())
+    if kind == "int":
+        return pa.array(values, type=pa.int64())
+    return pa.array(values, type=pa.string())
+
+
+def _partition_dir(month, point_of_sale):
+    # Encodage URI : décodé par le partitionnement "hive" de pyarrow / pandas
+    return os.path.join(f"month={quote(str(month), safe='')}", f"pos={quote(str(point_of_sale), safe='')}")
+
+
+class PartitionedWriter:
+    """
+    Écritures par partition avec tampon borné
+
+    Les lignes d'une partition s'accumulent jusqu'à `row_group_rows` puis
+    partent en un row group ; au-delà de MAX_BUFFERED_ROWS en attente, la
+    plus grosse partition est vidée. Au plus MAX_OPEN_WRITERS fichiers
+    ouverts (LRU) : une partition refermée repart dans un nouveau fichier.
+    """
+
+    def __init__(self, root, schema, export_format, run, row_group_rows=DEFAULT_ROW_GROUP_ROWS):
+        self.root = root
+        self.schema = schema
+        self.export_format = export_format
+        self.run = run
+        self.row_group_rows = row_group_rows
+        self.buffers = {}
+        self.buffered_rows = 0
+        self.writers = OrderedDict()
+        self.sequence = {}
+        self.files = []
+
+    def _writer(self, partition):
+        writer = self.writers.get(partition)
+        if writer is not None:
+            self.writers.move_to_end(partition)
+            return writer
+        if len(self.writers) >= MAX_OPEN_WRITERS:
+            _, oldest = self.writers.popitem(last=False)
+            oldest.close()
+
+        self.sequence[partition] = self.sequence.get(partition, 0) + 1
+        directory = os.path.join(self.root, _partition_dir(*partition))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{self.run:05d}-{self.sequence[partition]:04d}"
+                                       f"{FORMAT_EXTENSIONS[self.export_format]}")
+        if self.export_format == FORMAT_PARQUET:
+            writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_file(path, self.schema)
+        self.writers[partition] = writer
+        self.files.append(path)
+        return writer
+
+    def _flush(self, partition):
+        batches = self.buffers.pop(partition, [])
+        if not batches:
+            return
+        table = pa.Table.from_batches(batches, schema=self.schema)
+        self.buffered_rows -= table.num_rows
+        self._writer(partition).write_table(table)
+
+    def write(self, partition, batch):
+        self.buffers.setdefault(partition, []).append(batch)
+        self.buffered_rows += batch.num_rows
+        if sum(b.num_rows for b in self.buffers[partition]) >= self.row_group_rows:
+            self._flush(partition)
+        while self.buffered_rows > MAX_BUFFERED_ROWS:
+            largest = max(self.buffers, key=lambda key: sum(b.num_rows for b in self.buffers[key]))
+            self._flush(largest)
+
+    def close(self):
+        for partition in list(self.buffers):
+            self._flush(partition)
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+        return self.files
+
+
+def _load_watermark(export_dir):
+    path = os.path.join(export_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {"run": 0, "datasets": {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_watermark(export_dir, watermark):
+    path = os.path.join(export_dir, WATERMARK_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(watermark, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _file_format(watermark):
+    return "ipc" if watermark.get("format") == FORMAT_ARROW else "parquet"
+
+
+def _read_tombstones(export_dir, name, file_format):
+    """Table (Id, DeletedRun) des lignes supprimées, ou None"""
+    import pyarrow.dataset as ds
+
+    directory = os.path.join(export_dir, DELETED_DIR, name)
+    if not os.path.isdir(directory):
+        return None
+    return ds.dataset(directory, format=file_format).to_table()
+
+
+def _drop_deleted(table, tombstones):
+    """Écarte les versions exportées avant la suppression de leur Id"""
+    if tombstones is None or not tombstones.num_rows or not table.num_rows:
+        return table
+    deleted = tombstones.group_by("Id").aggregate([("DeletedRun", "max")])
+    joined = table.join(deleted, keys="Id", join_type="left outer")
+    # Un Id réinséré après sa suppression revient avec un ExportRun plus récent
+    keep = pc.or_kleene(pc.is_null(joined["DeletedRun_max"]),
+                        pc.greater(joined["ExportRun"], joined["DeletedRun_max"]))
+    return joined.filter(keep).drop_columns(["DeletedRun_max"])
+
+
+def _write_tombstones(path, export_format, batch, writer=None):
+    if writer is None:
+        if export_format == FORMAT_PARQUET:
+            writer = pq.ParquetWriter(path, batch.schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_file(path, batch.schema)
+    writer.write_table(pa.Table.from_batches([batch]))
+    return writer
+
+
+def record_deletions(db_path, name, export_dir, run, export_format=FORMAT_PARQUET,
+                     chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Écrit les pierres tombales des Id exportés qui ont disparu de la base
+
+    La comparaison se fait dans une base SQLite de travail (fichier
+    temporaire du dossier d'export, base source attachée en lecture seule) :
+    les Id exportés y sont versés par lots, puis une anti-jointure sur la
+    clé primaire de la source donne les disparus, relus par lots. Mémoire
+    constante quel que soit le volume. Retourne le nombre de lignes
+    supprimées depuis l'exécution précédente.
+    """
+    import pyarrow.dataset as ds
+
+    if not os.path.isdir(os.path.join(export_dir, name)):
+        return 0
+    file_format = _file_format(_load_watermark(export_dir))
+    scratch_path = os.path.join(export_dir, f".deletions-{name}-{run:05d}.db")
+    conn = connect(scratch_path, readonly=False)
+    conn.isolation_level = None
+    writer = None
+    deleted = 0
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("ATTACH DATABASE ? AS src", (f"{Path(db_path).resolve().as_uri()}?mode=ro",))
+        conn.execute("CREATE TABLE exported (Id TEXT NOT NULL PRIMARY KEY, Run INTEGER NOT NULL) WITHOUT ROWID")
+        conn.execute("CREATE TABLE tombstones (Id TEXT NOT NULL PRIMARY KEY, Run INTEGER NOT NULL) WITHOUT ROWID")
+
+        # Dernière version exportée et dernière suppression connue de chaque Id
+        sources = [("exported", os.path.join(export_dir, name), ["Id", "ExportRun"], "hive"),
+                   ("tombstones", os.path.join(export_dir, DELETED_DIR, name), ["Id", "DeletedRun"], None)]
+        for table, directory, columns, partitioning in sources:
+            if not os.path.isdir(directory):
+                continue
+            dataset = ds.dataset(directory, format=file_format, partitioning=partitioning)
+            for batch in dataset.to_batches(columns=columns, batch_size=chunk_rows):
+                conn.execute("BEGIN")
+                conn.executemany(f"INSERT INTO {table} (Id, Run) VALUES (?, ?) "
+                                 f"ON CONFLICT (Id) DO UPDATE SET Run = max(Run, excluded.Run)",
+                                 zip(batch[columns[0]].to_pylist(), batch[columns[1]].to_pylist()))
+                conn.execute("COMMIT")
+
+        # Exportés, pas déjà supprimés (ou réinsérés depuis), absents de la source
+        cursor = conn.execute(f"""
+            SELECT e.Id FROM exported e
+            LEFT JOIN tombstones d ON d.Id = e.Id
+            WHERE (d.Run IS NULL OR e.Run > d.Run)
+              AND NOT EXISTS (SELECT 1 FROM src.{DATASETS[name]['table']} t WHERE t.Id = e.Id)
+        """)
+        path = os.path.join(export_dir, DELETED_DIR, name, f"part-{run:05d}{FORMAT_EXTENSIONS[export_format]}")
+        while True:
+            ids = [row[0] for row in cursor.fetchmany(chunk_rows)]
+            if not ids:
+                break
+            if writer is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(ids, type=pa.string()), pa.array(np.full(len(ids), run, dtype=np.int32))],
+                names=["Id", "DeletedRun"])
+            writer = _write_tombstones(path, export_format, batch, writer)
+            deleted += len(ids)
+    finally:
+        if writer is not None:
+            writer.close()
+        conn.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(scratch_path + suffix):
+                os.remove(scratch_path + suffix)
+    return deleted
+
+
+def _chunk_queries(dataset, mark):
+    """Requêtes (sql, borne rowid basse) : lignes nouvelles, puis lignes modifiées déjà exportées"""
+    alias = dataset["alias"]
+    columns = ", ".join(_select_expression(expression, kind) for _, expression, kind in dataset["columns"])
+    base = (f"SELECT {alias}.rowid, {PARTITION_SQL[0]}, {PARTITION_SQL[1]}, {columns} "
+            f"FROM {dataset['from']} WHERE {alias}.rowid > ?")
+    queries = [(f"{base} ORDER BY {alias}.rowid LIMIT ?", [])]
+    if mark:
+        # Lignes déjà exportées puis modifiées : parcours limité aux rowid connus
+        queries.append((f"{base} AND {alias}.rowid <= ? AND {alias}.UpdatedAt > ? "
+                        f"ORDER BY {alias}.rowid LIMIT ?", [mark["rowid"], mark.get("updated_at") or ""]))
+    return queries
+
+
+def export_dataset(conn, name, export_dir, run, mark=None, export_format=FORMAT_PARQUET,
+                   chunk_rows=DEFAULT_CHUNK_ROWS, progress=None):
+    """
+    Exporte un dataset (invoices ou items) ; retourne (lignes, fichiers, nouveau filigrane)
+
+    `mark` : filigrane précédent {"rowid", "updated_at"} ou None pour un export complet.
+    """
+    dataset = DATASETS[name]
+    schema = arrow_schema(dataset["columns"])
+    kinds = [kind for _, _, kind in dataset["columns"]]
+    writer = PartitionedWriter(os.path.join(export_dir, name), schema, export_format, run)
+
+    # Bornes figées au début : les lignes écrites pendant l'export partent au suivant
+    max_rowid = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {dataset['table']}").fetchone()[0]
+    max_updated = conn.execute(f"SELECT MAX(UpdatedAt) FROM {dataset['table']}").fetchone()[0]
+    start_rowid = mark["rowid"] if mark else 0
+    run_column = None
+    exported = 0
+
+    try:
+        for sql, extra in _chunk_queries(dataset, mark):
+            last_rowid = 0 if extra else start_rowid
+            while True:
+                rows = conn.execute(sql, [last_rowid, *extra, chunk_rows]).fetchall()
+                rows = [row for row in rows if row[0] <= max_rowid]
+                if not rows:
+                    break
+                last_rowid = rows[-1][0]
+
+                columns = list(zip(*rows))
+                arrays = [_column_array(values, kind) for values, kind in zip(columns[3:], kinds)]
+                if run_column is None or len(run_column) != len(rows):
+                    run_column = pa.array(np.full(len(rows), run, dtype=np.int32))
+                batch = pa.RecordBatch.from_arrays(arrays + [run_column], schema=schema)
+
+                partitions = {}
+                for index, key in enumerate(zip(columns[1], columns[2])):
+                    partitions.setdefault(key, []).append(index)
+                for key, indices in partitions.items():
+                    writer.write(key, batch.take(pa.array(indices, type=pa.int32())))
+
+                exported += len(rows)
+                if progress:
+                    progress(name, exported)
+                if len(rows) < chunk_rows or last_rowid >= max_rowid:
+                    break
+    finally:
+        files = writer.close()
+
+    new_mark = {"rowid": max(max_rowid, start_rowid),
+                "updated_at": max(filter(None, [max_updated, (mark or {}).get("updated_at")]), default=None)}
+    return exported, files, new_mark
+
+
+def export_analytics(db_path=None, export_dir=None, datasets=("invoices", "items"),
+                     export_format=FORMAT_PARQUET, incremental=True, chunk_rows=DEFAULT_CHUNK_ROWS,
+                     progress=None):
+    """
+    Exporte les datasets demandés ; le filigrane n'avance qu'après un export réussi
+
+    incremental=False réécrit tout (nouveau numéro d'exécution, anciens
+    fichiers conservés : supprimer le dossier pour repartir de zéro).
+    """
+    _require_pyarrow()
+    if export_format not in FORMAT_EXTENSIONS:
+        raise ValueError(f"Format inconnu: {export_format} (attendu: {', '.join(FORMAT_EXTENSIONS)})")
+    db_path = str(db_path or resolve_database_path())
+    export_dir = export_dir or default_export_dir(db_path)
+    os.makedirs(export_dir, exist_ok=True)
+
+    watermark = _load_watermark(export_dir)
+    run = watermark["run"] + 1
+    started = time.perf_counter()
+    report = {"run": run, "export_dir": export_dir, "datasets": {}}
+
+    conn = connect(db_path, readonly=True)
+    try:
+        for name in datasets:
+            mark = watermark["datasets"].get(name) if incremental else None
+            dataset_started = time.perf_counter()
+            # Avant l'écriture de l'exécution : seules les versions antérieures sont visées
+            deleted = record_deletions(db_path, name, export_dir, run, export_format, chunk_rows)
+            rows, files, new_mark = export_dataset(conn, name, export_dir, run, mark, export_format,
+                                                   chunk_rows, progress)
+            watermark["datasets"][name] = new_mark
+            elapsed = time.perf_counter() - dataset_started
+            report["datasets"][name] = {"rows": rows, "files": len(files), "deleted": deleted,
+                                        "seconds": round(elapsed, 3),
+                                        "rows_per_second": round(rows / elapsed) if elapsed else 0}
+    finally:
+        conn.close()
+
+    watermark["run"] = run
+    watermark["exported_at"] = datetime.now().isoformat(timespec='seconds')
+    watermark["format"] = export_format
+    _save_watermark(export_dir, watermark)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def read_export(export_dir, name, latest_only=True, columns=None, filters=None, as_float=False,
+                include_deleted=False):
+    """
+    Charge un dataset exporté en table Arrow (to_pandas() pour un DataFrame)
+
+    latest_only ne garde que la dernière version de chaque Id (exports
+    incrémentaux successifs). Les lignes supprimées de la base depuis leur
+    export sont écartées, sauf include_deleted. as_float convertit les
+    décimaux en float64 : pandas matérialise sinon un objet Decimal par valeur.
+    """
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    file_format = _file_format(_load_watermark(export_dir))
+    dataset = ds.dataset(os.path.join(export_dir, name), format=file_format, partitioning="hive")
+    tombstones = None if include_deleted else _read_tombstones(export_dir, name, file_format)
+    if columns and (latest_only or tombstones is not None):
+        columns = list(dict.fromkeys([*columns, "Id", "ExportRun"]))
+    table = _drop_deleted(dataset.to_table(columns=columns, filter=filters), tombstones)
+    if as_float:
+        table = pa.table({field.name: pc.cast(table[field.name], pa.float64())
+                          if pa.types.is_decimal(field.type) else table[field.name]
+                          for field in table.schema})
+
+    runs = pc.min_max(table["ExportRun"]).as_py() if latest_only and table.num_rows else None
+    if not runs or runs["min"] == runs["max"]:
+        return table
+    latest = table.group_by("Id").aggregate([("ExportRun", "max")])
+    return table.join(latest, keys=["Id", "ExportRun"], right_keys=["Id", "ExportRun_max"], join_type="inner")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export Parquet / Arrow des factures FNEV4")
+    parser.add_argument("--db", help="Base (défaut: chemin résolu)")
+    parser.add_argument("--out", help="Dossier d'export (défaut: Data/Export/analytics)")
+    parser.add_argument("--format", choices=list(FORMAT_EXTENSIONS), default=FORMAT_PARQUET)
+    parser.add_argument("--datasets", default="invoices,items", help="invoices, items")
+    parser.add_argument("--full", action="store_true", help="Ignorer le filigrane et tout exporter")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    print("📤 FNEV4 - EXPORT COLONNAIRE")
+    print("=" * 50)
+
+    def _progress(name, rows):
+        print(f"\r   {name}: {rows:,} lignes", end="", flush=True)
+
+    report = export_analytics(args.db, args.out, tuple(args.datasets.split(",")), args.format,
+                              incremental=not args.full, chunk_rows=args.chunk_rows, progress=_progress)
+    print()
+    print(f"✅ Exécution n°{report['run']} -> {report['export_dir']}")
+    for name, stats in report["datasets"].items():
+        print(f"   📦 {name}: {stats['rows']:,} lignes, {stats['files']} fichier(s), "
+              f"{stats['deleted']:,} supprimée(s), {stats['seconds']}s ({stats['rows_per_second']:,} lignes/s)")
+    print(f"⏱️  Total: {report['seconds']}s")
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Index de déduplication des imports Sage 100
+====================================================
+
+data/Archive contient quatre fois le même 93factures_factures.xlsx importé
+le 2025-09-07 : rien n'empêche de retraiter un fichier, ni une facture
+déjà importée depuis un autre classeur, ce qui coûte une analyse et
+surtout des appels de certification en double.
+
+Deux tables dans la base :
+
+    ImportedFileHashes     SHA-256 du fichier entier (clé primaire) : un
+                           classeur déjà traité est reconnu par une seule
+                           recherche, quel que soit son nom
+    ImportedInvoiceHashes  par numéro de facture, l'empreinte canonique de
+                           la feuille (numéro, client, date, avoir,
+                           paiement, lignes produit) : seules les feuilles
+                           nouvelles ou modifiées sont à retraiter
+
+plan_import classe les factures d'un classeur (new / changed / unchanged)
+avec une seule requête sur tous les numéros ; record_import enregistre le
+fichier et les empreintes des factures valides après l'import.
+
+Usage:
+    python fnev4_import_index.py check factures.xlsx
+    python fnev4_import_index.py record factures.xlsx
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from decimal import Decimal, localcontext
+
+from fnev4_db import connect, resolve_database_path
+from fnev4_sage100 import DEFAULT_WORKERS, iter_invoices
+
+FILES_TABLE = "ImportedFileHashes"
+INVOICES_TABLE = "ImportedInvoiceHashes"
+READ_BLOCK = 1024 * 1024
+EXCEL_PRECISION = 15
+
+SCHEMA_STATEMENTS = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {FILES_TABLE} (
+        Sha256 TEXT NOT NULL PRIMARY KEY,
+        FileName TEXT NOT NULL,
+        FileSize INTEGER NOT NULL,
+        SheetCount INTEGER NOT NULL,
+        InvoiceCount INTEGER NOT NULL,
+        FirstImportedAt TEXT NOT NULL,
+        LastSeenAt TEXT NOT NULL,
+        SeenCount INTEGER NOT NULL DEFAULT 1
+    ) WITHOUT ROWID
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {INVOICES_TABLE} (
+        InvoiceNumber TEXT NOT NULL PRIMARY KEY,
+        ContentHash TEXT NOT NULL,
+        FileSha256 TEXT NOT NULL,
+        SheetName TEXT NOT NULL,
+        ImportedAt TEXT NOT NULL,
+        UpdatedAt TEXT
+    ) WITHOUT ROWID
+    """,
+]
+
+# Champs de la facture (fnev4_sage100) qui entrent dans l'empreinte ; le nom
+# et la position de la feuille n'en font pas partie
+HASHED_FIELDS = ("numero_facture", "code_client", "ncc_client", "ncc_client_divers", "date_facture",
+                 "point_de_vente", "numero_facture_avoir", "moyen_paiement")
+HASHED_PRODUCT_FIELDS = ("code_produit", "designation", "prix_unitaire", "quantite", "emballage",
+                         "code_tva", "montant_ht")
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _canonical(value):
+    # Les nombres sont ramenés aux 15 chiffres significatifs d'Excel :
+    # 2282.1800000000003 (ancien enregistrement) et 2282.18 (réenregistré)
+    # ainsi que 317.0 et 317 donnent la même empreinte
+    if value is None:
+        return ""
+    if isinstance(value, Decimal):
+        with localcontext() as context:
+            context.prec = EXCEL_PRECISION
+            return format((+value).normalize(), "f")
+    return str(value)
+
+
+def invoice_hash(invoice):
+    """Empreinte SHA-256 canonique d'une facture (ordre des lignes conservé)"""
+    content = [[_canonical(invoice.get(field)) for field in HASHED_FIELDS]]
+    content += [[_canonical(product.get(field)) for field in HASHED_PRODUCT_FIELDS]
+                for product in invoice['produits']]
+    return hashlib.sha256(json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+                          .encode("utf-8")).hexdigest()
+
+
+def ensure_schema(conn):
+    for statement in SCHEMA_STATEMENTS:
+        conn.execute(statement)
+
+
+def _has_index(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                        (FILES_TABLE,)).fetchone() is not None
+
+
+def find_file(db_path, sha256):
+    """Ligne ImportedFileHashes du fichier (recherche par clé primaire), ou None"""
+    conn = connect(db_path, readonly=True)
+    try:
+        if not _has_index(conn):
+            return None
+        row = conn.execute(f"SELECT FileName, FileSize, SheetCount, InvoiceCount, FirstImportedAt, "
+                           f"LastSeenAt, SeenCount FROM {FILES_TABLE} WHERE Sha256 = ?", (sha256,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return dict(zip(("file_name", "file_size", "sheet_count", "invoice_count", "first_imported_at",
+                     "last_seen_at", "seen_count"), row))
+
+
+def known_hashes(conn, invoice_numbers):
+    """{numéro: empreinte} des factures déjà importées, en une requête"""
+    if not invoice_numbers or not _has_index(conn):
+        return {}
+    return dict(conn.execute(
+        f"SELECT InvoiceNumber, ContentHash FROM {INVOICES_TABLE} "
+        f"WHERE InvoiceNumber IN (SELECT value FROM json_each(?))",
+        (json.dumps(list(invoice_numbers)),)))
+
+
+def plan_import(path, db_path=None, workers=DEFAULT_WORKERS, force=False):
+    """
+    Ce qu'il reste à importer d'un classeur
+
+    Retourne un dict : sha256, file (déjà importé ou None) et, si le fichier
+    est inconnu ou `force`, les factures classées en new / changed /
+    unchanged, plus invalid (feuilles en erreur).
+    """
+    db_path = str(db_path or resolve_database_path())
+    started = time.perf_counter()
+    sha256 = file_sha256(path)
+    plan = {'path': str(path), 'sha256': sha256, 'file': find_file(db_path, sha256),
+            'new': [], 'changed': [], 'unchanged': [], 'invalid': []}
+    if plan['file'] and not force:
+        plan['seconds'] = round(time.perf_counter() - started, 3)
+        return plan
+
+    invoices = []
+    for invoice in iter_invoices(path, workers=workers):
+        if invoice['errors']:
+            plan['invalid'].append(invoice)
+        else:
+            invoice['content_hash'] = invoice_hash(invoice)
+            invoices.append(invoice)
+
+    conn = connect(db_path, readonly=True)
+    try:
+        known = known_hashes(conn, {invoice['numero_facture'] for invoice in invoices})
+    finally:
+        conn.close()
+    for invoice in invoices:
+        previous = known.get(invoice['numero_facture'])
+        key = 'new' if previous is None else ('unchanged' if previous == invoice['content_hash'] else 'changed')
+        plan[key].append(invoice)
+    plan['seconds'] = round(time.perf_counter() - started, 3)
+    return plan
+
+
+def record_import(plan, db_path=None):
+    """Enregistre le fichier et les empreintes des factures nouvelles ou modifiées du plan"""
+    db_path = str(db_path or resolve_database_path())
+    now = _now()
+    sheet_count = sum(len(plan[key]) for key in ('new', 'changed', 'unchanged', 'invalid'))
+    invoice_count = sum(len(plan[key]) for key in ('new', 'changed', 'unchanged'))
+
+    conn = connect(db_path, readonly=False)
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ensure_schema(conn)
+            conn.execute(f"""
+                INSERT INTO {FILES_TABLE} (Sha256, FileName, FileSize, SheetCount, InvoiceCount,
+                                           FirstImportedAt, LastSeenAt)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (Sha256) DO UPDATE SET LastSeenAt = excluded.LastSeenAt, SeenCount = SeenCount + 1
+            """, (plan['sha256'], os.path.basename(plan['path']), os.path.getsize(plan['path']),
+                  sheet_count, invoice_count, now, now))
+            conn.executemany(f"""
+                INSERT INTO {INVOICES_TABLE} (InvoiceNumber, ContentHash, FileSha256, SheetName, ImportedAt)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (InvoiceNumber) DO UPDATE SET
+                    ContentHash = excluded.ContentHash, FileSha256 = excluded.FileSha256,
+                    SheetName = excluded.SheetName, UpdatedAt = excluded.ImportedAt
+            """, [(invoice['numero_facture'], invoice['content_hash'], plan['sha256'], invoice['nom_feuille'], now)
+                  for invoice in plan['new'] + plan['changed']])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+
+def print_plan(plan):
+    if plan['file'] and not (plan['new'] or plan['changed'] or plan['unchanged']):
+        known = plan['file']
+        print(f"⏭️  Fichier déjà importé le {known['first_imported_at']} sous le nom {known['file_name']} "
+              f"({known['invoice_count']} factures, vu {known['seen_count']} fois)")
+        return
+    print(f"🆕 {len(plan['new'])} nouvelle(s), ✏️  {len(plan['changed'])} modifiée(s), "
+          f"⏭️  {len(plan['unchanged'])} déjà importée(s), ❌ {len(plan['invalid'])} en erreur "
+          f"({plan['seconds']}s)")
+    for invoice in plan['changed'][:20]:
+        print(f"   ✏️  {invoice['numero_facture']} ({invoice['nom_feuille']})")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index de déduplication des imports Sage 100")
+    parser.add_argument("action", choices=["check", "record"])
+    parser.add_argument("workbooks", nargs="+")
+    parser.add_argument("--db", help="Base (défaut: chemin résolu)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--force", action="store_true", help="Analyser même un fichier déjà importé")
+    args = parser.parse_args()
+
+    print("🧾 FNEV4 - DÉDUPLICATION DES IMPORTS")
+    print("=" * 50)
+    for workbook in args.workbooks:
+        print(f"\n📗 {workbook}")
+        plan = plan_import(workbook, args.db, args.workers, args.force)
+        print_plan(plan)
+        if args.action == "record":
+            # Un fichier déjà connu met seulement à jour LastSeenAt / SeenCount
+            record_import(plan, args.db)
+            print(f"✅ {len(plan['new']) + len(plan['changed'])} empreinte(s) enregistrée(s)")
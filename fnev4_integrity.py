@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Vérification d'intégrité planifiable
+=============================================
+
+`PRAGMA integrity_check` sur la base de production lit toutes les pages et
+croise chaque index avec sa table : plusieurs minutes sur un gros fichier,
+pendant lesquelles l'application partage le disque avec le diagnostic.
+
+Trois vérifications :
+
+    quick   PRAGMA quick_check sur la base en service (structure des pages,
+            sans le croisement index/table). Usage quotidien.
+    deep    integrity_check + foreign_key_check complets, exécutés sur un
+            instantané (API backup) et non sur le fichier en service.
+    fk      clés étrangères principales vérifiées par anti-jointure, par
+            tranches de rowid et dans un budget de temps ; la tranche
+            suivante reprend où la précédente s'est arrêtée.
+
+Chaque verdict est enregistré dans la table IntegrityChecks de la base :
+la vue Maintenance lit le dernier résultat sans relancer de vérification.
+
+Usage:
+    python fnev4_integrity.py quick
+    python fnev4_integrity.py fk --budget 2
+    python fnev4_integrity.py deep
+    python fnev4_integrity.py status
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+from fnev4_backup import _unique_timestamp, default_backup_dir, online_backup
+from fnev4_db import connect, resolve_database_path
+
+RESULTS_TABLE = "IntegrityChecks"
+PROGRESS_TABLE = "IntegrityCheckProgress"
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_PARTIAL = "partial"
+
+# Clés étrangères vérifiées par tranches : (nom, enfant, colonne, parent)
+FOREIGN_KEYS = [
+    ("FneInvoiceItems.FneInvoiceId", "FneInvoiceItems", "FneInvoiceId", "FneInvoices"),
+    ("FneApiLogs.FneInvoiceId", "FneApiLogs", "FneInvoiceId", "FneInvoices"),
+    ("FneInvoices.ClientId", "FneInvoices", "ClientId", "Clients"),
+]
+
+DEFAULT_SLICE_ROWS = 50000
+DEFAULT_TIME_BUDGET = 5.0
+MAX_SAMPLES = 20
+
+SCHEMA_STATEMENTS = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {RESULTS_TABLE} (
+        Id INTEGER PRIMARY KEY,
+        CheckName TEXT NOT NULL,
+        Status TEXT NOT NULL,
+        Problems INTEGER NOT NULL DEFAULT 0,
+        Details TEXT,
+        Seconds REAL NOT NULL,
+        CheckedAt TEXT NOT NULL
+    )
+    """,
+    f"CREATE INDEX IF NOT EXISTS IX_{RESULTS_TABLE}_CheckName ON {RESULTS_TABLE} (CheckName, CheckedAt)",
+    f"""
+    CREATE TABLE IF NOT EXISTS {PROGRESS_TABLE} (
+        CheckName TEXT NOT NULL PRIMARY KEY,
+        LastRowid INTEGER NOT NULL,
+        EndRowid INTEGER NOT NULL,
+        Problems INTEGER NOT NULL,
+        Samples TEXT NOT NULL,
+        Seconds REAL NOT NULL,
+        StartedAt TEXT NOT NULL
+    ) WITHOUT ROWID
+    """,
+]
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _write(db_path, statements):
+    """Courte transaction d'écriture : [(sql, params), ...]"""
+    conn = connect(db_path, readonly=False)
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql in SCHEMA_STATEMENTS:
+                conn.execute(sql)
+            for sql, params in statements:
+                conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+
+def record_result(db_path, check_name, status, problems=0, details=None, seconds=0.0):
+    _write(db_path, [(
+        f"INSERT INTO {RESULTS_TABLE} (CheckName, Status, Problems, Details, Seconds, CheckedAt) "
+        f"VALUES (?, ?, ?, ?, ?, ?)",
+        (check_name, status, problems, json.dumps(details, ensure_ascii=False) if details is not None else None,
+         round(seconds, 3), _now()))])
+
+
+def latest_results(db_path=None):
+    """Dernier verdict de chaque vérification (ce qu'affiche la vue Maintenance)"""
+    conn = connect(db_path, readonly=True)
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                        (RESULTS_TABLE,)).fetchone() is None:
+            return {}
+        rows = conn.execute(f"""
+            SELECT CheckName, Status, Problems, Details, Seconds, CheckedAt
+            FROM {RESULTS_TABLE} r
+            WHERE Id = (SELECT MAX(Id) FROM {RESULTS_TABLE} WHERE CheckName = r.CheckName)
+            ORDER BY CheckName
+        """).fetchall()
+    finally:
+        conn.close()
+    return {name: {'status': status, 'problems': problems,
+                   'details': json.loads(details) if details else None,
+                   'seconds': seconds, 'checked_at': checked_at}
+            for name, status, problems, details, seconds, checked_at in rows}
+
+
+def _pragma_check(conn, pragma, max_errors):
+    messages = [row[0] for row in conn.execute(f"PRAGMA {pragma}({int(max_errors)})")]
+    return [] if messages == ["ok"] else messages
+
+
+def quick_check(db_path=None, max_errors=100, persist=True):
+    """PRAGMA quick_check sur la base en service ; retourne (statut, messages)"""
+    db_path = str(db_path or resolve_database_path())
+    started = time.perf_counter()
+    conn = connect(db_path, readonly=True)
+    try:
+        problems = _pragma_check(conn, "quick_check", max_errors)
+    finally:
+        conn.close()
+    status = STATUS_ERROR if problems else STATUS_OK
+    if persist:
+        record_result(db_path, "quick_check", status, len(problems), problems or None,
+                      time.perf_counter() - started)
+    return status, problems
+
+
+def deep_check(db_path=None, snapshot_path=None, keep_snapshot=False, max_errors=100, persist=True):
+    """
+    integrity_check et foreign_key_check complets sur un instantané
+
+    Sans `snapshot_path`, un instantané est pris avec l'API backup dans
+    Data/Backup puis supprimé après la vérification (sauf keep_snapshot).
+    Le verdict est enregistré dans la base en service.
+    """
+    db_path = str(db_path or resolve_database_path())
+    started = time.perf_counter()
+
+    created = snapshot_path is None
+    if created:
+        backup_dir = default_backup_dir(db_path)
+        os.makedirs(backup_dir, exist_ok=True)
+        snapshot_path = os.path.join(backup_dir, f"FNEV4_integrity_{_unique_timestamp()}.db")
+        online_backup(db_path, snapshot_path)
+    snapshot_seconds = time.perf_counter() - started
+
+    try:
+        conn = connect(snapshot_path, readonly=True)
+        try:
+            problems = _pragma_check(conn, "integrity_check", max_errors)
+            fk_violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+        finally:
+            conn.close()
+    finally:
+        if created and not keep_snapshot:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(snapshot_path + suffix):
+                    os.remove(snapshot_path + suffix)
+
+    fk_by_table = {}
+    for table, _, parent, _ in fk_violations:
+        key = f"{table}->{parent}"
+        fk_by_table[key] = fk_by_table.get(key, 0) + 1
+
+    total = len(problems) + len(fk_violations)
+    details = {'snapshot': snapshot_path if not created or keep_snapshot else None,
+               'snapshot_seconds': round(snapshot_seconds, 3),
+               'integrity': problems, 'foreign_keys': fk_by_table}
+    status = STATUS_ERROR if total else STATUS_OK
+    if persist:
+        record_result(db_path, "integrity_check", status, total, details, time.perf_counter() - started)
+    return status, details
+
+
+def _load_progress(conn, check_name):
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                    (PROGRESS_TABLE,)).fetchone() is None:
+        return None
+    row = conn.execute(f"SELECT LastRowid, EndRowid, Problems, Samples, Seconds, StartedAt "
+                       f"FROM {PROGRESS_TABLE} WHERE CheckName = ?", (check_name,)).fetchone()
+    if row is None:
+        return None
+    last, end, problems, samples, seconds, started_at = row
+    return {'last': last, 'end': end, 'problems': problems, 'samples': json.loads(samples),
+            'seconds': seconds, 'started_at': started_at}
+
+
+def _orphans_sql(child, column, parent):
+    # Anti-jointure ensembliste sur une plage de rowid de la table enfant
+    return f"""
+        SELECT c.rowid, c.Id, c.{column}
+        FROM {child} c
+        WHERE c.rowid > ? AND c.rowid <= ?
+          AND c.{column} IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM {parent} p WHERE p.Id = c.{column})
+    """
+
+
+def check_foreign_keys(db_path=None, time_budget=DEFAULT_TIME_BUDGET, slice_rows=DEFAULT_SLICE_ROWS,
+                       foreign_keys=None, restart=False, progress=None):
+    """
+    Vérifie les clés étrangères par tranches de `slice_rows` rowid
+
+    S'arrête dès que `time_budget` secondes sont écoulées et enregistre la
+    position atteinte : l'appel suivant reprend à la tranche suivante. Une
+    clé terminée attend que les autres le soient aussi avant un nouveau
+    tour. Un verdict est enregistré pour chaque clé dont le parcours est
+    terminé.
+
+    Retourne {nom: {'status', 'problems', 'done', 'last', 'end'}}.
+    """
+    db_path = str(db_path or resolve_database_path())
+    progress = progress or (lambda name, last, end: None)
+    deadline = time.perf_counter() + time_budget
+    summary = {}
+
+    foreign_keys = foreign_keys or FOREIGN_KEYS
+    conn = connect(db_path, readonly=True)
+    try:
+        states = {name: None if restart else _load_progress(conn, name) for name, _, _, _ in foreign_keys}
+        # Un tour se termine quand toutes les clés sont parcourues ; le suivant repart de zéro
+        if all(state and state['last'] >= state['end'] for state in states.values()):
+            states = dict.fromkeys(states)
+
+        for name, child, column, parent in foreign_keys:
+            state = states[name]
+            if state is None:
+                # Les lignes ajoutées après le début du parcours seront vues au tour suivant
+                end = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {child}").fetchone()[0]
+                state = {'last': 0, 'end': end, 'problems': 0, 'samples': [], 'seconds': 0.0,
+                         'started_at': _now()}
+            elif state['last'] >= state['end']:
+                summary[name] = {'status': STATUS_ERROR if state['problems'] else STATUS_OK,
+                                 'problems': state['problems'], 'done': True,
+                                 'last': state['last'], 'end': state['end']}
+                continue
+
+            sql = _orphans_sql(child, column, parent)
+            while state['last'] < state['end'] and time.perf_counter() < deadline:
+                slice_started = time.perf_counter()
+                upper = min(state['last'] + slice_rows, state['end'])
+                orphans = conn.execute(sql, (state['last'], upper)).fetchall()
+                state['problems'] += len(orphans)
+                room = MAX_SAMPLES - len(state['samples'])
+                if room > 0:
+                    state['samples'].extend([row_id, value] for _, row_id, value in orphans[:room])
+                state['last'] = upper
+                state['seconds'] += time.perf_counter() - slice_started
+                progress(name, state['last'], state['end'])
+
+            done = state['last'] >= state['end']
+            status = (STATUS_ERROR if state['problems'] else STATUS_OK) if done else STATUS_PARTIAL
+            statements = [(f"INSERT OR REPLACE INTO {PROGRESS_TABLE} "
+                           f"(CheckName, LastRowid, EndRowid, Problems, Samples, Seconds, StartedAt) "
+                           f"VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           (name, state['last'], state['end'], state['problems'],
+                            json.dumps(state['samples']), state['seconds'], state['started_at']))]
+            if done:
+                statements.append((
+                    f"INSERT INTO {RESULTS_TABLE} (CheckName, Status, Problems, Details, Seconds, CheckedAt) "
+                    f"VALUES (?, ?, ?, ?, ?, ?)",
+                    (f"fk:{name}", status, state['problems'],
+                     json.dumps({'parent': parent, 'rows_checked': state['end'],
+                                 'started_at': state['started_at'], 'samples': state['samples']}),
+                     round(state['seconds'], 3), _now())))
+            _write(db_path, statements)
+
+            summary[name] = {'status': status, 'problems': state['problems'], 'done': done,
+                             'last': state['last'], 'end': state['end']}
+    finally:
+        conn.close()
+    return summary
+
+
+def print_status(results):
+    icons = {STATUS_OK: "✅", STATUS_ERROR: "❌", STATUS_PARTIAL: "⏳"}
+    if not results:
+        print("ℹ️  Aucune vérification enregistrée")
+    for name, result in results.items():
+        print(f"{icons.get(result['status'], '❔')} {name}: {result['status']} "
+              f"({result['problems']} problème(s), {result['seconds']}s, {result['checked_at']})")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Vérification d'intégrité FNEV4")
+    parser.add_argument("action", choices=["quick", "deep", "fk", "status"])
+    parser.add_argument("--db", help="Base (défaut: chemin résolu)")
+    parser.add_argument("--snapshot", help="deep: instantané existant à vérifier")
+    parser.add_argument("--keep-snapshot", action="store_true", help="deep: conserver l'instantané")
+    parser.add_argument("--budget", type=float, default=DEFAULT_TIME_BUDGET, help="fk: secondes par exécution")
+    parser.add_argument("--slice", type=int, default=DEFAULT_SLICE_ROWS, help="fk: rowid par tranche")
+    parser.add_argument("--restart", action="store_true", help="fk: ignorer la position enregistrée")
+    args = parser.parse_args()
+
+    print("🩺 FNEV4 - VÉRIFICATION D'INTÉGRITÉ")
+    print("=" * 50)
+    if args.action == "quick":
+        status, problems = quick_check(args.db)
+        print("✅ quick_check: ok" if status == STATUS_OK else f"❌ quick_check: {len(problems)} problème(s)")
+        for message in problems:
+            print(f"   - {message}")
+    elif args.action == "deep":
+        status, details = deep_check(args.db, args.snapshot, args.keep_snapshot)
+        print(f"{'✅' if status == STATUS_OK else '❌'} integrity_check sur instantané "
+              f"(copie {details['snapshot_seconds']}s)")
+        for message in details['integrity']:
+            print(f"   - {message}")
+        for key, count in details['foreign_keys'].items():
+            print(f"   - FK {key}: {count} violation(s)")
+    elif args.action == "fk":
+        summary = check_foreign_keys(args.db, args.budget, args.slice, restart=args.restart)
+        for name, result in summary.items():
+            percent = result['last'] / result['end'] * 100 if result['end'] else 100.0
+            icon = "⏳" if not result['done'] else ("✅" if result['status'] == STATUS_OK else "❌")
+            print(f"{icon} {name}: {result['problems']} orpheline(s), {percent:.0f}% parcouru")
+    else:
+        print_status(latest_results(args.db))
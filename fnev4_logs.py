@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Analyse des fichiers de logs (Data/Logs)
+=================================================
+
+LoggingService écrit Data/Logs/FNEV4_yyyyMMdd.log, une ligne par entrée :
+
+    [2025-03-14 09:12:45.123] [ERROR  ] [Api            ] Message
+    Exception: ...            (lignes de suite, ignorées)
+
+Les fichiers sont lus par mmap et découpés par une seule expression
+compilée (findall en C, par tranches alignées sur les fins de ligne) :
+aucune ligne n'est décodée en Python hormis les messages d'erreur.
+
+Résultats : comptes par niveau, par catégorie, histogramme par fenêtre de
+temps et signatures d'erreurs (message normalisé : GUID, nombres, chaînes
+et chemins remplacés). Un index JSON (Data/Logs/.fnev4_log_index.json)
+garde par fichier l'offset déjà lu et ses statistiques : une nouvelle
+analyse ne lit que les octets ajoutés depuis. Un fichier tronqué ou
+remplacé (taille plus petite, début différent) est relu entièrement.
+Les fichiers à relire sont répartis sur plusieurs processus (`workers`) :
+l'expression régulière garde le GIL, les threads n'apporteraient rien.
+"""
+
+import glob
+import hashlib
+import json
+import mmap
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+
+from fnev4_db import resolve_database_path
+
+LINE_PATTERN = re.compile(
+    rb"^\[(\d{4}-\d\d-\d\d \d\d:\d\d):\d\d(?:\.\d+)?\] \[(\w+) *\] \[([^\]]*?) *\] ([^\r\n]*)",
+    re.MULTILINE)
+
+ERROR_LEVELS = ("ERROR", "CRITICAL")
+INDEX_NAME = ".fnev4_log_index.json"
+INDEX_VERSION = 1
+DEFAULT_PATTERN = "*.log"
+DEFAULT_WINDOW = 60           # minutes par barre d'histogramme
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+CHUNK_BYTES = 32 * 1024 * 1024
+HEAD_BYTES = 256
+SIGNATURE_LENGTH = 160
+
+_NORMALIZERS = [
+    (re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"), "<guid>"),
+    (re.compile(r"[A-Za-z]:\\[^\s'\"]*|/(?:[\w.-]+/)+[\w.-]*"), "<path>"),
+    (re.compile(r"'[^']*'|\"[^\"]*\""), "<str>"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b|\d+(?:[.,]\d+)*"), "<n>"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def default_logs_dir(db_path=None):
+    """Data/Logs à côté de la base (PathSettings.LogsFolder)"""
+    db_path = db_path or resolve_database_path()
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "Logs")
+
+
+def normalize_message(message):
+    """Signature d'un message : parties variables remplacées, longueur bornée"""
+    for pattern, replacement in _NORMALIZERS:
+        message = pattern.sub(replacement, message)
+    return message.strip()[:SIGNATURE_LENGTH]
+
+
+def _empty_stats():
+    return {'lines': 0, 'levels': {}, 'categories': {}, 'minutes': {}, 'signatures': {}}
+
+
+def _head_digest(mm):
+    return hashlib.sha1(mm[:HEAD_BYTES]).hexdigest()
+
+
+def _merge_counts(target, counts):
+    for key, count in counts.items():
+        target[key] = target.get(key, 0) + count
+
+
+def _parse_range(mm, start, end, stats):
+    """Analyse [start, end) (end juste après une fin de ligne) et cumule dans `stats`"""
+    pos = start
+    while pos < end:
+        stop = min(pos + CHUNK_BYTES, end)
+        if stop < end:
+            # Tranche alignée sur une fin de ligne pour ne pas couper une entrée
+            newline = mm.rfind(b"\n", pos, stop)
+            stop = newline + 1 if newline >= pos else end
+        matches = LINE_PATTERN.findall(mm, pos, stop)
+        pos = stop
+        if not matches:
+            continue
+
+        stats['lines'] += len(matches)
+        keys = Counter(map(itemgetter(0, 1, 2), matches))
+        levels, categories, minutes = Counter(), Counter(), Counter()
+        for (minute, level, category), count in keys.items():
+            levels[level] += count
+            categories[category] += count
+            minutes[minute + b"|" + level] += count
+        _merge_counts(stats['levels'], {k.decode("utf-8", "replace"): v for k, v in levels.items()})
+        _merge_counts(stats['categories'], {k.decode("utf-8", "replace"): v for k, v in categories.items()})
+        _merge_counts(stats['minutes'], {k.decode("utf-8", "replace"): v for k, v in minutes.items()})
+
+        signatures = stats['signatures']
+        for minute, level, _, message in (m for m in matches if m[1] in (b"ERROR", b"CRITICAL")):
+            text = message.decode("utf-8", "replace")
+            level = level.decode()
+            key = f"{level}|{normalize_message(text)}"
+            entry = signatures.get(key)
+            if entry is None:
+                signatures[key] = [1, text[:500], minute.decode(), minute.decode()]
+            else:
+                entry[0] += 1
+                entry[3] = minute.decode()
+
+
+def _load_index(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') == INDEX_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {'version': INDEX_VERSION, 'files': {}}
+
+
+def _save_index(path, index):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def analyze_file(path, entry=None):
+    """
+    Met à jour l'entrée d'index d'un fichier (offset, statistiques)
+
+    Retourne (entrée, octets lus). Seules les lignes complètes sont lues :
+    une ligne en cours d'écriture le sera à la prochaine analyse.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return {'size': 0, 'offset': 0, 'head': None, 'stats': _empty_stats()}, 0
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        head = _head_digest(mm)
+        if not entry or entry.get('head') != head or entry.get('offset', 0) > size:
+            entry = {'offset': 0, 'stats': _empty_stats()}
+        start = entry['offset']
+        last_newline = mm.rfind(b"\n", start)
+        end = last_newline + 1 if last_newline >= 0 else start
+        if end > start:
+            _parse_range(mm, start, end, entry['stats'])
+
+    entry.update(size=size, mtime_ns=os.stat(path).st_mtime_ns, offset=end, head=head)
+    return entry, end - start
+
+
+def _unchanged(path, entry):
+    if not entry:
+        return False
+    stat = os.stat(path)
+    return stat.st_size == entry.get('size') and stat.st_mtime_ns == entry.get('mtime_ns')
+
+
+def _analyze_file_safe(path, entry):
+    """analyze_file pour le pool de processus : (entrée, octets lus, erreur)"""
+    try:
+        return (*analyze_file(path, entry), None)
+    except OSError as e:
+        return entry, 0, str(e)
+
+
+def _bucket(minute, window):
+    """Début de la fenêtre de `window` minutes contenant 'YYYY-MM-DD HH:MM'"""
+    if window >= 1440:
+        return minute[:10]
+    total = int(minute[11:13]) * 60 + int(minute[14:16])
+    total -= total % window
+    return f"{minute[:10]} {total // 60:02d}:{total % 60:02d}"
+
+
+def analyze_logs(logs_dir=None, pattern=DEFAULT_PATTERN, window=DEFAULT_WINDOW, index_path=None,
+                 use_index=True, top=20, workers=DEFAULT_WORKERS):
+    """
+    Analyse les logs d'un dossier en ne lisant que les octets nouveaux
+
+    Retourne un dict : files, bytes_parsed, seconds, lines, levels,
+    categories, histogram ({fenêtre: {niveau: n}}), signatures (les `top`
+    plus fréquentes : count, level, signature, sample, first, last).
+    """
+    logs_dir = logs_dir or default_logs_dir()
+    index_path = index_path or os.path.join(logs_dir, INDEX_NAME)
+    index = _load_index(index_path) if use_index else {'version': INDEX_VERSION, 'files': {}}
+    started = time.perf_counter()
+
+    files = sorted(glob.glob(os.path.join(logs_dir, pattern)))
+    present = {os.path.basename(path) for path in files}
+    pending = [path for path in files if not _unchanged(path, index['files'].get(os.path.basename(path)))]
+    entries = [index['files'].get(os.path.basename(path)) for path in pending]
+
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            results = list(pool.map(_analyze_file_safe, pending, entries))
+    else:
+        results = [_analyze_file_safe(path, entry) for path, entry in zip(pending, entries)]
+
+    bytes_parsed = 0
+    for path, (entry, parsed, error) in zip(pending, results):
+        name = os.path.basename(path)
+        if error:
+            print(f"⚠️  {name}: {error}")
+            continue
+        index['files'][name] = entry
+        bytes_parsed += parsed
+
+    # Fichiers supprimés (rétention) : retirés de l'index
+    index['files'] = {name: entry for name, entry in index['files'].items() if name in present}
+    if use_index and os.path.isdir(logs_dir):
+        _save_index(index_path, index)
+
+    totals = _empty_stats()
+    for entry in index['files'].values():
+        stats = entry['stats']
+        totals['lines'] += stats['lines']
+        _merge_counts(totals['levels'], stats['levels'])
+        _merge_counts(totals['categories'], stats['categories'])
+        _merge_counts(totals['minutes'], stats['minutes'])
+        for key, (count, sample, first, last) in stats['signatures'].items():
+            current = totals['signatures'].get(key)
+            if current is None:
+                totals['signatures'][key] = [count, sample, first, last]
+            else:
+                current[0] += count
+                current[2] = min(current[2], first)
+                current[3] = max(current[3], last)
+
+    histogram = {}
+    for key, count in totals['minutes'].items():
+        minute, level = key.split("|", 1)
+        bucket = histogram.setdefault(_bucket(minute, window), {})
+        bucket[level] = bucket.get(level, 0) + count
+
+    signatures = sorted(totals['signatures'].items(), key=lambda item: -item[1][0])[:top]
+    return {
+        'files': len(index['files']),
+        'bytes_parsed': bytes_parsed,
+        'seconds': round(time.perf_counter() - started, 3),
+        'lines': totals['lines'],
+        'levels': dict(sorted(totals['levels'].items(), key=lambda item: -item[1])),
+        'categories': dict(sorted(totals['categories'].items(), key=lambda item: -item[1])),
+        'histogram': dict(sorted(histogram.items())),
+        'signatures': [
+            {'count': count, 'level': key.split("|", 1)[0], 'signature': key.split("|", 1)[1],
+             'sample': sample, 'first': first, 'last': last}
+            for key, (count, sample, first, last) in signatures
+        ],
+    }
+
+
+def print_report(report, histogram_rows=24):
+    print(f"📄 {report['files']} fichiers, {report['lines']:,} entrées "
+          f"({report['bytes_parsed'] / 1024 / 1024:.1f} Mo lus en {report['seconds']}s)")
+    print("\n📊 Niveaux:")
+    for level, count in report['levels'].items():
+        print(f"   - {level}: {count:,}")
+    print("\n🏷️  Catégories:")
+    for category, count in list(report['categories'].items())[:15]:
+        print(f"   - {category or '(vide)'}: {count:,}")
+    if report['histogram']:
+        print("\n🕒 Histogramme (erreurs / total):")
+        peak = max(sum(levels.values()) for levels in report['histogram'].values())
+        for bucket, levels in list(report['histogram'].items())[-histogram_rows:]:
+            total = sum(levels.values())
+            errors = sum(levels.get(level, 0) for level in ERROR_LEVELS)
+            bar = "█" * max(1, round(total / peak * 30)) if total else ""
+            print(f"   {bucket} {bar} {errors}/{total}")
+    if report['signatures']:
+        print("\n❌ Signatures d'erreurs:")
+        for signature in report['signatures']:
+            print(f"   {signature['count']:>6} [{signature['level']}] {signature['signature']}")
+            print(f"          du {signature['first']} au {signature['last']}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Analyse des logs FNEV4 (Data/Logs)")
+    parser.add_argument("logs_dir", nargs="?", help="Dossier des logs (défaut: Data/Logs à côté de la base)")
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN)
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="Minutes par fenêtre d'histogramme")
+    parser.add_argument("--top", type=int, default=20, help="Nombre de signatures d'erreurs")
+    parser.add_argument("--full", action="store_true", help="Ignorer l'index et tout relire")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    print("🔎 FNEV4 - ANALYSE DES LOGS")
+    print("=" * 50)
+    print_report(analyze_logs(args.logs_dir, args.pattern, args.window, use_index=not args.full,
+                              top=args.top, workers=args.workers))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Pagination par curseur (keyset) de la liste des clients
+================================================================
+
+`ORDER BY ClientCode LIMIT ? OFFSET ?` oblige SQLite à lire puis jeter
+toutes les lignes des pages précédentes : la page 2000 coûte 2000 fois la
+page 1. Ici chaque page reprend juste après la dernière clé lue
+(ClientCode, Id) : une recherche dans IX_Clients_ClientCode puis 50 lignes,
+quelle que soit la profondeur.
+
+Les curseurs "suivant" et "précédent" sont opaques (base64 de la clé) et
+les filtres IsActive, ClientType et recherche sont ceux de fnev4_search.
+Sans curseur, un numéro de page retombe sur l'ancienne pagination OFFSET.
+
+Usage:
+    page = page_clients(conn, is_active_filter=True)
+    page = page_clients(conn, is_active_filter=True, after=page["nextCursor"])
+"""
+
+import base64
+import json
+import statistics
+import time
+
+from fnev4_db import connect, resolve_database_path
+from fnev4_search import CLIENT_LIST_COLUMNS, build_client_list_query, search_clients
+
+DEFAULT_PAGE_SIZE = 50
+
+# Position de c.Id dans les lignes retournées (ajouté après CLIENT_LIST_COLUMNS)
+ID_COLUMN = 10
+CODE_COLUMN = 0
+
+
+def encode_cursor(client_code, client_id):
+    payload = json.dumps([client_code, client_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Clé (ClientCode, Id) d'un curseur ; ValueError si le curseur est invalide"""
+    try:
+        client_code, client_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Curseur de pagination invalide: {cursor}") from e
+    return client_code, client_id
+
+
+def page_clients(conn, search_term=None, is_active_filter=None, client_type=None,
+                 page_size=DEFAULT_PAGE_SIZE, after=None, before=None, page_number=None):
+    """
+    Une page de clients triés par ClientCode
+
+    after       : curseur "nextCursor" d'une page précédente
+    before      : curseur "previousCursor" pour revenir en arrière
+    page_number : repli OFFSET (accès direct à une page) si aucun curseur
+
+    Retourne clients, nextCursor, previousCursor, hasNextPage, hasPreviousPage.
+    """
+    if after and before:
+        raise ValueError("after et before sont exclusifs")
+
+    if page_number is not None and not (after or before):
+        result = search_clients(conn, search_term, is_active_filter, client_type,
+                                page_number, page_size)
+        # Curseurs calculés sur la page OFFSET pour continuer en keyset
+        result.update(_cursors(conn, search_term, is_active_filter, client_type,
+                               page_size, (page_number - 1) * page_size))
+        return result
+
+    list_sql, _, params = build_client_list_query(conn, search_term, is_active_filter, client_type)
+    list_sql = list_sql.replace(CLIENT_LIST_COLUMNS, f"{CLIENT_LIST_COLUMNS}, c.Id", 1)
+
+    # Sans recherche, on impose le parcours de l'index ClientCode : sinon le
+    # planificateur préfère IX_Clients_IsActive suivi d'un tri de toute la table
+    if not search_term:
+        list_sql = list_sql.replace("FROM Clients c", "FROM Clients c INDEXED BY IX_Clients_ClientCode", 1)
+
+    backwards = before is not None
+    cursor = before if backwards else after
+    if cursor:
+        client_code, client_id = decode_cursor(cursor)
+        list_sql += " AND (c.ClientCode, c.Id) < (?, ?)" if backwards else " AND (c.ClientCode, c.Id) > (?, ?)"
+        params = params + [client_code, client_id]
+
+    direction = "DESC" if backwards else "ASC"
+    rows = conn.execute(f"{list_sql} ORDER BY c.ClientCode {direction}, c.Id {direction} LIMIT ?",
+                        params + [page_size + 1]).fetchall()
+
+    # Une ligne de plus que demandé indique qu'il reste une page dans ce sens
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    clients = [row[:ID_COLUMN] for row in rows]
+    first, last = (rows[0], rows[-1]) if rows else (None, None)
+    return {
+        "clients": clients,
+        "nextCursor": encode_cursor(last[CODE_COLUMN], last[ID_COLUMN]) if last else None,
+        "previousCursor": encode_cursor(first[CODE_COLUMN], first[ID_COLUMN]) if first else None,
+        "hasNextPage": True if backwards else has_more,
+        "hasPreviousPage": has_more if backwards else cursor is not None,
+    }
+
+
+def _cursors(conn, search_term, is_active_filter, client_type, page_size, offset):
+    """Curseurs de la page située à `offset` (repli OFFSET)"""
+    list_sql, _, params = build_client_list_query(conn, search_term, is_active_filter, client_type)
+    list_sql = list_sql.replace(CLIENT_LIST_COLUMNS, " c.ClientCode, c.Id ", 1)
+    rows = conn.execute(f"{list_sql} ORDER BY c.ClientCode, c.Id LIMIT ? OFFSET ?",
+                        params + [page_size, offset]).fetchall()
+    if not rows:
+        return {"nextCursor": None, "previousCursor": None}
+    return {"nextCursor": encode_cursor(*rows[-1]), "previousCursor": encode_cursor(*rows[0])}
+
+
+def _cursor_at(conn, is_active_filter, client_type, search_term, page_size, depth):
+    """Curseur menant à la page `depth` (hors chronométrage du benchmark)"""
+    if depth <= 1:
+        return None
+    return _cursors(conn, search_term, is_active_filter, client_type,
+                    page_size, (depth - 2) * page_size)["nextCursor"]
+
+
+def benchmark_page_depth(db_path=None, depths=(1, 10, 100, 500, 1000, 2000), page_size=DEFAULT_PAGE_SIZE,
+                         repeat=5, is_active_filter=True, client_type=None, search_term=None):
+    """
+    Compare OFFSET et keyset pour chaque profondeur de page
+
+    Retourne [(page, offset_ms, keyset_ms, lignes)] en médiane sur `repeat` mesures.
+    """
+    conn = connect(db_path or resolve_database_path(), readonly=True)
+    results = []
+    try:
+        list_sql, count_sql, params = build_client_list_query(conn, search_term, is_active_filter, client_type)
+        total = conn.execute(count_sql, params).fetchone()[0]
+        for depth in depths:
+            if (depth - 1) * page_size >= total:
+                break
+
+            # Requête de page seule des deux côtés : le COUNT n'est pas mesuré
+            offset_times = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                offset_rows = conn.execute(f"{list_sql} ORDER BY c.ClientCode LIMIT ? OFFSET ?",
+                                           params + [page_size, (depth - 1) * page_size]).fetchall()
+                offset_times.append((time.perf_counter() - started) * 1000)
+
+            cursor = _cursor_at(conn, is_active_filter, client_type, search_term, page_size, depth)
+            keyset_times = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                keyset_page = page_clients(conn, search_term, is_active_filter, client_type,
+                                           page_size, after=cursor)
+                keyset_times.append((time.perf_counter() - started) * 1000)
+
+            if [row[CODE_COLUMN] for row in keyset_page["clients"]] != \
+                    [row[CODE_COLUMN] for row in offset_rows]:
+                raise AssertionError(f"Page {depth}: résultats keyset différents de OFFSET")
+
+            results.append((depth, statistics.median(offset_times), statistics.median(keyset_times),
+                            len(keyset_page["clients"])))
+    finally:
+        conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark pagination OFFSET vs keyset (clients)")
+    parser.add_argument("--db", help="Base (défaut: chemin résolu)")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--depths", default="1,10,100,500,1000,2000", help="Pages mesurées")
+    parser.add_argument("--search", help="Terme de recherche")
+    parser.add_argument("--type", dest="client_type", help="Filtre ClientType")
+    args = parser.parse_args()
+
+    print("📄 FNEV4 - PAGINATION OFFSET vs KEYSET")
+    print("=" * 50)
+    depths = [int(d) for d in args.depths.split(",")]
+    rows = benchmark_page_depth(args.db, depths, args.page_size, search_term=args.search,
+                                client_type=args.client_type)
+    print(f"{'Page':>8} {'OFFSET (ms)':>14} {'Keyset (ms)':>14} {'Lignes':>8}")
+    for depth, offset_ms, keyset_ms, count in rows:
+        print(f"{depth:>8} {offset_ms:>14.2f} {keyset_ms:>14.2f} {count:>8}")
+    if not rows:
+        print("⚠️ Aucune page mesurable (table vide ?)")
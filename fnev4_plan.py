@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Analyse des plans d'exécution et conseil d'index
+=========================================================
+
+simulate_use_case et test_performance_datagrid listent les index existants
+mais rien ne dit si le planificateur s'en sert. Ce module passe le
+catalogue des requêtes chaudes de l'application à EXPLAIN QUERY PLAN :
+
+- signale les étapes SCAN (parcours complet) et USE TEMP B-TREE (tri ou
+  regroupement en mémoire temporaire)
+- propose un index composite, couvrant ou partiel construit à partir de
+  la forme de la requête (égalités, plage, tri, colonnes lues)
+- mesure l'accélération avant / après sur une copie jetable de la base
+  (API de sauvegarde) : la base de l'application n'est jamais modifiée
+"""
+
+import os
+import statistics
+import tempfile
+import time
+
+from fnev4_backup import online_backup
+from fnev4_db import connect, resolve_database_path
+
+# Requêtes chaudes : SQL exécuté, paramètres d'exemple tirés de la base et
+# forme de la requête pour le conseil d'index.
+#   equality : colonnes comparées par égalité (en tête d'index)
+#   range    : colonne filtrée par plage
+#   order    : colonnes du ORDER BY
+#   columns  : colonnes lues (index couvrant si peu nombreuses)
+#   partial  : prédicat constant utilisable en index partiel
+HOT_QUERIES = [
+    {
+        'name': "clients_liste",
+        'description': "ListeClientsUseCase : clients actifs triés par code",
+        'table': "Clients",
+        'sql': """SELECT ClientCode, Name, CompanyName, ClientType, IsActive, Email, Phone, Address,
+                         ClientNcc, CreatedDate
+                  FROM Clients WHERE (IsDeleted = 0 OR IsDeleted IS NULL) AND IsActive = 1
+                  ORDER BY ClientCode LIMIT 50 OFFSET 0""",
+        'equality': ["IsActive"], 'order': ["ClientCode"],
+    },
+    {
+        'name': "clients_liste_type",
+        'description': "ListeClientsUseCase filtré par ClientType",
+        'table': "Clients",
+        'sql': """SELECT ClientCode, Name, ClientType FROM Clients
+                  WHERE (IsDeleted = 0 OR IsDeleted IS NULL) AND IsActive = 1 AND ClientType = ?
+                  ORDER BY ClientCode LIMIT 50""",
+        'params': ["SELECT ClientType FROM Clients GROUP BY ClientType ORDER BY COUNT(*) LIMIT 1"],
+        'equality': ["IsActive", "ClientType"], 'order': ["ClientCode"],
+    },
+    {
+        'name': "clients_recherche",
+        'description': "Recherche LIKE '%terme%' sur 4 colonnes",
+        'table': "Clients",
+        'sql': """SELECT ClientCode, Name FROM Clients
+                  WHERE (IsDeleted = 0 OR IsDeleted IS NULL) AND IsActive = 1
+                    AND (ClientCode LIKE ? OR Name LIKE ? OR CompanyName LIKE ? OR Email LIKE ?)
+                  ORDER BY ClientCode LIMIT 50""",
+        'params': ["SELECT '%test%'"] * 4,
+        'advice': "LIKE '%terme%' ne peut utiliser aucun index B-tree : index FTS5 (fnev4_search.py create)",
+    },
+    {
+        'name': "facture_par_reference",
+        'description': "Vérification d'une facture par référence FNE",
+        'table': "FneInvoices",
+        'sql': "SELECT * FROM FneInvoices WHERE FneReference = ?",
+        'params': ["SELECT FneReference FROM FneInvoices WHERE FneReference IS NOT NULL LIMIT 1"],
+        'equality': ["FneReference"],
+    },
+    {
+        'name': "factures_periode",
+        'description': "Dernières factures d'une période",
+        'table': "FneInvoices",
+        'sql': """SELECT InvoiceNumber, InvoiceDate, ClientCode, TotalAmountTTC, Status FROM FneInvoices
+                  WHERE InvoiceDate >= date(?, '-30 days') AND IsDeleted = 0
+                  ORDER BY InvoiceDate DESC LIMIT 50""",
+        'params': ["SELECT MAX(InvoiceDate) FROM FneInvoices"],
+        'range': "InvoiceDate", 'order': ["InvoiceDate"],
+    },
+    {
+        'name': "lignes_facture",
+        'description': "Lignes d'une facture dans l'ordre",
+        'table': "FneInvoiceItems",
+        'sql': "SELECT * FROM FneInvoiceItems WHERE FneInvoiceId = ? ORDER BY LineOrder",
+        'params': ["SELECT FneInvoiceId FROM FneInvoiceItems LIMIT 1"],
+        'equality': ["FneInvoiceId"], 'order': ["LineOrder"],
+    },
+    {
+        'name': "logs_recents",
+        'description': "Journal API : derniers appels",
+        'table': "FneApiLogs",
+        'sql': """SELECT Timestamp, OperationType, ResponseStatusCode, IsSuccess FROM FneApiLogs
+                  WHERE Timestamp >= datetime(?, '-7 days') ORDER BY Timestamp DESC LIMIT 100""",
+        'params': ["SELECT MAX(Timestamp) FROM FneApiLogs"],
+        'range': "Timestamp", 'order': ["Timestamp"],
+    },
+    {
+        'name': "logs_erreurs",
+        'description': "Journal API : erreurs récentes",
+        'table': "FneApiLogs",
+        'sql': """SELECT Timestamp, OperationType, ErrorMessage FROM FneApiLogs
+                  WHERE LogLevel = 'Error' AND Timestamp >= datetime(?, '-30 days')
+                  ORDER BY Timestamp DESC LIMIT 100""",
+        'params': ["SELECT MAX(Timestamp) FROM FneApiLogs"],
+        'range': "Timestamp", 'order': ["Timestamp"],
+        'partial': "LogLevel = 'Error'",
+    },
+    {
+        'name': "imports_par_statut",
+        'description': "Sessions d'import par statut, plus récentes d'abord",
+        'table': "ImportSessions",
+        'sql': """SELECT FileName, StartedAt, InvoicesImported, ErrorsCount FROM ImportSessions
+                  WHERE Status = ? ORDER BY StartedAt DESC LIMIT 50""",
+        'params': ["SELECT Status FROM ImportSessions LIMIT 1"],
+        'equality': ["Status"], 'order': ["StartedAt"],
+    },
+]
+
+# Au-delà, un index couvrant coûte plus qu'il ne rapporte
+MAX_COVERING_COLUMNS = 4
+TIMING_RUNS = 15
+
+
+def _table_exists(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone() is not None
+
+
+def _resolve_params(conn, query):
+    """Paramètres d'exemple : chaque entrée est une requête scalaire sur la base"""
+    params = []
+    for sample_sql in query.get('params', []):
+        row = conn.execute(sample_sql).fetchone()
+        params.append(row[0] if row else None)
+    return params
+
+
+def explain(conn, sql, params=()):
+    """Étapes du plan [(id, parent, détail)]"""
+    return [(row[0], row[1], row[3]) for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def plan_issues(plan):
+    """Étapes problématiques : parcours complet ou B-tree temporaire"""
+    issues = []
+    for _, _, detail in plan:
+        if detail.startswith("SCAN ") and "COVERING INDEX" not in detail:
+            issues.append(("SCAN", detail))
+        elif detail.startswith("USE TEMP B-TREE"):
+            issues.append(("TEMP B-TREE", detail))
+    return issues
+
+
+def _existing_indexes(conn, table):
+    """Colonnes de tête de chaque index existant : {nom: [colonnes]}"""
+    indexes = {}
+    for row in conn.execute(f"PRAGMA index_list([{table}])"):
+        name = row[1]
+        indexes[name] = [col[2] for col in conn.execute(f"PRAGMA index_info([{name}])")]
+    return indexes
+
+
+def _selected_columns(conn, query):
+    sql = query['sql']
+    select = sql[sql.upper().index("SELECT") + 6:sql.upper().index("FROM")]
+    if select.strip() == "*":
+        return None
+    return [column.strip() for column in select.split(",")]
+
+
+def suggest_index(conn, query):
+    """
+    Index proposé pour une requête : (nom, DDL) ou None
+
+    Égalités d'abord, puis la colonne de plage ou de tri ; colonnes lues
+    ajoutées en fin si l'index peut devenir couvrant ; clause WHERE si la
+    requête contient un prédicat constant.
+    """
+    key = list(query.get('equality', []))
+    tail = query.get('range') or (query.get('order') or [None])[0]
+    if tail and tail not in key:
+        key.append(tail)
+    for column in query.get('order', [])[1:]:
+        if column not in key:
+            key.append(column)
+    if not key:
+        return None
+
+    selected = _selected_columns(conn, query)
+    if selected:
+        extra = [column for column in selected if column not in key]
+        if len(key) + len(extra) <= MAX_COVERING_COLUMNS:
+            key.extend(extra)
+
+    # Un index existant qui commence par les mêmes colonnes suffit déjà
+    for columns in _existing_indexes(conn, query['table']).values():
+        if columns[:len(key)] == key:
+            return None
+
+    name = f"IX_{query['table']}_{'_'.join(key)}"
+    ddl = f"CREATE INDEX IF NOT EXISTS {name} ON {query['table']} ({', '.join(key)})"
+    if query.get('partial'):
+        name += "_Partial"
+        ddl = (f"CREATE INDEX IF NOT EXISTS {name} ON {query['table']} ({', '.join(key)}) "
+               f"WHERE {query['partial']}")
+    return name, ddl
+
+
+def _time_query(conn, sql, params, runs=TIMING_RUNS):
+    """Médiane en ms (une exécution de chauffe)"""
+    conn.execute(sql, params).fetchall()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter_ns()
+        conn.execute(sql, params).fetchall()
+        samples.append(time.perf_counter_ns() - started)
+    return statistics.median(samples) / 1e6
+
+
+def analyze_queries(db_path=None, queries=HOT_QUERIES):
+    """Plan, problèmes et index proposé pour chaque requête du catalogue"""
+    conn = connect(db_path, readonly=True)
+    reports = []
+    try:
+        for query in queries:
+            if not _table_exists(conn, query['table']):
+                continue
+            params = _resolve_params(conn, query)
+            plan = explain(conn, query['sql'], params)
+            issues = plan_issues(plan)
+            reports.append({
+                'name': query['name'],
+                'description': query['description'],
+                'params': params,
+                'plan': plan,
+                'issues': issues,
+                'advice': query.get('advice'),
+                'suggestion': suggest_index(conn, query) if issues and not query.get('advice') else None,
+            })
+    finally:
+        conn.close()
+    return reports
+
+
+def measure_suggestions(db_path=None, reports=None, queries=HOT_QUERIES, scratch_dir=None):
+    """
+    Crée les index proposés sur une copie jetable et mesure avant / après
+
+    Complète chaque rapport avec before_ms, after_ms, speedup et new_plan.
+    """
+    db_path = str(db_path or resolve_database_path())
+    reports = reports if reports is not None else analyze_queries(db_path, queries)
+    by_name = {query['name']: query for query in queries}
+
+    handle, scratch_path = tempfile.mkstemp(suffix=".db", prefix="fnev4_plan_", dir=scratch_dir)
+    os.close(handle)
+    try:
+        online_backup(db_path, scratch_path, step_pause=0)
+        conn = connect(scratch_path, readonly=False)
+        try:
+            for report in reports:
+                report['before_ms'] = _time_query(conn, by_name[report['name']]['sql'], report['params'])
+
+            suggestions = {report['suggestion'][1] for report in reports if report['suggestion']}
+            for ddl in sorted(suggestions):
+                conn.execute(ddl)
+            if suggestions:
+                conn.execute("ANALYZE")
+            conn.commit()
+
+            for report in reports:
+                sql = by_name[report['name']]['sql']
+                report['after_ms'] = _time_query(conn, sql, report['params'])
+                report['new_plan'] = explain(conn, sql, report['params'])
+                report['speedup'] = (report['before_ms'] / report['after_ms']) if report['after_ms'] else None
+        finally:
+            conn.close()
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(scratch_path + suffix):
+                os.remove(scratch_path + suffix)
+    return reports
+
+
+def print_report(report):
+    flag = "⚠️ " if report['issues'] else "✅"
+    print(f"\n{flag} {report['name']} - {report['description']}")
+    for _, _, detail in report['plan']:
+        marker = "   ❗" if any(detail == issue[1] for issue in report['issues']) else "     "
+        print(f"{marker} {detail}")
+    if report['advice']:
+        print(f"   💡 {report['advice']}")
+    if report['suggestion']:
+        print(f"   💡 {report['suggestion'][1]}")
+    if 'before_ms' in report:
+        print(f"   ⏱️ {report['before_ms']:.3f} ms → {report['after_ms']:.3f} ms (x{report['speedup']:.1f})")
+        if report['suggestion']:
+            for _, _, detail in report['new_plan']:
+                print(f"      → {detail}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Analyse EXPLAIN QUERY PLAN des requêtes chaudes FNEV4")
+    parser.add_argument("--db", help="Base analysée (défaut: chemin résolu)")
+    parser.add_argument("--measure", action="store_true",
+                        help="Mesurer avant / après sur une copie jetable avec les index proposés")
+    args = parser.parse_args()
+
+    print("🧭 FNEV4 - ANALYSE DES PLANS D'EXÉCUTION")
+    print("=" * 60)
+    db_path = args.db or resolve_database_path()
+    print(f"📁 Base: {db_path}")
+
+    reports = analyze_queries(db_path)
+    if args.measure:
+        reports = measure_suggestions(db_path, reports)
+    for report in reports:
+        print_report(report)
+
+    flagged = sum(1 for report in reports if report['issues'])
+    print(f"\n📊 {flagged}/{len(reports)} requêtes avec SCAN ou TEMP B-TREE")
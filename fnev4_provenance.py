@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Provenance indexée des clients importés
+================================================
+
+Les scripts de nettoyage classaient les clients avec
+`Notes LIKE '%Import exceptionnel%'` : parcours complet de la table et
+recherche de sous-chaîne sur un texte libre.
+
+Cette migration ajoute une colonne indexée à la table Clients :
+ImportSource = 'exceptional' (marqueur "Import exceptionnel" que l'import
+exceptionnel écrit dans Notes) ou 'standard'. Les Notes ne portent aucun
+identifiant de session : rien d'autre n'en est dérivé.
+Le remplissage initial se fait par lots de rowid ; des triggers classent
+ensuite les clients insérés ou modifiés par l'application, qui ne connaît
+pas ces colonnes.
+
+Les requêtes de comptage, de répartition et de purge passent par
+provenance_filter() : colonne indexée si la migration est complète,
+LIKE sinon.
+"""
+
+import time
+
+from fnev4_db import connect, resolve_database_path
+
+SOURCE_EXCEPTIONAL = "exceptional"
+SOURCE_STANDARD = "standard"
+
+EXCEPTIONAL_NOTES_FILTER = "Notes LIKE '%Import exceptionnel%'"
+EXCEPTIONAL_INDEXED_FILTER = f"ImportSource = '{SOURCE_EXCEPTIONAL}'"
+
+DEFAULT_BATCH_SIZE = 20000
+
+# Classification d'une ligne à partir de ses Notes (backfill et triggers)
+_SOURCE_EXPR = (f"CASE WHEN {{notes}} LIKE '%Import exceptionnel%' "
+                f"THEN '{SOURCE_EXCEPTIONAL}' ELSE '{SOURCE_STANDARD}' END")
+
+# Première version de la migration : colonne ImportSessionId jamais alimentée
+# (aucun import n'écrit de session dans Notes), retirée avec son index
+LEGACY_STATEMENTS = [
+    "DROP TRIGGER IF EXISTS TR_Clients_Provenance_Insert",
+    "DROP TRIGGER IF EXISTS TR_Clients_Provenance_Update",
+    "DROP INDEX IF EXISTS IX_Clients_ImportSessionId",
+]
+
+SCHEMA_STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS IX_Clients_ImportSource ON Clients (ImportSource)",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS TR_Clients_Provenance_Insert
+    AFTER INSERT ON Clients
+    WHEN NEW.ImportSource IS NULL
+    BEGIN
+        UPDATE Clients
+        SET ImportSource = {_SOURCE_EXPR.format(notes='NEW.Notes')}
+        WHERE rowid = NEW.rowid;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS TR_Clients_Provenance_Update
+    AFTER UPDATE OF Notes ON Clients
+    BEGIN
+        UPDATE Clients
+        SET ImportSource = {_SOURCE_EXPR.format(notes='NEW.Notes')}
+        WHERE rowid = NEW.rowid;
+    END
+    """,
+]
+
+
+def has_provenance_columns(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(Clients)")}
+    return "ImportSource" in columns
+
+
+def is_backfill_complete(conn):
+    """Vrai si toutes les lignes sont classées (recherche indexée sur NULL)"""
+    if not has_provenance_columns(conn):
+        return False
+    return conn.execute(
+        "SELECT NOT EXISTS (SELECT 1 FROM Clients WHERE ImportSource IS NULL)").fetchone()[0] == 1
+
+
+def provenance_filter(conn):
+    """Filtre SQL des clients d'import exceptionnel : indexé si possible"""
+    return EXCEPTIONAL_INDEXED_FILTER if is_backfill_complete(conn) else EXCEPTIONAL_NOTES_FILTER
+
+
+def client_breakdown(conn):
+    """Répartition [(libellé, nombre)] Import Exceptionnel / Clients Normaux"""
+    if is_backfill_complete(conn):
+        rows = conn.execute("""
+            SELECT CASE WHEN ImportSource = ? THEN 'Import Exceptionnel' ELSE 'Clients Normaux' END AS type,
+                   COUNT(*)
+            FROM Clients
+            GROUP BY type
+        """, (SOURCE_EXCEPTIONAL,)).fetchall()
+    else:
+        rows = conn.execute(f"""
+            SELECT CASE WHEN {EXCEPTIONAL_NOTES_FILTER} THEN 'Import Exceptionnel' ELSE 'Clients Normaux' END AS type,
+                   COUNT(*)
+            FROM Clients
+            GROUP BY type
+        """).fetchall()
+    return rows
+
+
+def ensure_provenance_schema(conn):
+    """Ajoute colonne, index et triggers (idempotent, retire l'ancien ImportSessionId)"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(Clients)")}
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if "ImportSource" not in columns:
+            conn.execute("ALTER TABLE Clients ADD COLUMN ImportSource TEXT")
+        # Triggers recréés à chaque fois : ceux de la première version citent ImportSessionId
+        for statement in LEGACY_STATEMENTS:
+            conn.execute(statement)
+        if "ImportSessionId" in columns:
+            conn.execute("ALTER TABLE Clients DROP COLUMN ImportSessionId")
+        for statement in SCHEMA_STATEMENTS:
+            conn.execute(statement)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def backfill_provenance(db_path=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Migration complète : schéma puis classement des lignes existantes par lots
+
+    Reprenable : seules les lignes dont ImportSource est NULL sont traitées.
+    """
+    db_path = str(db_path or resolve_database_path())
+    conn = connect(db_path, readonly=False)
+    conn.isolation_level = None
+    started = time.perf_counter()
+    updated = 0
+    try:
+        ensure_provenance_schema(conn)
+
+        low, high = conn.execute("SELECT MIN(rowid), MAX(rowid) FROM Clients").fetchone()
+        if low is not None:
+            sql = f"""
+                UPDATE Clients
+                SET ImportSource = {_SOURCE_EXPR.format(notes='Notes')}
+                WHERE rowid BETWEEN ? AND ? AND ImportSource IS NULL
+            """
+            start = low
+            while start <= high:
+                end = start + batch_size - 1
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    updated += conn.execute(sql, (start, end)).rowcount
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                if progress:
+                    progress(min(end, high) - low + 1, high - low + 1)
+                start = end + 1
+
+        conn.execute("ANALYZE Clients")
+    finally:
+        conn.close()
+
+    return {'updated': updated, 'seconds': round(time.perf_counter() - started, 3)}
+
+
+if __name__ == "__main__":
+    print("🏷️  FNEV4 - MIGRATION PROVENANCE DES CLIENTS")
+    print("=" * 50)
+    db_path = resolve_database_path()
+    print(f"📁 Base: {db_path}")
+
+    result = backfill_provenance(
+        db_path,
+        progress=lambda done, total: print(f"\r   ⏳ rowid {done:,}/{total:,}", end="", flush=True))
+    print()
+    print(f"✅ {result['updated']:,} clients classés en {result['seconds']}s")
+
+    conn = connect(db_path, readonly=True)
+    try:
+        for label, count in client_breakdown(conn):
+            print(f"   {label}: {count} clients")
+    finally:
+        conn.close()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Suppression massive par lots
+=====================================
+
+Un DELETE unique sur 500 000 clients garde le verrou d'écriture pendant
+toute l'opération et fait gonfler le WAL : l'application WPF reste figée.
+Ici les lignes sont supprimées par lots ordonnés de rowid, chaque lot dans
+sa propre transaction courte, avec une pause entre deux lots pour laisser
+passer l'application.
+
+- Progression et débit (lignes/s) remontés à chaque lot
+- Reprise (resume=True, --resume) : le dernier rowid traité est enregistré
+  dans un point de reprise JSON propre à (table, filtre, paramètres) ; une
+  purge interrompue repart de là où elle s'était arrêtée. Un point de
+  reprise d'une autre base (fichier remplacé, restauration) ou de plus de
+  CHECKPOINT_MAX_AGE est ignoré, et la borne haute est relue : les lignes
+  insérées depuis l'interruption sont purgées elles aussi
+- En fin de purge : checkpoint WAL (TRUNCATE) et incremental_vacuum optionnel
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from fnev4_db import connect, resolve_database_path
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_BATCH_PAUSE = 0.02
+# Au-delà, une purge interrompue est recommencée plutôt que reprise
+CHECKPOINT_MAX_AGE = 24 * 3600
+
+
+def _checkpoint_path(db_path, table, where, params=()):
+    key = hashlib.sha1(f"{table}|{where}|{json.dumps(list(params), default=str)}"
+                       .encode('utf-8')).hexdigest()[:12]
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), f".purge_{table}_{key}.json")
+
+
+def _database_identity(db_path):
+    """Chemin résolu et numéro de fichier : une base remplacée change d'identité"""
+    return {'path': os.path.normcase(os.path.realpath(db_path)), 'inode': os.stat(db_path).st_ino}
+
+
+def _load_checkpoint(path, identity):
+    """Point de reprise valide pour cette base, ou None (absent, illisible, étranger ou périmé)"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('database') != identity:
+        return None
+    if time.time() - state.get('created_at', 0) > CHECKPOINT_MAX_AGE:
+        return None
+    return state
+
+
+def _save_checkpoint(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def print_progress(deleted, total, rows_per_second):
+    """Callback de progression par défaut (une ligne réécrite en place)"""
+    percent = (deleted / total * 100) if total else 100.0
+    print(f"\r   🗑️  {deleted:,}/{total:,} ({percent:.1f}%) - {rows_per_second:,.0f} lignes/s",
+          end="", flush=True)
+
+
+def purge_rows(table, where="1=1", params=(), db_path=None, batch_size=DEFAULT_BATCH_SIZE,
+               batch_pause=DEFAULT_BATCH_PAUSE, resume=False, incremental_vacuum=False,
+               progress=None):
+    """
+    Supprime les lignes de `table` vérifiant `where`, par lots de rowid
+
+    resume=True repart du point de reprise d'une purge interrompue identique
+    (même table, filtre et paramètres, même base). Retourne un dict :
+    deleted, batches, seconds, rows_per_second, resumed_from.
+    """
+    db_path = str(db_path or resolve_database_path())
+    checkpoint = _checkpoint_path(db_path, table, where, params)
+    identity = _database_identity(db_path)
+
+    conn = connect(db_path, readonly=False)
+    conn.isolation_level = None
+    try:
+        state = _load_checkpoint(checkpoint, identity) if resume else None
+        # Borne haute relue à chaque exécution, reprise comprise
+        high = conn.execute(f"SELECT MAX(rowid) FROM [{table}]").fetchone()[0] or 0
+        if state is None:
+            total = conn.execute(f"SELECT COUNT(*) FROM [{table}] WHERE {where}", params).fetchone()[0]
+            state = {'database': identity, 'created_at': time.time(),
+                     'last_rowid': -1, 'max_rowid': high, 'deleted': 0, 'total': total}
+        else:
+            remaining = conn.execute(f"SELECT COUNT(*) FROM [{table}] WHERE rowid > ? AND ({where})",
+                                     (state['last_rowid'], *params)).fetchone()[0]
+            state.update(max_rowid=high, total=state['deleted'] + remaining)
+        resumed_from = state['last_rowid'] if state['deleted'] else None
+
+        # Borne haute du lot : on vise `batch_size` lignes correspondantes exactement
+        upper_sql = f"""
+            SELECT MAX(rowid) FROM (
+                SELECT rowid FROM [{table}]
+                WHERE rowid > ? AND rowid <= ? AND ({where})
+                ORDER BY rowid LIMIT ?
+            )
+        """
+        delete_sql = f"DELETE FROM [{table}] WHERE rowid > ? AND rowid <= ? AND ({where})"
+
+        started = time.perf_counter()
+        batches = 0
+        deleted_now = 0
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                upper = conn.execute(upper_sql, (state['last_rowid'], state['max_rowid'],
+                                                 *params, batch_size)).fetchone()[0]
+                if upper is None:
+                    conn.execute("COMMIT")
+                    break
+                changed = conn.execute(delete_sql, (state['last_rowid'], upper, *params)).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            batches += 1
+            deleted_now += changed
+            state['deleted'] += changed
+            state['last_rowid'] = upper
+            _save_checkpoint(checkpoint, state)
+
+            if progress:
+                elapsed = time.perf_counter() - started
+                progress(state['deleted'], state['total'], deleted_now / elapsed if elapsed else 0.0)
+            if batch_pause:
+                time.sleep(batch_pause)
+
+        seconds = time.perf_counter() - started
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        # Rendre le WAL à sa taille normale et, si possible, l'espace libéré
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        vacuumed = False
+        if incremental_vacuum:
+            auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if auto_vacuum == 2:
+                conn.execute("PRAGMA incremental_vacuum").fetchall()
+                vacuumed = True
+    finally:
+        conn.close()
+
+    return {
+        'deleted': state['deleted'],
+        'batches': batches,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(deleted_now / seconds) if seconds else 0,
+        'resumed_from': resumed_from,
+        'incremental_vacuum': vacuumed,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Suppression par lots dans une table FNEV4")
+    parser.add_argument("table")
+    parser.add_argument("--where", default="1=1", help="Filtre SQL (défaut: toutes les lignes)")
+    parser.add_argument("--db", help="Base (défaut: chemin résolu)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=DEFAULT_BATCH_PAUSE)
+    parser.add_argument("--resume", action="store_true", help="Reprendre une purge interrompue")
+    parser.add_argument("--vacuum", action="store_true", help="incremental_vacuum en fin de purge")
+    args = parser.parse_args()
+
+    result = purge_rows(args.table, args.where, db_path=args.db, batch_size=args.batch_size,
+                        batch_pause=args.pause, resume=args.resume,
+                        incremental_vacuum=args.vacuum, progress=print_progress)
+    print()
+    print(f"✅ {result['deleted']:,} lignes supprimées en {result['batches']} lots "
+          f"({result['seconds']}s, {result['rows_per_second']:,} lignes/s)")
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Rapports TVA et ventes vectorisés
+==========================================
+
+TVA collectée par code (TVA, TVAB, TVAC, TVAD), mois, point de vente et
+template (B2B/B2C/B2G/B2F), avec les autres taxes de ligne (customTaxes :
+AIRSI, DTD, GRA...).
+
+Les lignes de FneInvoiceItems sont lues par blocs (curseur SQLite), les
+colonnes chargées en tableaux NumPy/pandas et agrégées par group-by
+vectorisé ; les montants restent en centimes entiers jusqu'au résultat
+final, sans erreur d'arrondi. Le JSON CustomTaxes n'est décodé qu'une fois
+par valeur distincte (factorize), pas une fois par ligne.
+
+Le résultat d'un mois clos (antérieur au mois en cours) est mis en cache
+dans Data/Reports/cache avec une empreinte des factures du mois et de leurs
+lignes ; il n'est recalculé que si cette empreinte change (correction
+tardive d'une facture, ou seulement d'une ligne : code TVA, montants,
+taxes).
+
+Nécessite pandas et numpy.
+
+Usage:
+    python fnev4_reporting.py 2025-01 2025-12 --by vat_code,month
+"""
+
+import json
+import os
+import time
+from datetime import date
+
+from fnev4_db import connect, resolve_database_path
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:  # rapports vectorisés optionnels
+    np = pd = None
+
+GROUP_KEYS = ("month", "vat_code", "point_of_sale", "template")
+AMOUNT_COLUMNS = ("amount_ht", "vat_amount", "amount_ttc")
+CACHE_VERSION = 2
+DEFAULT_CHUNK_ROWS = 200000
+
+# Lignes non supprimées des factures du mois ; montants en centimes
+_LINES_SQL = """
+    SELECT substr(f.InvoiceDate, 1, 7), i.VatCode, f.PointOfSale, f.Template,
+           CAST(ROUND(i.LineAmountHT * 100) AS INTEGER),
+           CAST(ROUND(i.LineVatAmount * 100) AS INTEGER),
+           CAST(ROUND(i.LineAmountTTC * 100) AS INTEGER),
+           i.CustomTaxes
+    FROM FneInvoices f
+    JOIN FneInvoiceItems i ON i.FneInvoiceId = f.Id
+    WHERE f.InvoiceDate >= ? AND f.InvoiceDate < ?
+      AND f.IsDeleted = 0 AND i.IsDeleted = 0{status_filter}
+"""
+
+# Empreinte d'un mois : nombre de factures et dernière modification
+_FINGERPRINT_SQL = """
+    SELECT COUNT(*), MAX(COALESCE(UpdatedAt, CreatedAt)), SUM(IsDeleted)
+    FROM FneInvoices WHERE InvoiceDate >= ? AND InvoiceDate < ?
+"""
+
+# Empreinte des lignes du mois par (code TVA, taxes) : une ligne corrigée
+# change de groupe ou ses sommes, même sans toucher à la facture
+_ITEMS_FINGERPRINT_SQL = """
+    SELECT i.VatCode, i.CustomTaxes, COUNT(*), MAX(i.rowid), MAX(COALESCE(i.UpdatedAt, i.CreatedAt)),
+           SUM(i.IsDeleted),
+           SUM(CAST(ROUND(i.LineAmountHT * 100) AS INTEGER)),
+           SUM(CAST(ROUND(i.LineVatAmount * 100) AS INTEGER)),
+           SUM(CAST(ROUND(i.LineAmountTTC * 100) AS INTEGER))
+    FROM FneInvoices f
+    JOIN FneInvoiceItems i ON i.FneInvoiceId = f.Id
+    WHERE f.InvoiceDate >= ? AND f.InvoiceDate < ?
+    GROUP BY i.VatCode, i.CustomTaxes
+    ORDER BY i.VatCode, i.CustomTaxes
+"""
+
+
+def _require_pandas():
+    if pd is None:
+        raise RuntimeError("Rapports vectorisés indisponibles : installer les paquets 'pandas' et 'numpy'")
+
+
+def default_cache_dir(db_path=None):
+    """Data/Reports/cache à côté de la base"""
+    db_path = db_path or resolve_database_path()
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "Reports", "cache")
+
+
+def month_range(start_month, end_month):
+    """['2025-01', ..., '2025-12'] bornes incluses"""
+    year, month = map(int, start_month.split("-"))
+    end_year, end = map(int, end_month.split("-"))
+    months = []
+    while (year, month) <= (end_year, end):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _month_bounds(month):
+    year, number = map(int, month.split("-"))
+    following = f"{year + 1:04d}-01" if number == 12 else f"{year:04d}-{number + 1:02d}"
+    return f"{month}-01", f"{following}-01"
+
+
+def is_closed(month, today=None):
+    """Un mois est clos dès que le mois suivant a commencé"""
+    today = today or date.today()
+    return month < f"{today.year:04d}-{today.month:02d}"
+
+
+def parse_custom_taxes(raw):
+    """
+    {nom: taux %} depuis le JSON CustomTaxes d'une ligne
+
+    Format FNE : [{"name": "AIRSI", "amount": 2}] (amount = taux). Un JSON
+    illisible est ignoré plutôt que de faire échouer tout le rapport.
+    """
+    if not raw:
+        return {}
+    try:
+        taxes = json.loads(raw)
+    except (TypeError, ValueError):
+        return {}
+    if isinstance(taxes, dict):
+        taxes = [taxes]
+    rates = {}
+    for tax in taxes if isinstance(taxes, list) else []:
+        if isinstance(tax, dict) and tax.get("name"):
+            try:
+                rates[str(tax["name"]).upper()] = rates.get(str(tax["name"]).upper(), 0.0) + float(tax.get("amount") or 0)
+            except (TypeError, ValueError):
+                continue
+    return rates
+
+
+def _custom_tax_columns(custom_taxes, amount_ht):
+    """
+    Montants (centimes) des autres taxes, une colonne par nom de taxe
+
+    Chaque JSON distinct est décodé une fois ; les taux sont ensuite
+    redistribués aux lignes par indexation NumPy.
+    """
+    codes, uniques = pd.factorize(custom_taxes, use_na_sentinel=True)
+    parsed = [parse_custom_taxes(value) for value in uniques]
+    names = sorted({name for rates in parsed for name in rates})
+    columns = {}
+    for name in names:
+        # Taux par valeur distincte, dernière case = lignes sans CustomTaxes
+        rates = np.array([rates.get(name, 0.0) for rates in parsed] + [0.0])
+        line_rates = rates[codes]   # code -1 -> dernière case (0 %)
+        columns[f"tax_{name}"] = np.rint(amount_ht * line_rates / 100).astype(np.int64)
+    return columns
+
+
+def _aggregate_chunk(rows):
+    columns = list(zip(*rows))
+
+    # Clés texte factorisées puis combinées en un entier : le group-by porte
+    # sur une seule colonne int64 au lieu de quatre colonnes d'objets
+    codes, labels = [], []
+    for values in columns[:len(GROUP_KEYS)]:
+        key_codes, key_labels = pd.factorize(np.array(values, dtype=object), use_na_sentinel=False)
+        codes.append(key_codes)
+        labels.append(key_labels)
+    group = np.ravel_multi_index(codes, [len(key_labels) for key_labels in labels])
+
+    amount_ht = np.array(columns[4], dtype=np.int64)
+    frame = pd.DataFrame({
+        "group": group,
+        "lines": np.ones(len(rows), dtype=np.int64),
+        "amount_ht": amount_ht,
+        "vat_amount": np.array(columns[5], dtype=np.int64),
+        "amount_ttc": np.array(columns[6], dtype=np.int64),
+        **_custom_tax_columns(pd.Series(columns[7], dtype=object), amount_ht),
+    })
+    totals = frame.groupby("group", sort=False).sum()
+
+    positions = np.unravel_index(totals.index.to_numpy(), [len(key_labels) for key_labels in labels])
+    totals.index = pd.MultiIndex.from_arrays(
+        [key_labels[position] for key_labels, position in zip(labels, positions)], names=list(GROUP_KEYS))
+    return totals
+
+
+def _combine(partials):
+    if not partials:
+        return pd.DataFrame(columns=[*GROUP_KEYS, "lines", *AMOUNT_COLUMNS]).set_index(list(GROUP_KEYS))
+    combined = pd.concat(partials).fillna(0)
+    return combined.groupby(level=list(GROUP_KEYS), sort=True).sum().astype(np.int64)
+
+
+def compute_month(conn, month, statuses=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Agrégat d'un mois en centimes, index (month, vat_code, point_of_sale, template)"""
+    status_filter = ""
+    params = list(_month_bounds(month))
+    if statuses:
+        status_filter = f" AND f.Status IN ({', '.join('?' * len(statuses))})"
+        params += list(statuses)
+
+    cursor = conn.execute(_LINES_SQL.format(status_filter=status_filter), params)
+    partials = []
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        partials.append(_aggregate_chunk(rows))
+    return _combine(partials)
+
+
+def _fingerprint(conn, month):
+    bounds = _month_bounds(month)
+    return {"invoices": list(conn.execute(_FINGERPRINT_SQL, bounds).fetchone()),
+            "items": [list(row) for row in conn.execute(_ITEMS_FINGERPRINT_SQL, bounds)]}
+
+
+def _cache_path(cache_dir, month, statuses):
+    suffix = "_".join(sorted(statuses)) if statuses else "all"
+    return os.path.join(cache_dir, f"vat_{month}_{suffix}.json")
+
+
+def _load_cached(path, fingerprint):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("version") != CACHE_VERSION or cached.get("fingerprint") != fingerprint:
+        return None
+    frame = pd.DataFrame(cached["rows"], columns=cached["columns"])
+    if frame.empty:
+        return _combine([])
+    return frame.set_index(list(GROUP_KEYS)).astype(np.int64)
+
+
+def _save_cached(path, fingerprint, frame):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    flat = frame.reset_index()
+    payload = {"version": CACHE_VERSION, "fingerprint": fingerprint, "columns": list(flat.columns),
+               "rows": [[value.item() if hasattr(value, "item") else value for value in row]
+                        for row in flat.itertuples(index=False)]}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def vat_report(start_month, end_month, db_path=None, by=GROUP_KEYS, statuses=None, cache_dir=None,
+               use_cache=True, chunk_rows=DEFAULT_CHUNK_ROWS, today=None, stats=None):
+    """
+    Rapport TVA/ventes de start_month à end_month inclus ('YYYY-MM')
+
+    by        : regroupement parmi month, vat_code, point_of_sale, template
+    statuses  : filtre FneInvoices.Status (ex. ('Certified',)), None = tous
+    stats     : dict optionnel complété avec computed / cached (mois)
+
+    Retourne un DataFrame : lines, amount_ht, vat_amount, amount_ttc et une
+    colonne tax_<NOM> par autre taxe, montants en unités monétaires.
+    """
+    _require_pandas()
+    unknown = set(by) - set(GROUP_KEYS)
+    if unknown:
+        raise ValueError(f"Regroupement inconnu: {', '.join(sorted(unknown))} (attendu: {', '.join(GROUP_KEYS)})")
+    db_path = str(db_path or resolve_database_path())
+    cache_dir = cache_dir or default_cache_dir(db_path)
+    stats = stats if stats is not None else {}
+    stats.update(computed=[], cached=[])
+
+    conn = connect(db_path, readonly=True)
+    try:
+        months = []
+        for month in month_range(start_month, end_month):
+            closed = use_cache and is_closed(month, today)
+            path = _cache_path(cache_dir, month, statuses)
+            fingerprint = _fingerprint(conn, month) if closed else None
+            frame = _load_cached(path, fingerprint) if closed else None
+            if frame is None:
+                frame = compute_month(conn, month, statuses, chunk_rows)
+                stats["computed"].append(month)
+                if closed:
+                    _save_cached(path, fingerprint, frame)
+            else:
+                stats["cached"].append(month)
+            months.append(frame)
+    finally:
+        conn.close()
+
+    report = _combine(months)
+    if list(by) != list(GROUP_KEYS):
+        report = report.groupby(level=list(by), sort=True).sum() if by else report.sum().to_frame().T
+    amount_columns = [column for column in report.columns if column != "lines"]
+    report[amount_columns] = report[amount_columns] / 100
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rapport TVA / ventes FNEV4")
+    parser.add_argument("start", help="Premier mois (YYYY-MM)")
+    parser.add_argument("end", help="Dernier mois (YYYY-MM)")
+    parser.add_argument("--db", help="Base (défaut: chemin résolu)")
+    parser.add_argument("--by", default="vat_code", help=f"Regroupement parmi {', '.join(GROUP_KEYS)}")
+    parser.add_argument("--status", help="Statuts retenus, ex. Certified")
+    parser.add_argument("--no-cache", action="store_true", help="Tout recalculer")
+    parser.add_argument("--csv", help="Écrire le rapport en CSV")
+    args = parser.parse_args()
+
+    print("🧾 FNEV4 - RAPPORT TVA / VENTES")
+    print("=" * 50)
+    started = time.perf_counter()
+    run_stats = {}
+    result = vat_report(args.start, args.end, args.db, by=[key for key in args.by.split(",") if key],
+                        statuses=args.status.split(",") if args.status else None,
+                        use_cache=not args.no_cache, stats=run_stats)
+    with pd.option_context("display.max_rows", 200, "display.width", 200, "display.float_format", "{:,.2f}".format):
+        print(result)
+    if args.csv:
+        result.to_csv(args.csv)
+        print(f"📄 {args.csv}")
+    print(f"\n⏱️  {time.perf_counter() - started:.2f}s - {len(run_stats['computed'])} mois calculé(s), "
+          f"{len(run_stats['cached'])} depuis le cache")
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Lecture en flux des classeurs Sage 100 (une feuille = une facture)
+===========================================================================
+
+Sage100ImportService.ParseFactureFromWorksheetAsync charge tout le classeur
+en mémoire (ClosedXML) puis lit des cellules fixes feuille par feuille
+(voir exemple_structure_excel.py) :
+
+    A3 numéro de facture   A5 code client      A6 NCC client
+    A8 date                A10 point de vente  A11 intitulé client
+    A13 nom client divers  A15 NCC divers      A17 facture d'origine (avoir)
+    A18 moyen de paiement
+    lignes 20+ : B code produit, C désignation, D prix unitaire,
+                 E quantité, F emballage, G code TVA, H montant HT
+
+Ici le .xlsx est lu comme l'archive zip qu'il est : xl/sharedStrings.xml
+une seule fois, puis chaque xl/worksheets/sheetN.xml par iterparse en ne
+gardant que ces cellules. iter_invoices est un générateur : la mémoire ne
+dépend que de la plus grosse feuille, pas du nombre de feuilles.
+
+Chaque facture est un dict typé (date, Decimal, int) avec la liste des
+erreurs de validation de la feuille, mêmes règles que
+ValidateWorksheetStructureAsync sauf l'existence du client en base. Une
+feuille illisible donne une facture en erreur, pas une exception.
+
+Les feuilles sont indépendantes : avec `workers` > 1, elles sont réparties
+par paquets sur un pool de processus. Chaque processus ouvre le zip et
+charge les chaînes partagées une seule fois (initializer) ; les factures
+sont rendues dans l'ordre des onglets, avec un nombre borné de paquets en
+cours. Une feuille en erreur, ou un paquet perdu avec son processus, ne
+produit que des factures en erreur (les paquets emportés par un processus
+mort sont relancés une fois, isolément) ; write_error_log les consigne dans
+Archive/Erreurs comme le fait l'import de l'application.
+
+Les factures sans moyen de paiement (A18 vide) le reçoivent du client en
+base via resolve_payment_methods : les codes clients distincts d'un paquet
+de factures sont lus en une requête, et un client déjà vu n'est plus
+demandé, au lieu d'un GetByClientCodeAsync par feuille.
+
+Usage:
+    from fnev4_sage100 import iter_invoices
+
+    for invoice in iter_invoices("factures.xlsx", workers=8):
+        if invoice['errors']: ...
+"""
+
+import json
+import os
+import posixpath
+import re
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from fnev4_db import connect, resolve_database_path
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_C = f"{{{NS_MAIN}}}c"
+_V = f"{{{NS_MAIN}}}v"
+_T = f"{{{NS_MAIN}}}t"
+_IS = f"{{{NS_MAIN}}}is"
+_ROW = f"{{{NS_MAIN}}}row"
+_SI = f"{{{NS_MAIN}}}si"
+_R = f"{{{NS_MAIN}}}r"
+
+# Cellules d'en-tête (colonne A) -> clé de la facture
+HEADER_CELLS = {
+    3: "numero_facture",
+    5: "code_client",
+    6: "ncc_client",
+    8: "date_facture",
+    10: "point_de_vente",
+    11: "intitule_client",
+    13: "nom_reel_client_divers",
+    15: "ncc_client_divers",
+    17: "numero_facture_avoir",
+    18: "moyen_paiement",
+}
+FIRST_PRODUCT_ROW = 20
+# Colonnes produit -> (clé, type)
+PRODUCT_COLUMNS = {
+    "B": ("code_produit", "text"),
+    "C": ("designation", "text"),
+    "D": ("prix_unitaire", "decimal"),
+    "E": ("quantite", "decimal"),
+    "F": ("emballage", "text"),
+    "G": ("code_tva", "text"),
+    "H": ("montant_ht", "decimal"),
+}
+
+CLIENT_DIVERS = "1999"
+MOYENS_PAIEMENT = ("cash", "card", "mobile-money", "bank-transfer", "check", "credit")
+
+DEFAULT_WORKERS = 1
+SHEETS_PER_TASK = 64
+PAYMENT_LOOKUP_BATCH = 2000
+
+_CELL_REF = re.compile(r"([A-Z]+)(\d+)")
+_EXCEL_EPOCH = date(1899, 12, 30)
+_DATE_FORMATS = ("%d/%m/%Y", "%d/%m/%y", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%d-%m-%Y")
+
+
+def workbook_sheets(zf):
+    """[(nom, chemin de la part XML)] dans l'ordre des onglets"""
+    targets = {}
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(f"{{{NS_PKG_REL}}}Relationship"):
+        target = rel.get("Target")
+        # Cible relative à xl/ ou absolue (/xl/worksheets/...)
+        targets[rel.get("Id")] = target.lstrip("/") if target.startswith("/") else posixpath.join("xl", target)
+
+    workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+    return [(sheet.get("name"), targets[sheet.get(f"{{{NS_REL}}}id")])
+            for sheet in workbook.iter(f"{{{NS_MAIN}}}sheet")]
+
+
+def _string_item_text(si):
+    # <t> direct ou runs de texte enrichi <r><t> ; la phonétique <rPh> est ignorée
+    parts = []
+    for child in si:
+        if child.tag == _T:
+            parts.append(child.text or "")
+        elif child.tag == _R:
+            t = child.find(_T)
+            parts.append(t.text or "" if t is not None else "")
+    return "".join(parts)
+
+
+def load_shared_strings(zf):
+    """Table des chaînes partagées (texte enrichi concaténé, phonétique ignorée)"""
+    try:
+        source = zf.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    strings = []
+    with source:
+        for _, elem in ET.iterparse(source, events=("end",)):
+            if elem.tag == _SI:
+                strings.append(_string_item_text(elem))
+                elem.clear()
+    return strings
+
+
+def _wanted(column, row):
+    if row < FIRST_PRODUCT_ROW:
+        return column == "A" and row in HEADER_CELLS
+    return column in PRODUCT_COLUMNS
+
+
+def read_sheet_cells(source, shared_strings):
+    """
+    Cellules utiles d'une feuille : {(colonne, ligne): valeur}
+
+    Valeur str (chaîne partagée, inline ou formule texte), float (nombre)
+    ou bool. `source` : fichier ouvert ou chemin de la part XML.
+    """
+    cells = {}
+    for _, elem in ET.iterparse(source, events=("end",)):
+        tag = elem.tag
+        if tag == _C:
+            match = _CELL_REF.fullmatch(elem.get("r", ""))
+            if match and _wanted(match.group(1), int(match.group(2))):
+                cell_type = elem.get("t")
+                if cell_type == "inlineStr":
+                    inline = elem.find(_IS)
+                    value = "".join(t.text or "" for t in inline.iter(_T)) if inline is not None else None
+                else:
+                    v = elem.find(_V)
+                    raw = v.text if v is not None else None
+                    if raw is None:
+                        value = None
+                    elif cell_type == "s":
+                        value = shared_strings[int(raw)]
+                    elif cell_type in ("str", "e"):
+                        value = raw
+                    elif cell_type == "b":
+                        value = raw == "1"
+                    else:
+                        value = float(raw)
+                if value is not None:
+                    cells[(match.group(1), int(match.group(2)))] = value
+        elif tag == _ROW:
+            elem.clear()
+    return cells
+
+
+def _text(value):
+    """Texte de cellule comme GetString().Trim() : 556300.0 -> '556300'"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value).strip()
+
+
+def _decimal(value):
+    """Decimal sans bruit binaire (401.92110000000002 -> 401.9211), None si illisible"""
+    if value is None or value == "":
+        return None
+    try:
+        if isinstance(value, float):
+            return Decimal(int(value)) if value.is_integer() else Decimal(repr(value))
+        return Decimal(str(value).strip().replace(" ", "").replace(",", "."))
+    except InvalidOperation:
+        return None
+
+
+def _date(value):
+    """Date Excel (numéro de série OLE) ou texte ; None si illisible"""
+    if isinstance(value, float):
+        return _EXCEL_EPOCH + timedelta(days=int(value))
+    text = _text(value)
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def build_invoice(sheet_name, cells, sheet_index=None):
+    """Facture typée et erreurs de validation à partir des cellules d'une feuille"""
+    invoice = {'nom_feuille': sheet_name, 'index_feuille': sheet_index}
+    for row, key in HEADER_CELLS.items():
+        invoice[key] = _text(cells.get(("A", row)))
+
+    errors = []
+    if not invoice['numero_facture']:
+        errors.append("Numéro de facture manquant (cellule A3)")
+    if not invoice['code_client']:
+        errors.append("Code client manquant (cellule A5)")
+
+    raw_date = cells.get(("A", 8))
+    invoice['date_facture'] = _date(raw_date) if raw_date is not None else None
+    if raw_date is None:
+        errors.append("Date facture manquante (cellule A8)")
+    elif invoice['date_facture'] is None:
+        errors.append(f"Date invalide: '{_text(raw_date)}'")
+
+    # A18 vide : moyen de paiement par défaut du client, résolu à l'import (cash pour le client divers)
+    payment = invoice['moyen_paiement'].lower()
+    if payment and payment not in MOYENS_PAIEMENT:
+        errors.append(f"Moyen de paiement invalide: '{invoice['moyen_paiement']}'. "
+                      f"Valides: {', '.join(MOYENS_PAIEMENT)}")
+    invoice['moyen_paiement'] = payment or ("cash" if invoice['code_client'] == CLIENT_DIVERS else None)
+    invoice['est_avoir'] = bool(invoice['numero_facture_avoir'])
+
+    products = []
+    rows = sorted({row for (column, row) in cells if row >= FIRST_PRODUCT_ROW})
+    for row in rows:
+        code = _text(cells.get(("B", row)))
+        if not code:
+            continue
+        product = {'numero_ligne': row}
+        for column, (key, kind) in PRODUCT_COLUMNS.items():
+            value = cells.get((column, row))
+            product[key] = _decimal(value) if kind == "decimal" else _text(value)
+        products.append(product)
+    if not products:
+        errors.append(f"Aucun produit trouvé (à partir de la ligne {FIRST_PRODUCT_ROW})")
+
+    invoice['produits'] = products
+    invoice['montant_ht'] = sum((p['montant_ht'] or Decimal(0) for p in products), Decimal(0))
+    invoice['errors'] = errors
+    return invoice
+
+
+def _failed_sheet(sheet_name, sheet_index, message):
+    return {'nom_feuille': sheet_name, 'index_feuille': sheet_index, 'produits': [],
+            'errors': [f"Erreur feuille '{sheet_name}': {message}"]}
+
+
+def parse_sheet(zf, sheet_name, part, shared_strings, sheet_index=None):
+    """Une feuille -> facture ; toute erreur de lecture reste attachée à la feuille"""
+    try:
+        with zf.open(part) as source:
+            cells = read_sheet_cells(source, shared_strings)
+        return build_invoice(sheet_name, cells, sheet_index)
+    except Exception as e:
+        return _failed_sheet(sheet_name, sheet_index, e)
+
+
+# État d'un processus du pool : zip ouvert et chaînes partagées, chargés une fois
+_worker_state = {}
+
+
+def _init_worker(path):
+    zf = zipfile.ZipFile(path)
+    _worker_state.update(zf=zf, shared_strings=load_shared_strings(zf))
+
+
+def _parse_batch(batch):
+    zf, shared_strings = _worker_state['zf'], _worker_state['shared_strings']
+    return [parse_sheet(zf, name, part, shared_strings, index) for index, name, part in batch]
+
+
+def _iter_parallel(path, selected, workers, sheets_per_task):
+    batches = iter([selected[i:i + sheets_per_task] for i in range(0, len(selected), sheets_per_task)])
+    pools = [None]
+
+    def new_pool():
+        if pools[0] is not None:
+            pools[0].shutdown(wait=False, cancel_futures=True)
+        pools[0] = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(str(path),))
+
+    def submit(batch):
+        try:
+            return pools[0].submit(_parse_batch, batch)
+        except BrokenProcessPool:
+            new_pool()
+            return pools[0].submit(_parse_batch, batch)
+
+    def retry_alone(batch):
+        # Un processus est mort : tous les paquets en cours ont échoué avec lui.
+        # Chacun est relancé une fois ; seul celui qui le tue à nouveau reste en erreur.
+        try:
+            return submit(batch).result()
+        except BrokenProcessPool as e:
+            new_pool()
+            return [_failed_sheet(name, index, f"processus d'analyse interrompu ({e})")
+                    for index, name, _ in batch]
+
+    new_pool()
+    pending = deque()
+    try:
+        # Quelques paquets d'avance par processus : ordre conservé, mémoire bornée
+        for batch in islice(batches, workers * 2):
+            pending.append((batch, submit(batch)))
+        while pending:
+            batch, future = pending.popleft()
+            try:
+                invoices = future.result()
+            except BrokenProcessPool:
+                invoices = retry_alone(batch)
+            except Exception as e:
+                invoices = [_failed_sheet(name, index, e) for index, name, _ in batch]
+            following = next(batches, None)
+            if following is not None:
+                pending.append((following, submit(following)))
+            yield from invoices
+    finally:
+        pools[0].shutdown(wait=True, cancel_futures=True)
+
+
+def iter_invoices(path, sheets=None, workers=DEFAULT_WORKERS, sheets_per_task=SHEETS_PER_TASK):
+    """
+    Génère les factures du classeur dans l'ordre des onglets
+
+    `sheets` : noms des feuilles à lire (défaut: toutes). `workers` > 1 :
+    lecture répartie sur un pool de processus, même résultat et même ordre.
+    """
+    with zipfile.ZipFile(path) as zf:
+        selected = [(index, name, part) for index, (name, part) in enumerate(workbook_sheets(zf))
+                    if sheets is None or name in sheets]
+        if workers <= 1 or len(selected) <= sheets_per_task:
+            shared_strings = load_shared_strings(zf)
+            for index, name, part in selected:
+                yield parse_sheet(zf, name, part, shared_strings, index)
+            return
+    yield from _iter_parallel(path, selected, workers, sheets_per_task)
+
+
+def write_error_log(workbook_path, invoices, error_dir):
+    """
+    Consigne les feuilles en erreur dans `error_dir` (Archive/Erreurs)
+
+    Même nommage que l'import de l'application : {horodatage}_ERREUR_{fichier}.error.log.
+    Retourne le chemin écrit, ou None si aucune feuille n'est en erreur.
+    """
+    failed = [invoice for invoice in invoices if invoice['errors']]
+    if not failed:
+        return None
+    os.makedirs(error_dir, exist_ok=True)
+    now = datetime.now()
+    file_name = os.path.basename(workbook_path)
+    log_path = os.path.join(error_dir, f"{now:%Y-%m-%d_%H-%M-%S}_ERREUR_{os.path.splitext(file_name)[0]}.error.log")
+    lines = [f"Erreur d'import - {now:%Y-%m-%d %H:%M:%S}", f"Fichier: {file_name}",
+             f"Feuilles en erreur: {len(failed)}", ""]
+    for invoice in failed:
+        lines.append(f"[{invoice['index_feuille']}] {invoice['nom_feuille']}: {'; '.join(invoice['errors'])}")
+    with open(log_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    return log_path
+
+
+def fetch_payment_methods(conn, client_codes):
+    """{code client: DefaultPaymentMethod} des clients non supprimés, en une requête"""
+    if not client_codes:
+        return {}
+    return {code: (method or "").strip().lower() for code, method in conn.execute(
+        "SELECT ClientCode, DefaultPaymentMethod FROM Clients "
+        "WHERE IsDeleted = 0 AND ClientCode IN (SELECT value FROM json_each(?))",
+        (json.dumps(sorted(client_codes)),))}
+
+
+def resolve_payment_methods(invoices, db_path=None, batch_size=PAYMENT_LOOKUP_BATCH):
+    """
+    Complète moyen_paiement (A18 vide) avec le moyen par défaut du client
+
+    Générateur sur `invoices` (ordre conservé) : par paquet de `batch_size`
+    factures, une seule requête pour les codes clients pas encore connus.
+    Le client divers (1999) est toujours en cash, sans requête. Un client
+    absent de la base ou un moyen inconnu met la facture en erreur.
+    """
+    methods = {CLIENT_DIVERS: "cash"}
+    conn = connect(str(db_path or resolve_database_path()), readonly=True)
+    try:
+        invoices = iter(invoices)
+        while True:
+            batch = list(islice(invoices, batch_size))
+            if not batch:
+                return
+            pending = [invoice for invoice in batch if invoice['moyen_paiement'] is None and invoice['code_client']]
+            unknown = {invoice['code_client'] for invoice in pending} - methods.keys()
+            found = fetch_payment_methods(conn, unknown)
+            methods.update((code, found.get(code)) for code in unknown)
+            for invoice in pending:
+                method = methods[invoice['code_client']]
+                if method is None:
+                    invoice['errors'].append(f"Client '{invoice['code_client']}' introuvable: "
+                                             f"moyen de paiement par défaut indisponible (cellule A18 vide)")
+                elif method not in MOYENS_PAIEMENT:
+                    invoice['errors'].append(f"Moyen de paiement par défaut invalide pour le client "
+                                             f"'{invoice['code_client']}': '{method}'")
+                else:
+                    invoice['moyen_paiement'] = method
+            yield from batch
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Lecture en flux d'un classeur Sage 100")
+    parser.add_argument("workbook")
+    parser.add_argument("--details", action="store_true", help="Afficher chaque facture")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Processus de lecture")
+    parser.add_argument("--error-dir", help="Consigner les feuilles en erreur dans ce dossier (Archive/Erreurs)")
+    parser.add_argument("--db", help="Compléter les moyens de paiement depuis les clients de cette base")
+    args = parser.parse_args()
+
+    print("📗 FNEV4 - LECTURE SAGE 100")
+    print("=" * 50)
+    started = time.perf_counter()
+    valid = invalid = products = 0
+    failed = []
+    invoices = iter_invoices(args.workbook, workers=args.workers)
+    if args.db:
+        invoices = resolve_payment_methods(invoices, args.db)
+    for invoice in invoices:
+        products += len(invoice['produits'])
+        if invoice['errors']:
+            invalid += 1
+            failed.append(invoice)
+            print(f"❌ {invoice['nom_feuille']}: {'; '.join(invoice['errors'])}")
+        else:
+            valid += 1
+            if args.details:
+                print(f"✅ {invoice['numero_facture']} client {invoice['code_client']} "
+                      f"du {invoice['date_facture']} - {len(invoice['produits'])} ligne(s), "
+                      f"HT {invoice['montant_ht']}")
+    print(f"\n📊 {valid} facture(s) valide(s), {invalid} en erreur, {products} ligne(s) produit "
+          f"en {time.perf_counter() - started:.2f}s")
+    if args.error_dir and failed:
+        print(f"📝 Journal des erreurs: {write_error_log(args.workbook, failed, args.error_dir)}")
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Recherche plein texte des clients (FTS5)
+=================================================
+
+ListeClientsUseCase filtre avec quatre `LIKE '%terme%'` (ClientCode, Name,
+CompanyName, Email) : aucun index B-tree ne peut servir, chaque frappe
+parcourt toute la table.
+
+Ce module maintient un index FTS5 "fantôme" de la table Clients
+(contenu externe, synchronisé par triggers) avec pliage des accents :
+"cote ivoire" trouve "CÔTE D'IVOIRE". Le constructeur de requêtes
+utilise l'index pour la recherche par mots et par préfixes ; la page et le
+total sont calculés avec le même filtre, donc toujours cohérents.
+Sans index FTS5 (base non migrée), on retombe sur les LIKE d'origine.
+"""
+
+import re
+import time
+
+from fnev4_counts import cached_client_count
+from fnev4_db import connect, resolve_database_path
+
+FTS_TABLE = "ClientsSearch"
+SEARCH_COLUMNS = ("ClientCode", "Name", "CompanyName", "Email")
+
+CLIENT_LIST_COLUMNS = """
+    c.ClientCode, c.Name, c.CompanyName, c.ClientType, c.IsActive,
+    c.Email, c.Phone, c.Address, c.ClientNcc, c.CreatedDate
+"""
+
+_columns = ", ".join(SEARCH_COLUMNS)
+_new_values = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+_old_values = ", ".join(f"old.{c}" for c in SEARCH_COLUMNS)
+
+SCHEMA_STATEMENTS = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {_columns},
+        content='Clients',
+        content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS TR_{FTS_TABLE}_Insert AFTER INSERT ON Clients BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, {_columns}) VALUES (new.rowid, {_new_values});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS TR_{FTS_TABLE}_Delete AFTER DELETE ON Clients BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.rowid, {_old_values});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS TR_{FTS_TABLE}_Update AFTER UPDATE OF {_columns} ON Clients BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.rowid, {_old_values});
+        INSERT INTO {FTS_TABLE} (rowid, {_columns}) VALUES (new.rowid, {_new_values});
+    END
+    """,
+]
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def has_search_index(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (FTS_TABLE,)).fetchone() is not None
+
+
+def build_fts_query(search_term):
+    """
+    Transforme la saisie utilisateur en requête FTS5 sûre
+
+    Chaque mot devient un préfixe entre guillemets, tous les mots sont requis :
+    "CÔTE D'IVOIRE" -> "CÔTE"* AND "D"* AND "IVOIRE"*
+    """
+    tokens = _TOKEN_PATTERN.findall(search_term or "")
+    return " AND ".join(f'"{token}"*' for token in tokens)
+
+
+def client_filters(is_active_filter=None, client_type=None):
+    """Filtres communs du ListeClientsUseCase (hors recherche) : (sql, params)"""
+    clauses = ["(c.IsDeleted = 0 OR c.IsDeleted IS NULL)"]
+    params = []
+
+    if is_active_filter is not None:
+        clauses.append("c.IsActive = 1" if is_active_filter else "c.IsActive = 0")
+
+    if client_type and client_type != "Tous":
+        clauses.append("c.ClientType = ?")
+        params.append(client_type)
+
+    return " AND ".join(clauses), params
+
+
+def search_clause(conn, search_term):
+    """
+    Filtre de recherche : (condition, params)
+
+    FTS5 si l'index existe, LIKE '%terme%' sinon (comportement du UseCase).
+    """
+    if not search_term:
+        return "", []
+
+    if has_search_index(conn):
+        fts_query = build_fts_query(search_term)
+        if fts_query:
+            # Sous-requête IN : le MATCH est évalué une seule fois, les rowid
+            # trouvés sont ensuite filtrés et triés côté Clients
+            return (f"c.rowid IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?)",
+                    [fts_query])
+
+    pattern = f"%{search_term}%"
+    return ("(c.ClientCode LIKE ? OR c.Name LIKE ? OR c.CompanyName LIKE ? OR c.Email LIKE ?)",
+            [pattern] * 4)
+
+
+def build_client_list_query(conn, search_term=None, is_active_filter=None, client_type=None):
+    """Requête de liste et requête de total partageant exactement le même filtre"""
+    where, params = client_filters(is_active_filter, client_type)
+    condition, search_params = search_clause(conn, search_term)
+    if condition:
+        where += f" AND {condition}"
+        params = params + search_params
+
+    list_sql = f"SELECT {CLIENT_LIST_COLUMNS} FROM Clients c WHERE {where}"
+    count_sql = f"SELECT COUNT(*) FROM Clients c WHERE {where}"
+    return list_sql, count_sql, params
+
+
+def count_clients(conn, search_term=None, is_active_filter=None, client_type=None):
+    """
+    Total de la liste : cache ClientCounts si disponible, COUNT(*) sinon
+
+    Les recherches plein texte passent toujours par COUNT(*).
+    """
+    if not search_term:
+        total = cached_client_count(conn, is_active_filter, client_type)
+        if total is not None:
+            return total
+
+    _, count_sql, params = build_client_list_query(conn, search_term, is_active_filter, client_type)
+    return conn.execute(count_sql, params).fetchone()[0]
+
+
+def search_clients(conn, search_term=None, is_active_filter=None, client_type=None,
+                   page_number=1, page_size=50):
+    """Page de résultats + total, comme ListeClientsUseCase"""
+    list_sql, _, params = build_client_list_query(
+        conn, search_term, is_active_filter, client_type)
+
+    offset = (page_number - 1) * page_size
+    clients = conn.execute(f"{list_sql} ORDER BY c.ClientCode LIMIT ? OFFSET ?",
+                           params + [page_size, offset]).fetchall()
+    total_count = count_clients(conn, search_term, is_active_filter, client_type)
+    total_pages = (total_count + page_size - 1) // page_size
+
+    return {
+        "clients": clients,
+        "totalCount": total_count,
+        "totalPages": total_pages,
+        "hasNextPage": page_number < total_pages,
+        "hasPreviousPage": page_number > 1,
+    }
+
+
+def create_search_index(db_path=None):
+    """Crée la table FTS5 et ses triggers puis reconstruit l'index (idempotent)"""
+    db_path = str(db_path or resolve_database_path())
+    conn = connect(db_path, readonly=False)
+    conn.isolation_level = None
+    started = time.perf_counter()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in SCHEMA_STATEMENTS:
+                conn.execute(statement)
+            conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    finally:
+        conn.close()
+    return round(time.perf_counter() - started, 3)
+
+
+def check_search_index(db_path=None):
+    """Vérifie que l'index FTS5 correspond au contenu de Clients"""
+    conn = connect(db_path, readonly=False)
+    try:
+        conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES ('integrity-check', 1)")
+        return True
+    except Exception:
+        return False
+    finally:
+        conn.close()
+
+
+def drop_search_index(db_path=None):
+    conn = connect(db_path, readonly=False)
+    try:
+        for suffix in ("Insert", "Delete", "Update"):
+            conn.execute(f"DROP TRIGGER IF EXISTS TR_{FTS_TABLE}_{suffix}")
+        conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index de recherche FTS5 des clients FNEV4")
+    parser.add_argument("action", choices=["create", "check", "drop", "search"])
+    parser.add_argument("term", nargs="?", help="Terme recherché (action search)")
+    parser.add_argument("--db", help="Base (défaut: chemin résolu)")
+    args = parser.parse_args()
+
+    print("🔎 FNEV4 - RECHERCHE PLEIN TEXTE DES CLIENTS")
+    print("=" * 50)
+    if args.action == "create":
+        print(f"✅ Index {FTS_TABLE} construit en {create_search_index(args.db)}s")
+    elif args.action == "check":
+        print("✅ Index cohérent" if check_search_index(args.db) else "❌ Index incohérent : relancer create")
+    elif args.action == "drop":
+        drop_search_index(args.db)
+        print(f"🗑️  Index {FTS_TABLE} supprimé")
+    else:
+        conn = connect(args.db, readonly=True)
+        try:
+            started = time.perf_counter()
+            result = search_clients(conn, args.term, is_active_filter=True)
+            elapsed = (time.perf_counter() - started) * 1000
+        finally:
+            conn.close()
+        print(f"📋 {result['totalCount']} clients trouvés en {elapsed:.1f} ms")
+        for client in result['clients']:
+            print(f"  - {client[0]}: {client[1] or client[2] or 'N/A'} ({client[3]})")
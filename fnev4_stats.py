@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FNEV4 - Statistiques de tables sans COUNT(*) complet
+=====================================================
+
+Les diagnostics lançaient `SELECT COUNT(*)` sur chaque table de chaque copie
+de la base : sur FneApiLogs et FneInvoiceItems, plusieurs secondes par table
+dès que les pages ne sont plus en cache.
+
+Trois niveaux :
+
+    estimate  sqlite_stat1 (dernier ANALYZE, une seule lecture), sinon
+              COUNT(*) exact : SQLite le fait sur l'index le plus étroit,
+              plus vite que tout parcours de pages (dbstat lit toute la
+              table). Une valeur estimée s'affiche toujours avec '~'
+              (format_rows).
+    exact     COUNT(*) de toutes les tables en parallèle, une connexion en
+              lecture seule par thread (sqlite3 relâche le GIL pendant le
+              parcours).
+    cached    comptes exacts gardés en mémoire et recalculés seulement si
+              PRAGMA data_version a changé (une autre connexion a écrit).
+              Le cache vit le temps du processus.
+
+Usage:
+    from fnev4_stats import table_statistics
+
+    stats = table_statistics(db_path, mode="estimate")
+    stats["FneInvoices"]   # {'rows': 200000, 'exact': False, 'source': 'sqlite_stat1'}
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fnev4_db import connect, resolve_database_path
+
+MODES = ("estimate", "exact", "cached")
+DEFAULT_MODE = "estimate"
+DEFAULT_WORKERS = 4
+
+_cached_counts = {}
+_cached_lock = threading.Lock()
+
+
+def list_tables(conn):
+    """Tables ordinaires (ni tables internes sqlite_, ni tables virtuelles FTS et leurs tables shadow)"""
+    try:
+        return [row[0] for row in conn.execute(
+            "SELECT name FROM pragma_table_list WHERE schema = 'main' AND type = 'table' "
+            "AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+    except Exception:
+        # SQLite < 3.37 : pas de pragma table_list
+        return [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' "
+            "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%' ORDER BY name")]
+
+
+def _stat1_counts(conn):
+    """Nombre de lignes par table d'après sqlite_stat1 (premier entier de stat)"""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name='sqlite_stat1'").fetchone() is None:
+        return {}
+    counts = {}
+    for table, stat in conn.execute("SELECT tbl, stat FROM sqlite_stat1"):
+        try:
+            rows = int(str(stat).split()[0])
+        except (ValueError, IndexError):
+            continue
+        counts[table] = max(counts.get(table, 0), rows)
+    return counts
+
+
+def estimate_counts(conn, tables=None):
+    """
+    {table: {'rows', 'exact', 'source'}} sans COUNT(*) quand c'est possible
+
+    sqlite_stat1 peut dater du dernier ANALYZE ; sans statistique, la table
+    est comptée (exact=True) : aucune estimation sans ANALYZE n'est plus
+    rapide que COUNT(*) sur l'index le plus étroit.
+    """
+    stat1 = _stat1_counts(conn)
+    results = {}
+    for table in tables or list_tables(conn):
+        if table in stat1:
+            results[table] = {'rows': stat1[table], 'exact': False, 'source': 'sqlite_stat1'}
+            continue
+        rows = conn.execute(f"SELECT COUNT(*) FROM [{table}]").fetchone()[0]
+        results[table] = {'rows': rows, 'exact': True, 'source': 'count'}
+    return results
+
+
+def _count_table(db_path, table):
+    conn = connect(db_path, readonly=True)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM [{table}]").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def exact_counts(db_path, tables, workers=DEFAULT_WORKERS, order=None):
+    """
+    COUNT(*) parallèle, une connexion lecture seule par table
+
+    `order` ({table: lignes}, sqlite_stat1) fait partir les plus grosses tables en premier pour
+    que la plus longue ne termine pas seule à la fin.
+    """
+    if order:
+        tables = sorted(tables, key=lambda table: order.get(table, 0), reverse=True)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tables) or 1))) as pool:
+        futures = {table: pool.submit(_count_table, db_path, table) for table in tables}
+        for table, future in futures.items():
+            try:
+                results[table] = {'rows': future.result(), 'exact': True, 'source': 'count'}
+            except Exception as e:
+                results[table] = {'rows': None, 'exact': False, 'source': 'erreur', 'error': str(e)}
+    return results
+
+
+def _cached_entry(db_path):
+    with _cached_lock:
+        entry = _cached_counts.get(db_path)
+        if entry is None:
+            # Connexion gardée ouverte : data_version n'a de sens que pour elle
+            entry = {'conn': connect(db_path, readonly=True), 'version': None, 'counts': None,
+                     'lock': threading.Lock()}
+            _cached_counts[db_path] = entry
+    return entry
+
+
+def cached_counts(db_path, tables=None, workers=DEFAULT_WORKERS):
+    """Comptes exacts, recalculés seulement si la base a été modifiée depuis le dernier appel"""
+    entry = _cached_entry(db_path)
+    with entry['lock']:
+        version = entry['conn'].execute("PRAGMA data_version").fetchone()[0]
+        if entry['counts'] is None or entry['version'] != version:
+            all_tables = list_tables(entry['conn'])
+            entry['counts'] = exact_counts(db_path, all_tables, workers, order=_stat1_counts(entry['conn']))
+            entry['version'] = version
+            hit = False
+        else:
+            hit = True
+
+    counts = entry['counts']
+    selected = tables or list(counts)
+    return {table: dict(counts[table], source='cache' if hit else 'count')
+            for table in selected if table in counts}
+
+
+def clear_cached_counts():
+    with _cached_lock:
+        for entry in _cached_counts.values():
+            entry['conn'].close()
+        _cached_counts.clear()
+
+
+def table_statistics(db_path=None, mode=DEFAULT_MODE, tables=None, workers=DEFAULT_WORKERS):
+    """
+    Nombre de lignes par table selon `mode` (estimate, exact ou cached)
+
+    Retourne {table: {'rows', 'exact', 'source'}} trié par nom de table.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Mode inconnu: {mode} (attendu: {', '.join(MODES)})")
+    db_path = str(db_path or resolve_database_path())
+
+    if mode == "cached":
+        results = cached_counts(db_path, tables, workers)
+    else:
+        conn = connect(db_path, readonly=True)
+        try:
+            tables = tables or list_tables(conn)
+            # Mode exact : l'ordre vient de sqlite_stat1 seul, pas d'un premier comptage
+            results = estimate_counts(conn, tables) if mode == "estimate" else _stat1_counts(conn)
+        finally:
+            conn.close()
+        if mode == "exact":
+            results = exact_counts(db_path, tables, workers, order=results)
+    return dict(sorted(results.items()))
+
+
+def format_rows(stats):
+    """'200000', '~200000' pour une estimation, 'Erreur' si le comptage a échoué"""
+    if stats['rows'] is None:
+        return "Erreur"
+    return f"{stats['rows']}" if stats['exact'] else f"~{stats['rows']}"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Statistiques de tables FNEV4")
+    parser.add_argument("databases", nargs="*", help="Bases (défaut: chemin résolu)")
+    parser.add_argument("--mode", choices=MODES, default=DEFAULT_MODE)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    print(f"📊 FNEV4 - STATISTIQUES DE TABLES ({args.mode})")
+    print("=" * 50)
+    total_started = time.perf_counter()
+    for db_path in args.databases or [resolve_database_path()]:
+        started = time.perf_counter()
+        stats = table_statistics(db_path, args.mode, workers=args.workers)
+        print(f"\n📁 {db_path} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+        for table, table_stats in stats.items():
+            print(f"   - {table}: {format_rows(table_stats)} ({table_stats['source']})")
+    print(f"\n⏱️  Total: {(time.perf_counter() - total_started) * 1000:.1f} ms")
@@ -7,10 +7,12 @@ Vérification que le sous-menu utilise bien le système centralisé.
 """
 
 import os
-import sqlite3
 import json
 from datetime import datetime
 
+from fnev4_db import PROJECT_ROOT, read_connection, resolve_database_path
+from fnev4_integrity import STATUS_OK, quick_check
+
 def test_centralized_database_access():
     """Test de l'accès centralisé à la base de données."""
     
@@ -18,7 +20,7 @@ def test_centralized_database_access():
     print("=" * 60)
     
     # 1. Vérifier le chemin centralisé
-    centralized_db_path = r"C:\wamp64\www\FNEV4\data\FNEV4.db"
+    centralized_db_path = resolve_database_path()
     
     print(f"📍 Chemin centralisé attendu : {centralized_db_path}")
     
@@ -30,64 +32,63 @@ def test_centralized_database_access():
     
     # 2. Vérifier la structure de la base
     try:
-        conn = sqlite3.connect(centralized_db_path)
-        cursor = conn.cursor()
-        
-        # Obtenir la liste des tables
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [row[0] for row in cursor.fetchall()]
-        
-        print(f"📊 Nombre de tables trouvées : {len(tables)}")
-        print(f"📋 Tables : {', '.join(tables)}")
-        
-        # Vérifier des tables clés
-        key_tables = ['Clients', 'Factures', 'Articles']
-        missing_tables = []
-        
-        for table in key_tables:
-            if table not in tables:
-                missing_tables.append(table)
+        with read_connection(centralized_db_path) as conn:
+            cursor = conn.cursor()
+        
+            # Obtenir la liste des tables
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            tables = [row[0] for row in cursor.fetchall()]
+        
+            print(f"📊 Nombre de tables trouvées : {len(tables)}")
+            print(f"📋 Tables : {', '.join(tables)}")
+        
+            # Vérifier des tables clés
+            key_tables = ['Clients', 'Factures', 'Articles']
+            missing_tables = []
+        
+            for table in key_tables:
+                if table not in tables:
+                    missing_tables.append(table)
+                else:
+                    # Compter les enregistrements
+                    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                    count = cursor.fetchone()[0]
+                    print(f"   ✅ {table}: {count} enregistrements")
+        
+            if missing_tables:
+                print(f"⚠️  Tables manquantes : {missing_tables}")
+        
+            # 3. Tester l'intégrité (quick_check : integrity_check complet via fnev4_integrity deep)
+            integrity_status, integrity_problems = quick_check(centralized_db_path, persist=False)
+            integrity_result = "ok" if integrity_status == STATUS_OK else "; ".join(integrity_problems)
+        
+            if integrity_result == "ok":
+                print("✅ Intégrité de la base : OK")
             else:
-                # Compter les enregistrements
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                count = cursor.fetchone()[0]
-                print(f"   ✅ {table}: {count} enregistrements")
-        
-        if missing_tables:
-            print(f"⚠️  Tables manquantes : {missing_tables}")
-        
-        # 3. Tester l'intégrité
-        cursor.execute("PRAGMA integrity_check")
-        integrity_result = cursor.fetchone()[0]
-        
-        if integrity_result == "ok":
-            print("✅ Intégrité de la base : OK")
-        else:
-            print(f"❌ Problème d'intégrité : {integrity_result}")
+                print(f"❌ Problème d'intégrité : {integrity_result}")
         
-        # 4. Informations de la base
-        cursor.execute("PRAGMA database_list")
-        db_info = cursor.fetchall()
+            # 4. Informations de la base
+            cursor.execute("PRAGMA database_list")
+            db_info = cursor.fetchall()
         
-        # Taille du fichier
-        file_size = os.path.getsize(centralized_db_path)
-        size_kb = round(file_size / 1024, 2)
+            # Taille du fichier
+            file_size = os.path.getsize(centralized_db_path)
+            size_kb = round(file_size / 1024, 2)
         
-        print(f"💾 Taille de la base : {size_kb} KB")
+            print(f"💾 Taille de la base : {size_kb} KB")
         
-        # Version SQLite
-        cursor.execute("SELECT sqlite_version()")
-        sqlite_version = cursor.fetchone()[0]
-        print(f"⚙️  Version SQLite : {sqlite_version}")
+            # Version SQLite
+            cursor.execute("SELECT sqlite_version()")
+            sqlite_version = cursor.fetchone()[0]
+            print(f"⚙️  Version SQLite : {sqlite_version}")
         
-        conn.close()
         
     except Exception as e:
         print(f"❌ Erreur lors de l'accès à la base : {e}")
         return False
     
     # 5. Vérifier qu'il n'y a plus de bases de données multiples
-    data_dir = r"C:\wamp64\www\FNEV4\data"
+    data_dir = os.path.dirname(centralized_db_path)
     db_files = []
     
     if os.path.exists(data_dir):
@@ -123,7 +124,7 @@ def test_centralized_database_access():
     architecture_ok = True
     
     for file_name, file_path in key_files:
-        full_path = os.path.join(r"C:\wamp64\www\FNEV4", file_path)
+        full_path = os.path.join(str(PROJECT_ROOT), file_path)
         if os.path.exists(full_path):
             print(f"   ✅ {file_name}")
         else:
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test de l'archivage mensuel des journaux (fnev4_archive)
+
+Une panne de la suppression dans la base principale, après la copie dans
+l'archive, ne doit perdre aucune ligne ; la reprise termine sans doublon.
+"""
+
+import sqlite3
+
+from fnev4_archive import archive_logs, archive_path, open_with_archives
+
+LOG_ENTRIES_SQL = """
+    CREATE TABLE "LogEntries" (
+        "Id" INTEGER NOT NULL CONSTRAINT "PK_LogEntries" PRIMARY KEY AUTOINCREMENT,
+        "Timestamp" TEXT NOT NULL, "Level" INTEGER NOT NULL, "Category" TEXT NOT NULL,
+        "Message" TEXT NOT NULL, "ExceptionDetails" TEXT, "MachineName" TEXT NOT NULL,
+        "UserName" TEXT NOT NULL, "ProcessId" INTEGER NOT NULL, "ThreadId" TEXT NOT NULL,
+        "CreatedAt" TEXT NOT NULL, "UpdatedAt" TEXT, "IsDeleted" INTEGER NOT NULL
+    )
+"""
+
+
+def _make_db(path, rows=500):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(LOG_ENTRIES_SQL)
+    conn.executemany(
+        "INSERT INTO LogEntries (Timestamp, Level, Category, Message, MachineName, UserName, "
+        "ProcessId, ThreadId, CreatedAt, IsDeleted) VALUES (?, 2, 'Import', ?, 'PC', 'admin', 1, '1', ?, 0)",
+        [(f"2025-0{1 + i % 3}-{1 + i % 28:02d} 10:00:00", f"message {i} " * 20, "2025-01-01")
+         for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def _ids(path, table="LogEntries"):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute(f"SELECT Id FROM {table}")]
+    finally:
+        conn.close()
+
+
+def test_archive_survives_failed_delete(tmp_path):
+    """La copie est validée avant la suppression : une suppression en échec ne perd rien"""
+    db_path = str(tmp_path / "FNEV4.db")
+    archive_dir = str(tmp_path / "Archive")
+    _make_db(db_path)
+    expected = sorted(_ids(db_path))
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TRIGGER fail_delete BEFORE DELETE ON LogEntries "
+                 "BEGIN SELECT RAISE(ABORT, 'panne simulée'); END")
+    conn.commit()
+    conn.close()
+
+    try:
+        archive_logs(db_path, archive_dir, before_month="2025-03", tables=["LogEntries"], batch_pause=0)
+    except sqlite3.DatabaseError as error:
+        assert "panne simulée" in str(error)
+    else:
+        raise AssertionError("la suppression aurait dû échouer")
+
+    # Le premier lot est dans l'archive et toujours dans la base principale
+    archived = _ids(archive_path(archive_dir, "2025-01"))
+    assert archived
+    assert sorted(set(_ids(db_path)) | set(archived)) == expected
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("DROP TRIGGER fail_delete")
+    conn.commit()
+    conn.close()
+
+    result = archive_logs(db_path, archive_dir, before_month="2025-03", tables=["LogEntries"], batch_pause=0)
+    remaining = _ids(db_path)
+    january = _ids(archive_path(archive_dir, "2025-01"))
+    february = _ids(archive_path(archive_dir, "2025-02"))
+    assert len(january) == len(set(january))
+    assert sorted(remaining + january + february) == expected
+    assert sum(result['moved']['LogEntries'].values()) == len(january) + len(february)
+
+
+def test_archive_follows_new_columns(tmp_path):
+    """Une colonne ajoutée à la base principale passe dans l'archive et dans les vues"""
+    db_path = str(tmp_path / "FNEV4.db")
+    archive_dir = str(tmp_path / "Archive")
+    _make_db(db_path, rows=60)
+    archive_logs(db_path, archive_dir, before_month="2025-02", tables=["LogEntries"], batch_pause=0)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("ALTER TABLE LogEntries ADD COLUMN CorrelationId TEXT")
+    conn.execute("INSERT INTO LogEntries (Timestamp, Level, Category, Message, MachineName, UserName, "
+                 "ProcessId, ThreadId, CreatedAt, IsDeleted, CorrelationId) "
+                 "VALUES ('2025-01-15 08:00:00', 4, 'Api', 'tardif', 'PC', 'admin', 1, '1', '2025-01-15', 0, 'c-1')")
+    conn.commit()
+    conn.close()
+
+    archive_logs(db_path, archive_dir, before_month="2025-02", tables=["LogEntries"], batch_pause=0)
+    conn = open_with_archives(db_path, archive_dir, tables=["LogEntries"])
+    try:
+        rows = conn.execute("SELECT CorrelationId, COUNT(*) FROM LogEntries_All GROUP BY 1 ORDER BY 1").fetchall()
+    finally:
+        conn.close()
+    assert rows == [(None, 60), ("c-1", 1)]
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test du contrôle de régression du banc de mesure (fnev4_bench)
+
+Des exécutions lentes successives ne doivent pas devenir la référence :
+le contrôle échoue à chaque fois tant que le p95 ne revient pas, sauf
+ralentissement accepté explicitement.
+"""
+
+from fnev4_bench import gate_run, load_history
+
+
+def _results(p95_ms, database_path='/srv/a/FNEV4.db'):
+    return [{'database': 'FNEV4.db', 'database_path': database_path, 'scenario': 'count_total',
+             'mode': 'warm', 'p95_ms': p95_ms}]
+
+
+def test_regressed_runs_never_become_baseline(tmp_path):
+    """Les exécutions en régression sont gardées mais écartées de la médiane de référence"""
+    history_path = str(tmp_path / "bench_history.json")
+    for _ in range(5):
+        assert gate_run(_results(10.0), history_path) == []
+
+    for _ in range(8):
+        regressions = gate_run(_results(30.0), history_path)
+        assert len(regressions) == 1
+        _, baseline, current, _ = regressions[0]
+        assert (baseline, current) == (10.0, 30.0)
+
+    history = load_history(history_path)
+    assert len(history) == 13
+    assert [run['regressed'] for run in history] == [False] * 5 + [True] * 8
+
+    # Retour à la normale : accepté, la référence n'a pas bougé
+    assert gate_run(_results(10.5), history_path) == []
+
+
+def test_accept_starts_a_new_baseline(tmp_path):
+    """Un ralentissement accepté devient la référence ; les mesures antérieures n'y entrent plus"""
+    history_path = str(tmp_path / "bench_history.json")
+    for _ in range(5):
+        gate_run(_results(10.0), history_path)
+    assert len(gate_run(_results(30.0), history_path)) == 1
+
+    regressions = gate_run(_results(30.0), history_path, accept=True)
+    assert len(regressions) == 1
+    assert load_history(history_path)[-1]['regressed'] is False
+
+    assert gate_run(_results(31.0), history_path) == []
+    assert gate_run(_results(30.5), history_path) == []
+
+
+def test_same_file_name_keeps_separate_baselines(tmp_path):
+    """Deux installations FNEV4.db n'ont pas la même référence"""
+    history_path = str(tmp_path / "bench_history.json")
+    for _ in range(5):
+        gate_run(_results(10.0, '/srv/a/FNEV4.db'), history_path)
+    assert gate_run(_results(50.0, '/srv/b/FNEV4.db'), history_path) == []
+    assert len(gate_run(_results(50.0, '/srv/a/FNEV4.db'), history_path)) == 1
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test de la reprise d'une purge par lots (fnev4_purge)
+
+Une reprise ne doit viser que la même purge sur la même base, et purger
+aussi les lignes insérées depuis l'interruption.
+"""
+
+import json
+import sqlite3
+
+import pytest
+
+from fnev4_purge import _checkpoint_path, purge_rows
+
+
+def _make_db(path, rows=100):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Clients (Id INTEGER PRIMARY KEY, Notes TEXT)")
+    conn.executemany("INSERT INTO Clients (Notes) VALUES (?)",
+                     [("Import exceptionnel" if i % 2 else "Manuel",) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def _notes(path):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute("SELECT Notes, COUNT(*) FROM Clients GROUP BY Notes"))
+    finally:
+        conn.close()
+
+
+def _interrupt_after_first_batch(db_path, where, params):
+    def stop(deleted, total, rate):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        purge_rows("Clients", where, params, db_path=db_path, batch_size=10, batch_pause=0, progress=stop)
+
+
+def test_resume_purges_rows_inserted_since_interruption(tmp_path):
+    db_path = str(tmp_path / "FNEV4.db")
+    _make_db(db_path)
+    _interrupt_after_first_batch(db_path, "Notes = ?", ("Import exceptionnel",))
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO Clients (Notes) VALUES (?)", [("Import exceptionnel",)] * 5)
+    conn.commit()
+    conn.close()
+
+    result = purge_rows("Clients", "Notes = ?", ("Import exceptionnel",), db_path=db_path,
+                        batch_size=10, batch_pause=0, resume=True)
+    assert result['resumed_from'] is not None
+    assert result['deleted'] == 55
+    assert _notes(db_path) == {"Manuel": 50}
+
+
+def test_checkpoint_is_specific_to_params_and_database(tmp_path):
+    db_path = str(tmp_path / "FNEV4.db")
+    _make_db(db_path)
+    _interrupt_after_first_batch(db_path, "Notes = ?", ("Import exceptionnel",))
+
+    # Mêmes table et filtre, autres paramètres : aucune reprise
+    result = purge_rows("Clients", "Notes = ?", ("Manuel",), db_path=db_path, batch_pause=0, resume=True)
+    assert result['resumed_from'] is None
+    assert result['deleted'] == 50
+
+    # Point de reprise d'une autre base : ignoré
+    checkpoint = _checkpoint_path(db_path, "Clients", "Notes = ?", ("Import exceptionnel",))
+    with open(checkpoint, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    state['database']['inode'] += 1
+    with open(checkpoint, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    result = purge_rows("Clients", "Notes = ?", ("Import exceptionnel",), db_path=db_path,
+                        batch_pause=0, resume=True)
+    assert result['resumed_from'] is None
+    assert result['deleted'] == 40
+    assert _notes(db_path) == {}
@@ -5,94 +5,57 @@ Vérifie les améliorations apportées pour résoudre la lenteur
 """
 
 import os
-import sqlite3
-import time
 from datetime import datetime
 
+from fnev4_bench import print_result, run_benchmarks
+from fnev4_db import read_connection, resolve_database_path
+
+# Scénario fnev4_bench -> (libellé, seuil excellent, seuil bon) en secondes
+PERFORMANCE_THRESHOLDS = {
+    "count_total": ("Comptage", 0.1, 0.5),
+    "page_first": ("Pagination", 0.05, 0.2),
+    "search_like": ("Recherche", 0.1, 0.5),
+}
+
 def check_database_performance():
-    """Teste les performances de la base de données SQLite avec les nouveaux paramètres"""
+    """Teste les performances de la base de données SQLite (percentiles via fnev4_bench)"""
     print("🔍 Test de performance de la base de données...")
     
-    db_path = r"C:\wamp64\www\FNEV4\data\FNEV4.db"
+    db_path = resolve_database_path()
     if not os.path.exists(db_path):
         print(f"❌ Base de données introuvable: {db_path}")
         return
     
     try:
-        # Connexion avec les nouveaux paramètres optimisés
-        conn_string = f"file:{db_path}?cache=shared&mode=ro"
-        conn = sqlite3.connect(conn_string, uri=True)
-        conn.execute("PRAGMA cache_size = 10000")
-        conn.execute("PRAGMA temp_store = MEMORY")
-        conn.execute("PRAGMA journal_mode = WAL")
-        conn.execute("PRAGMA synchronous = NORMAL")
-        
-        cursor = conn.cursor()
-        
-        # Test 1: Comptage total des clients
-        start_time = time.time()
-        cursor.execute("SELECT COUNT(*) FROM Clients")
-        total_clients = cursor.fetchone()[0]
-        count_time = time.time() - start_time
-        
-        print(f"📊 Nombre total de clients: {total_clients}")
-        print(f"⏱️ Temps de comptage: {count_time:.3f}s")
-        
-        # Test 2: Pagination simulée (25 premiers clients)
-        start_time = time.time()
-        cursor.execute("""
-            SELECT Id, Name, ClientCode, ClientType, IsActive 
-            FROM Clients 
-            ORDER BY Name, ClientCode 
-            LIMIT 25
-        """)
-        page_results = cursor.fetchall()
-        pagination_time = time.time() - start_time
-        
-        print(f"📄 Première page (25 clients) chargée en: {pagination_time:.3f}s")
-        
-        # Test 3: Recherche avec LIKE
-        start_time = time.time()
-        cursor.execute("""
-            SELECT COUNT(*) FROM Clients 
-            WHERE Name LIKE '%test%' OR ClientCode LIKE '%test%'
-        """)
-        search_results = cursor.fetchone()[0]
-        search_time = time.time() - start_time
+        # Chaque scénario est exécuté plusieurs fois à chaud : une mesure
+        # isolée ne dit rien de la latence réelle
+        results = run_benchmarks([db_path], scenarios=list(PERFORMANCE_THRESHOLDS),
+                                 modes=("warm",), iterations=30, warmup=3)
         
-        print(f"🔍 Recherche 'test': {search_results} résultats en {search_time:.3f}s")
+        print(f"📊 Nombre total de clients: {results[0]['clients'] if results else 0}")
+        for result in results:
+            print_result(result)
         
         # Test 4: Vérification des index
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='Clients'")
-        indexes = cursor.fetchall()
+        with read_connection(db_path) as conn:
+            indexes = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='Clients'").fetchall()
         print(f"📇 Index sur la table Clients: {len(indexes)}")
         for idx in indexes:
             print(f"   - {idx[0]}")
         
-        conn.close()
-        
-        # Évaluation de la performance
-        print("\n📈 ÉVALUATION DES PERFORMANCES:")
-        if count_time < 0.1:
-            print("✅ Comptage: Excellent (< 0.1s)")
-        elif count_time < 0.5:
-            print("🟡 Comptage: Bon (< 0.5s)")
-        else:
-            print("⚠️ Comptage: Lent (> 0.5s)")
-            
-        if pagination_time < 0.05:
-            print("✅ Pagination: Excellent (< 0.05s)")
-        elif pagination_time < 0.2:
-            print("🟡 Pagination: Bon (< 0.2s)")
-        else:
-            print("⚠️ Pagination: Lent (> 0.2s)")
-            
-        if search_time < 0.1:
-            print("✅ Recherche: Excellent (< 0.1s)")
-        elif search_time < 0.5:
-            print("🟡 Recherche: Bon (< 0.5s)")
-        else:
-            print("⚠️ Recherche: Lent (> 0.5s)")
+        # Évaluation de la performance sur le p95
+        print("\n📈 ÉVALUATION DES PERFORMANCES (p95):")
+        for result in results:
+            label, excellent, good = PERFORMANCE_THRESHOLDS[result['scenario']]
+            p95 = result['p95_ms'] / 1000
+            if p95 < excellent:
+                print(f"✅ {label}: Excellent (p95 {p95:.3f}s < {excellent}s)")
+            elif p95 < good:
+                print(f"🟡 {label}: Bon (p95 {p95:.3f}s < {good}s)")
+            else:
+                print(f"⚠️ {label}: Lent (p95 {p95:.3f}s > {good}s)")
+        print("💡 Historique et contrôle de régression: python fnev4_bench.py")
         
     except Exception as e:
         print(f"❌ Erreur lors du test de performance: {e}")
@@ -5,15 +5,17 @@ Validation de la centralisation et de l'uniformisation
 """
 
 import os
-import sqlite3
 from pathlib import Path
 
+from fnev4_db import PROJECT_ROOT, read_connection, resolve_database_path
+from fnev4_discovery import client_rows, discover_databases
+
 def main():
     print("🔍 DIAGNOSTIC FINAL - CENTRALISATION BASE DE DONNÉES FNEV4")
     print("="*70)
     
     # Base de données principale centralisée
-    main_db = Path(r"C:\wamp64\www\FNEV4\data\FNEV4.db")
+    main_db = Path(resolve_database_path())
     
     print(f"\n📊 VALIDATION DE LA BASE CENTRALISÉE:")
     print(f"   📁 Chemin: {main_db}")
@@ -24,21 +26,21 @@ def main():
         
         # Vérifier le contenu
         try:
-            conn = sqlite3.connect(str(main_db))
-            cursor = conn.cursor()
-            
-            # Compter les clients
-            cursor.execute("SELECT COUNT(*) FROM Clients")
-            client_count = cursor.fetchone()[0]
-            print(f"   👥 Clients: {client_count}")
-            
-            # Lister les tables
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in cursor.fetchall()]
+            with read_connection(main_db) as conn:
+                cursor = conn.cursor()
+                
+                # Lister les tables
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+                tables = [row[0] for row in cursor.fetchall()]
+                
+                # Compter les clients (comptage exact, une seule petite table)
+                if 'Clients' in tables:
+                    cursor.execute("SELECT COUNT(*) FROM Clients")
+                    print(f"   👥 Clients: {cursor.fetchone()[0]}")
+                else:
+                    print(f"   👥 Clients: table absente")
             print(f"   📋 Tables: {len(tables)} ({', '.join(tables[:5])}{'...' if len(tables) > 5 else ''})")
             
-            conn.close()
-            
         except Exception as e:
             print(f"   ❌ Erreur lecture: {e}")
     else:
@@ -46,40 +48,23 @@ def main():
     
     # Rechercher d'autres bases de données
     print(f"\n🔍 RECHERCHE D'AUTRES BASES DE DONNÉES:")
-    project_root = Path(r"C:\wamp64\www\FNEV4")
     other_dbs = []
     
-    for db_file in project_root.rglob("*.db"):
-        if db_file != main_db:
-            size = db_file.stat().st_size
+    # Parcours unique et sondage parallèle (fnev4_discovery), résultats en cache
+    for db in discover_databases(PROJECT_ROOT, pattern="*.db"):
+        if Path(db['path']) != main_db:
+            if db['error'] or (db['size'] and not db['is_sqlite']):
+                clients = "Erreur"
+            elif db['clients'] is None:
+                clients = "N/A"
+            else:
+                clients = client_rows(db)
             
-            # Vérifier si c'est une vraie base FNEV4
-            try:
-                conn = sqlite3.connect(str(db_file))
-                cursor = conn.cursor()
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='Clients'")
-                has_clients = cursor.fetchone() is not None
-                
-                if has_clients:
-                    cursor.execute("SELECT COUNT(*) FROM Clients")
-                    client_count = cursor.fetchone()[0]
-                else:
-                    client_count = "N/A"
-                
-                conn.close()
-                
-                other_dbs.append({
-                    'path': db_file,
-                    'size': size,
-                    'clients': client_count
-                })
-                
-            except:
-                other_dbs.append({
-                    'path': db_file,
-                    'size': size,
-                    'clients': "Erreur"
-                })
+            other_dbs.append({
+                'path': db['path'],
+                'size': db['size'],
+                'clients': clients
+            })
     
     if other_dbs:
         print(f"   ⚠️  TROUVÉ {len(other_dbs)} AUTRES BASES:")